@@ -63,7 +63,7 @@ with col1:
     - Download progress indicator
     
     **🎵 Audio Downloading:**
-    - Extract audio in MP3 format
+    - Extract audio in MP3 or M4A format
     - High-quality audio (192 kbps)
     - FFmpeg integration
     """)
@@ -79,7 +79,9 @@ with col2:
     **📁 File Management:**
     - Automatic Downloads folder
     - File size display
-    - List of downloaded files
+    - Searchable list of downloaded files
+    - Download history with bulk re-queue
+    - Live download metrics (also on `/metrics`)
     """)
 
 st.divider()
@@ -92,6 +94,9 @@ with st.expander("📖 How to Use?"):
     1. **Select a page from the left menu:**
        - **▶️ Youtube Downloader:** To download a single video
        - **🎶 Playlist Downloader:** To download multiple videos
+       - **📂 Downloaded Files:** To browse and search finished downloads
+       - **📊 Metrics:** To watch download throughput, stage timings and errors
+       - **🕘 History:** To see finished downloads and queue them again
     
     2. **Choose format and quality:**
        - Select MP4 for video or MP3 for audio
@@ -0,0 +1,205 @@
+"""Local stand-in for YouTube that serves synthetic media.
+
+Routes (all under ``/bench``):
+
+- ``/watch?v=<id>``: the page the stub extractor is pointed at
+- ``/info/<id>``: JSON metadata with one MP4 and one audio-only WAV format
+- ``/playlist?list=<id>``: playlist page; ``/entries/<id>?page=<n>`` lists it
+- ``/media/<id>.<ext>``: the media bytes, with Range support
+
+Every response waits ``latency`` seconds first, and media is sent at
+``bandwidth`` bytes per second per connection (0 for unlimited). With
+``ranges=False`` Range headers are ignored, like on servers without
+range support.
+"""
+import json
+import os
+import re
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+BLOCK_SIZE = 64 * 1024
+PAGE_SIZE = 50
+WAV_HEADER_SIZE = 44
+
+# Random-looking bytes so the files do not compress to nothing
+_BLOCK = os.urandom(BLOCK_SIZE)
+
+
+def wav_header(size):
+    """Header of a 44.1 kHz 16-bit stereo PCM file ``size`` bytes long"""
+    data_size = size - WAV_HEADER_SIZE
+    return (
+        b"RIFF" + struct.pack("<I", size - 8) + b"WAVE"
+        + b"fmt " + struct.pack("<IHHIIHH", 16, 1, 2, 44100, 44100 * 4, 4, 16)
+        + b"data" + struct.pack("<I", data_size)
+    )
+
+
+class FakeServer:
+    """Runs the fake site on a background thread"""
+
+    def __init__(self, media_size=1024 * 1024, bandwidth=0, latency=0.0, playlist_size=100, host="127.0.0.1", port=0,
+                 ranges=True):
+        self.media_size = max(int(media_size), WAV_HEADER_SIZE + 4)
+        self.bandwidth = bandwidth
+        self.latency = latency
+        self.playlist_size = playlist_size
+        self.ranges = ranges
+        # Sent as Last-Modified; change it to stand for a new version of the media
+        self.last_modified = "Thu, 01 Jan 2026 00:00:00 GMT"
+        self.requests = 0
+        # TCP connections accepted; fewer than requests when clients reuse them
+        self.connections = 0
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/bench"
+
+    def video_url(self, video_id):
+        return f"{self.base_url}/watch?v={video_id}"
+
+    def playlist_url(self, playlist_id):
+        return f"{self.base_url}/playlist?list={playlist_id}"
+
+    def media_url(self, video_id, ext="mp4"):
+        return f"{self.base_url}/media/{video_id}.{ext}"
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-server", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def info(self, video_id):
+        media = f"{self.base_url}/media/{video_id}"
+        return {
+            'id': video_id,
+            'title': f"Benchmark video {video_id}",
+            'uploader': "bench",
+            'duration': 60,
+            'view_count': 0,
+            'formats': [
+                {
+                    'format_id': "18", 'url': media + ".mp4", 'ext': "mp4", 'height': 360, 'width': 640,
+                    'vcodec': "avc1.42001E", 'acodec': "mp4a.40.2", 'filesize': self.media_size,
+                },
+                {
+                    'format_id': "wav", 'url': media + ".wav", 'ext': "wav",
+                    'vcodec': "none", 'acodec': "pcm_s16le", 'filesize': self.media_size,
+                },
+            ],
+        }
+
+    def entries(self, playlist_id, page):
+        start = page * PAGE_SIZE
+        ids = [f"{playlist_id}-{n}" for n in range(start, min(start + PAGE_SIZE, self.playlist_size))]
+        return {
+            'id': playlist_id,
+            'title': f"Benchmark playlist {playlist_id}",
+            'count': self.playlist_size,
+            'entries': [{'id': video_id, 'url': self.video_url(video_id)} for video_id in ids],
+        }
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def setup(self):
+                server.connections += 1
+                super().setup()
+
+            def do_GET(self):
+                server.requests += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+
+                match = re.fullmatch(r"/bench/media/([^/]+)\.(mp4|wav)", url.path)
+                if match:
+                    return self.send_media(match.group(2))
+                match = re.fullmatch(r"/bench/info/([^/]+)", url.path)
+                if match:
+                    return self.send_json(server.info(match.group(1)))
+                match = re.fullmatch(r"/bench/entries/([^/]+)", url.path)
+                if match:
+                    return self.send_json(server.entries(match.group(1), int(query.get('page', ["0"])[0])))
+                if url.path in ("/bench/watch", "/bench/playlist"):
+                    return self.send_body(b"<html><body>bench</body></html>", "text/html")
+                self.send_error(404)
+
+            def send_json(self, data):
+                self.send_body(json.dumps(data).encode(), "application/json")
+
+            def send_body(self, body, content_type):
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def send_media(self, ext):
+                size = server.media_size
+                start, end, status = 0, size - 1, 200
+                match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+                if match and server.ranges:
+                    start = int(match.group(1))
+                    end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+                    status = 206
+                self.send_response(status)
+                self.send_header("Content-Type", "audio/wav" if ext == "wav" else "video/mp4")
+                self.send_header("Accept-Ranges", "bytes" if server.ranges else "none")
+                self.send_header("Last-Modified", server.last_modified)
+                self.send_header("Content-Length", str(end - start + 1))
+                if status == 206:
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+                self.end_headers()
+                try:
+                    self.stream(ext, start, end + 1)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def stream(self, ext, start, stop):
+                header = wav_header(server.media_size) if ext == "wav" else b""
+                started = time.monotonic()
+                sent = 0
+                position = start
+                while position < stop:
+                    if position < len(header):
+                        data = header[position:stop]
+                    else:
+                        offset = position % BLOCK_SIZE
+                        data = _BLOCK[offset:offset + min(BLOCK_SIZE - offset, stop - position)]
+                    self.wfile.write(data)
+                    position += len(data)
+                    sent += len(data)
+                    if server.bandwidth:
+                        # Sleep until the connection is back under its rate
+                        delay = sent / server.bandwidth - (time.monotonic() - started)
+                        if delay > 0:
+                            time.sleep(delay)
+
+        return Handler
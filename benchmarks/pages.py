@@ -0,0 +1,113 @@
+"""Latency budget of the Streamlit pages.
+
+Every page is rendered with Streamlit's ``AppTest`` in a fresh process:
+the first run is the cold start (imports, singletons, first queries), the
+median of the following runs is the cost of a rerun, which every active
+session pays on each interaction and each poll. Runs fail when a page
+goes over its budget or loads yt-dlp before any download was asked for.
+
+    python -m benchmarks.pages
+    python -m benchmarks.pages --reruns 20
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PAGES = [
+    "Home.py",
+    "pages/▶️_Youtube_Downloader.py",
+    "pages/🎶_Playlist_Downloader.py",
+    "pages/📂_Downloaded_Files.py",
+    "pages/📊_Metrics.py",
+    "pages/🕘_History.py",
+]
+
+# Milliseconds; the cold start includes importing Streamlit's own elements
+COLD_BUDGET_MS = 1500
+RERUN_BUDGET_MS = 100
+
+
+def measure(page, reruns):
+    """Render ``page`` in this process and return its timings"""
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(os.path.join(ROOT, page), default_timeout=60)
+    started = time.perf_counter()
+    app.run()
+    cold = time.perf_counter() - started
+    times = []
+    for _ in range(reruns):
+        started = time.perf_counter()
+        app.run()
+        times.append(time.perf_counter() - started)
+    return {
+        'page': page,
+        'cold_ms': round(cold * 1000),
+        'rerun_ms': round(statistics.median(times) * 1000),
+        'errors': [error.message for error in app.exception],
+        'yt_dlp_loaded': 'yt_dlp' in sys.modules,
+    }
+
+
+def run_page(page, reruns):
+    """Measure ``page`` in a fresh interpreter, in an empty working folder"""
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([ROOT, env.get('PYTHONPATH', "")])
+    # No metrics server: several runs would fight over the port
+    env['YTDL_HTTP_PORT'] = "0"
+    with tempfile.TemporaryDirectory(prefix="bench-pages-") as work_dir:
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.pages", "--measure", page, "--reruns", str(reruns)],
+            cwd=work_dir, env=env, capture_output=True, text=True, check=True,
+        ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.pages", description=__doc__.splitlines()[0])
+    parser.add_argument("--reruns", type=int, default=10, help="reruns per page after the cold start (default: 10)")
+    parser.add_argument("--cold-budget", type=int, default=COLD_BUDGET_MS, help="cold start budget in ms")
+    parser.add_argument("--rerun-budget", type=int, default=RERUN_BUDGET_MS, help="rerun budget in ms")
+    parser.add_argument("--measure", metavar="PAGE", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.measure:
+        print(json.dumps(measure(args.measure, args.reruns)))
+        return 0
+
+    failures = []
+    for page in PAGES:
+        result = run_page(page, args.reruns)
+        print(
+            f"{page}: cold {result['cold_ms']} ms, rerun {result['rerun_ms']} ms"
+            + (", yt-dlp loaded" if result['yt_dlp_loaded'] else "")
+        )
+        if result['errors']:
+            failures.append(f"{page}: {result['errors'][0]}")
+        if result['cold_ms'] > args.cold_budget:
+            failures.append(f"{page}: cold start {result['cold_ms']} ms > {args.cold_budget} ms")
+        if result['rerun_ms'] > args.rerun_budget:
+            failures.append(f"{page}: rerun {result['rerun_ms']} ms > {args.rerun_budget} ms")
+        if result['yt_dlp_loaded']:
+            failures.append(f"{page}: yt-dlp loaded before any download")
+
+    if failures:
+        print("Over budget:")
+        for line in failures:
+            print(f"  {line}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
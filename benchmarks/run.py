@@ -0,0 +1,195 @@
+"""Offline throughput benchmarks for the batch download core.
+
+Each scenario starts a FakeServer, feeds its URLs to the headless batch
+runner (``python -m script.playlist_downloader``) in a fresh working
+folder and reads the JSON-lines report back. Results can be saved as a
+baseline and later runs are compared against it.
+
+    python -m benchmarks.run                      # every scenario
+    python -m benchmarks.run small_files --quick  # fewer items
+    python -m benchmarks.run --save-baseline      # record the current numbers
+
+Peak RSS and CPU time come from ``os.wait4``, so this runs on POSIX only.
+"""
+import argparse
+import json
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.fake_server import FakeServer
+
+
+MB = 1024 * 1024
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(BENCH_DIR, "baselines.json")
+
+SCENARIOS = {
+    'large_file': {'count': 1, 'media_size': 256 * MB, 'bandwidth': 32 * MB, 'latency': 0.02, 'format': "mp4"},
+    'small_files': {'count': 500, 'media_size': 256 * 1024, 'bandwidth': 8 * MB, 'latency': 0.02, 'format': "mp4"},
+    'playlist': {'playlist': 200, 'media_size': 256 * 1024, 'bandwidth': 8 * MB, 'latency': 0.02, 'format': "mp4"},
+    'mp3_batch': {'count': 20, 'media_size': 8 * MB, 'bandwidth': 16 * MB, 'latency': 0.02, 'format': "mp3"},
+}
+
+# Metrics where a higher value is worse, and the rest
+HIGHER_IS_WORSE = ('seconds', 'p50', 'p99', 'peak_rss_mb', 'cpu_seconds')
+LOWER_IS_WORSE = ('throughput_mb_s', 'items_per_s')
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile"""
+    if not values:
+        return None
+    values = sorted(values)
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+def run_scenario(name, spec, concurrency=4, quick=False):
+    """Run one scenario and return its metrics"""
+    count = spec.get('count') or spec.get('playlist')
+    if quick:
+        count = max(1, count // 10)
+    media_size = spec['media_size'] // 4 if quick else spec['media_size']
+
+    work_dir = tempfile.mkdtemp(prefix=f"bench-{name}-")
+    report_path = os.path.join(work_dir, "report.jsonl")
+    log_path = os.path.join(work_dir, "batch.log")
+    server = FakeServer(media_size, spec['bandwidth'], spec['latency'], playlist_size=count)
+    try:
+        with server:
+            if spec.get('playlist'):
+                urls = [server.playlist_url(name)]
+            else:
+                urls = [server.video_url(f"{name}-{n}") for n in range(count)]
+
+            env = dict(os.environ)
+            # The repo for ``script``, the bench folder for the yt-dlp plugin
+            env['PYTHONPATH'] = os.pathsep.join([ROOT, BENCH_DIR, env.get('PYTHONPATH', "")])
+            command = [
+                sys.executable, "-m", "script.playlist_downloader", "-",
+                "--format", spec['format'], "--concurrency", str(concurrency), "--per-host", str(concurrency),
+                "--retries", "0", "--report", report_path,
+            ]
+            started = time.monotonic()
+            with open(log_path, "w") as log:
+                process = subprocess.Popen(command, cwd=work_dir, env=env, stdin=subprocess.PIPE, stderr=log,
+                                           stdout=subprocess.DEVNULL, text=True)
+                process.stdin.write("\n".join(urls) + "\n")
+                process.stdin.close()
+                # wait4 gives the resource usage of this run alone (transcode workers included)
+                _, status, usage = os.wait4(process.pid, 0)
+                process.returncode = os.waitstatus_to_exitcode(status)
+            elapsed = time.monotonic() - started
+
+        records = []
+        if os.path.exists(report_path):
+            with open(report_path) as report:
+                records = [json.loads(line) for line in report if line.strip()]
+        ok = [record for record in records if record['status'] == "ok"]
+        if not ok:
+            with open(log_path) as log:
+                tail = log.read()[-2000:]
+            raise RuntimeError(f"{name}: no item finished (exit code {process.returncode})\n{tail}")
+
+        latencies = [record['seconds'] for record in ok]
+        total_bytes = sum(record['size'] for record in ok)
+        return {
+            'items': len(ok),
+            'failed': len(records) - len(ok),
+            'seconds': round(elapsed, 3),
+            'throughput_mb_s': round(total_bytes / MB / elapsed, 2),
+            'items_per_s': round(len(ok) / elapsed, 2),
+            'p50': round(percentile(latencies, 0.5), 3),
+            'p99': round(percentile(latencies, 0.99), 3),
+            'requests': server.requests,
+            # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+            'peak_rss_mb': round(usage.ru_maxrss / (MB if sys.platform == "darwin" else 1024), 1),
+            'cpu_seconds': round(usage.ru_utime + usage.ru_stime, 2),
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def compare(name, result, baseline, tolerance):
+    """Names of metrics that got worse than ``baseline`` by more than ``tolerance``"""
+    regressions = []
+    for metric in HIGHER_IS_WORSE + LOWER_IS_WORSE:
+        old, new = baseline.get(metric), result.get(metric)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        if (metric in HIGHER_IS_WORSE and change > tolerance) or (metric in LOWER_IS_WORSE and change < -tolerance):
+            regressions.append(f"{name}.{metric}: {old} -> {new} ({change:+.0%})")
+    return regressions
+
+
+def load_baselines(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description=__doc__.splitlines()[0])
+    parser.add_argument("scenarios", nargs="*", metavar="scenario",
+                        help=f"scenarios to run (default: all of {', '.join(SCENARIOS)})")
+    parser.add_argument("-j", "--concurrency", type=int, default=4)
+    parser.add_argument("--quick", action="store_true", help="a tenth of the items at a quarter of the size")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline file (default: benchmarks/baselines.json)")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed change before a regression (0.15 = 15%%)")
+    args = parser.parse_args(argv)
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    names = args.scenarios or list(SCENARIOS)
+    baselines = load_baselines(args.baseline)
+    results = {}
+    regressions = []
+
+    for name in names:
+        spec = SCENARIOS[name]
+        if spec['format'] == "mp3" and shutil.which("ffmpeg") is None:
+            print(f"{name}: skipped (ffmpeg not found)")
+            continue
+
+        result = run_scenario(name, spec, concurrency=args.concurrency, quick=args.quick)
+        key = f"{name}:quick" if args.quick else name
+        results[key] = result
+
+        print(
+            f"{name}: {result['items']} items ({result['failed']} failed) in {result['seconds']}s, "
+            f"{result['throughput_mb_s']} MB/s, {result['items_per_s']} items/s, "
+            f"p50 {result['p50']}s, p99 {result['p99']}s, "
+            f"peak RSS {result['peak_rss_mb']} MB, CPU {result['cpu_seconds']}s"
+        )
+        if key in baselines and not args.save_baseline:
+            regressions += compare(key, result, baselines[key], args.tolerance)
+
+    if args.save_baseline:
+        baselines.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.baseline}")
+
+    if regressions:
+        print("Regressions:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
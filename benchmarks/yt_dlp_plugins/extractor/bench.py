@@ -0,0 +1,47 @@
+"""yt-dlp extractors for the benchmark's fake server.
+
+yt-dlp loads this module as a plugin when the ``benchmarks`` folder is on
+``sys.path`` (the benchmark runner puts it on ``PYTHONPATH``).
+"""
+import itertools
+
+from yt_dlp.extractor.common import InfoExtractor
+
+
+_BASE_RE = r"https?://(?:127\.0\.0\.1|localhost):\d+/bench"
+
+
+class BenchIE(InfoExtractor):
+    IE_NAME = "bench"
+    _VALID_URL = _BASE_RE + r"/watch\?v=(?P<id>[^&#]+)"
+
+    def _real_extract(self, url):
+        video_id = self._match_id(url)
+        base = url.split("/watch?")[0]
+        info = self._download_json(f"{base}/info/{video_id}", video_id, note="Downloading info")
+        info['webpage_url'] = url
+        return info
+
+
+class BenchPlaylistIE(InfoExtractor):
+    IE_NAME = "bench:playlist"
+    _VALID_URL = _BASE_RE + r"/playlist\?list=(?P<id>[^&#]+)"
+
+    def _real_extract(self, url):
+        playlist_id = self._match_id(url)
+        base = url.split("/playlist?")[0]
+        first = self._download_json(f"{base}/entries/{playlist_id}", playlist_id, note="Downloading page 1")
+        return self.playlist_result(self._entries(base, playlist_id, first), playlist_id, first['title'])
+
+    def _entries(self, base, playlist_id, page):
+        # Pages are requested only as the entries are consumed
+        seen = 0
+        for number in itertools.count(1):
+            for entry in page['entries']:
+                yield self.url_result(entry['url'], BenchIE, entry['id'])
+            seen += len(page['entries'])
+            if not page['entries'] or seen >= page['count']:
+                return
+            page = self._download_json(
+                f"{base}/entries/{playlist_id}?page={number}", playlist_id, note=f"Downloading page {number + 1}",
+            )
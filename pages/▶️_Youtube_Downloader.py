@@ -1,149 +1,120 @@
 import streamlit as st
-import yt_dlp
 import os
+import uuid
+
+from script.catalogue import get_catalogue
+from script.errors import ERROR_HINTS, classify_error
+from script.formats import AUDIO_QUALITY, FORMAT_CHOICES, VIDEO_QUALITIES, plan_choices
+from script.job_manager import DONE_STATUSES, ERROR, FINISHED, get_job_manager
+from script.progress import format_bytes
+from script.urls import canonical_url, video_id_from_url
 
 st.set_page_config(page_title="YouTube Video Downloader", page_icon="▶️", layout="wide", initial_sidebar_state="expanded")
 
 download_path = "Downloads"
 
+# Identifies this browser session for its bandwidth share
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+
 # Create Downloads folder
 if not os.path.exists(download_path):
     os.makedirs(download_path)
 
-def get_video_info(url):
-    """Fetch video information"""
-    ydl_opts = {
-        'quiet': True,
-        'no_warnings': True,
-    }
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        try:
-            info = ydl.extract_info(url, download=False)
-            return info
-        except Exception:
-            return None
+def show_error(error):
+    """Explain a failed download"""
+    st.error(f"❌ An error occurred: {error}")
+    st.error(ERROR_HINTS[classify_error(error)])
 
-def video_downloader(url, format_choice, quality_choice):
-    try:
-        # Fetch video information
-        with st.spinner("Analyzing video..."):
-            video_info = get_video_info(url)
-            
-        if not video_info:
-            st.error("❌ Failed to fetch video information!")
-            return
-        
+def show_job(job_id):
+    """Render the current state of a download job"""
+    job = get_job_manager().get_job(job_id)
+    if job is None:
+        return
+    
+    video_info = job['info']
+    if video_info:
         # Video preview
         col1, col2 = st.columns([1, 2])
         
-        title = video_info.get('title', 'Unknown')
-        uploader = video_info.get('uploader', 'Unknown')
-        duration = video_info.get('duration', 0)
-        view_count = video_info.get('view_count', 0)
-        thumbnail = video_info.get('thumbnail', None)
+        title = video_info['title']
+        duration = video_info['duration']
         
         with col1:
-            if thumbnail:
-                st.image(thumbnail, width=300)
+            if video_info['thumbnail']:
+                st.image(video_info['thumbnail'], width=300)
         
         with col2:
             st.write(f"**Title:** {title}")
-            st.write(f"**Channel:** {uploader}")
+            st.write(f"**Channel:** {video_info['uploader']}")
             st.write(f"**Duration:** {duration} seconds ({duration//60}:{duration%60:02d})")
-            st.write(f"**Views:** {view_count:,}")
+            st.write(f"**Views:** {video_info['view_count']:,}")
             
         st.divider()
         
-        # Download settings
-        if format_choice == "MP4 (Video)":
-            if quality_choice == "Highest Quality":
-                format_selector = 'best[ext=mp4]'
-                quality_info = "Highest Quality"
-            elif quality_choice == "720p":
-                format_selector = 'best[height<=720][ext=mp4]/best[ext=mp4]'
-                quality_info = "720p or best available"
-            elif quality_choice == "480p":
-                format_selector = 'best[height<=480][ext=mp4]/best[ext=mp4]'
-                quality_info = "480p or best available"
-            else:  # 360p
-                format_selector = 'best[height<=360][ext=mp4]/worst[ext=mp4]'
-                quality_info = "360p or lowest available"
-        else:  # MP3 (Audio)
-            format_selector = 'bestaudio/best'
-            quality_info = "Best Audio Quality"
-        
-        # Generate safe filename
-        safe_title = "".join(c for c in title if c.isalnum() or c in (' ', '-', '_', '.')).rstrip()
-        output_template = os.path.join(download_path, f"{safe_title}.%(ext)s")
-        
-        ydl_opts = {
-            'format': format_selector,
-            'outtmpl': output_template,
-            'quiet': True,
-            'no_warnings': True,
-        }
-        
-        # MP3 conversion settings
-        if format_choice == "MP3 (Audio)":
-            ydl_opts['postprocessors'] = [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': '192',
-            }]
-        
-        st.success(f"✅ Format: {format_choice} - Quality: {quality_info}")
-        
-        # Download process
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-        
-        status_text.text(f"📥 Downloading {title}...")
-        
-        class ProgressHook:
-            def __init__(self, progress_bar, status_text):
-                self.progress_bar = progress_bar
-                self.status_text = status_text
-            
-            def __call__(self, d):
-                if d['status'] == 'downloading':
-                    if 'total_bytes' in d and d['total_bytes']:
-                        percent = (d['downloaded_bytes'] / d['total_bytes']) * 100
-                        self.progress_bar.progress(min(percent / 100, 1.0))
-                        self.status_text.text(f"📥 Downloading... {percent:.1f}%")
-                elif d['status'] == 'finished':
-                    self.progress_bar.progress(1.0)
-                    self.status_text.text("✅ Download completed!")
-        
-        ydl_opts['progress_hooks'] = [ProgressHook(progress_bar, status_text)]
-        
-        with st.spinner('Downloading...'):
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([url])
-        
+        st.success(f"✅ Format: {job['options']['format_choice']} - Quality: {video_info['quality_info']}")
+    
+    if job['status'] == ERROR:
+        show_error(job['error'])
+        return
+    
+    if job['status'] != FINISHED:
+        st.progress(job['progress'])
+        st.text(job['message'] or "⏳ Waiting in the download queue...")
+        return
+    
+    st.progress(1.0)
+    st.text("✅ Download completed!")
+    result = job['result']
+    # Jobs finished from a batch item of the history have no preview
+    title = video_info['title'] if video_info else os.path.basename(result['path'])
+    if result.get('instant'):
+        st.success(f"⚡ **{title}** was downloaded before with these settings - delivered instantly from the history!")
+    elif result['cached']:
+        st.success(f"♻️ **{title}** was already downloaded with these settings - served from the library!")
+    else:
         st.success(f"🎉 **{title}** downloaded successfully!")
-        st.info(f"📁 File location: {os.path.abspath(download_path)}")
-        
-        # List downloaded files
-        files = os.listdir(download_path)
-        matching_files = [f for f in files if safe_title in f]
-        
-        if matching_files:
-            st.write("📋 Downloaded files:")
-            for file in matching_files:
-                file_path = os.path.join(download_path, file)
-                file_size = os.path.getsize(file_path) / (1024 * 1024)  # MB
-                st.write(f"- **{file}** ({file_size:.1f} MB)")
-        
-    except Exception as e:
-        st.error(f"❌ An error occurred: {str(e)}")
-        if "age-restricted" in str(e).lower():
-            st.error("🔞 This video may have age restrictions.")
-        elif "private" in str(e).lower():
-            st.error("🔒 This video may be private.")
-        elif "ffmpeg" in str(e).lower():
-            st.error("🔧 FFmpeg is required! Please check the installation instructions.")
-        else:
-            st.error("🌐 Check your internet connection or ensure the URL is correct.")
+    st.info(f"📁 File location: {os.path.abspath(os.path.dirname(result['path']))}")
+    
+    # Downloaded files of this video
+    files = get_catalogue().query(video_id=result['video_id'], limit=10)
+    
+    if files:
+        st.write("📋 Downloaded files:")
+        for file in files:
+            file_size = file['size'] / (1024 * 1024)  # MB
+            st.write(f"- **{os.path.basename(file['path'])}** - {file['format']}, {file['quality']} ({file_size:.1f} MB)")
+
+@st.fragment(run_every=1)
+def poll_job(job_id):
+    """Re-render the job every second until it is done"""
+    job = get_job_manager().get_job(job_id)
+    if job is None or job['status'] in DONE_STATUSES:
+        st.rerun()
+    show_job(job_id)
+
+def show_stream_link(url, format_choice, quality_choice):
+    """Link that streams the download straight to the browser"""
+    # Registers the /stream route; loads yt-dlp, so only once it is needed
+    from script.streaming import stream_url
+
+    st.session_state.pop("video_job", None)
+    link = stream_url(url, format_choice, quality_choice, session=st.session_state.session_id)
+    if link is None:
+        st.error("❌ Streaming needs the local HTTP server (YTDL_HTTP_PORT is 0).")
+        return
+    st.link_button("⬇️ Start streaming download", link, type="primary", use_container_width=True)
+    st.caption("📡 The file is sent while it downloads, nothing is kept on the server. "
+               "Videos stream as a single MP4 file, which can be a lower quality than a saved download.")
+
+def video_downloader(url, format_choice, quality_choice):
+    """Queue the download in the background; the page only polls its state.
+
+    A download finished before with the same settings is shown at once.
+    """
+    st.session_state.video_job = get_job_manager().submit_video(
+        url, format_choice, quality_choice, session=st.session_state.session_id,
+    )
 
 st.title("▶️ YouTube Video Downloader")
 st.write("Advanced YouTube video downloader powered by yt-dlp")
@@ -154,7 +125,7 @@ col1, col2, col3 = st.columns(3)
 with col1:
     format_choice = st.selectbox(
         "📄 Format:",
-        ["MP4 (Video)", "MP3 (Audio)"],
+        FORMAT_CHOICES,
         help="Download as video or audio file"
     )
 
@@ -162,11 +133,11 @@ with col2:
     if format_choice == "MP4 (Video)":
         quality_choice = st.selectbox(
             "🎯 Quality:",
-            ["Highest Quality", "720p", "480p", "360p"],
+            VIDEO_QUALITIES,
             help="Select video quality"
         )
     else:
-        quality_choice = "Audio"
+        quality_choice = AUDIO_QUALITY
         st.selectbox(
             "🎯 Quality:",
             ["Best Audio Quality"],
@@ -177,6 +148,13 @@ with col2:
 with col3:
     st.info(f"📁 Download folder:\n`{os.path.abspath(download_path)}`")
 
+delivery = st.radio(
+    "📦 Delivery:",
+    ["💾 Save on the server", "📡 Stream to my browser"],
+    horizontal=True,
+    help="Streaming sends the file straight to your browser without saving it in the download folder",
+)
+
 st.divider()
 
 # URL input
@@ -186,16 +164,70 @@ video_url = st.text_input(
     help="Paste the YouTube video link here"
 )
 
+def show_sizes(url):
+    """Expected download size of every format and quality for this video, looked up on request"""
+    sizes = st.session_state.get("sizes")
+    if sizes is None or sizes[0] != url:
+        if not st.button("🔎 Check available formats and sizes"):
+            return
+        # yt-dlp is loaded with the first lookup, not with the page
+        from script.download_engine import get_video_info
+
+        with st.spinner("🔎 Checking available formats..."):
+            video_info = get_video_info(url)
+        if video_info is None:
+            st.warning("⚠️ The formats of this video could not be checked. You can still try to download it.")
+            return
+        # Kept for the reruns that follow, e.g. when another quality is picked
+        sizes = st.session_state.sizes = (url, plan_choices(video_info))
+    plans = sizes[1]
+    if not any(plan for _, _, plan in plans):
+        st.caption("No size information is available for this video.")
+        return
+    st.dataframe(
+        [
+            {
+                "": "👉" if (choice, quality) == (format_choice, quality_choice) else "",
+                "Format": choice,
+                "Quality": quality,
+                "Download": plan['label'] if plan else "Best available",
+                "Expected size": format_bytes(plan['size']) if plan and plan['size'] else "Unknown",
+            }
+            for choice, quality, plan in plans
+        ],
+        use_container_width=True, hide_index=True,
+    )
+
+# Sizes per choice, on request; the lookup is cached, so the download does not repeat it.
+# Nothing to look up when the download is still on disk from an earlier request.
+if video_url and video_id_from_url(video_url):
+    if get_job_manager().last_delivery(canonical_url(video_url), format_choice, quality_choice):
+        st.info("⚡ Already downloaded with these settings: it is shown at once, without checking the video again.")
+    else:
+        with st.expander("📦 Expected download size", expanded=True):
+            show_sizes(canonical_url(video_url))
+
 # Download button
 if st.button("🚀 Analyze and Download", type="primary", use_container_width=True):
     if video_url:
-        if any(site in video_url for site in ["youtube.com", "youtu.be", "m.youtube.com"]):
-            video_downloader(video_url, format_choice, quality_choice)
-        else:
+        # Any spelling of a video link: youtu.be, m.youtube.com, /shorts/, &t=...
+        if not video_id_from_url(video_url):
             st.error("❌ Invalid YouTube URL! Please enter a valid YouTube link.")
+        elif delivery == "📡 Stream to my browser":
+            show_stream_link(canonical_url(video_url), format_choice, quality_choice)
+        else:
+            video_downloader(canonical_url(video_url), format_choice, quality_choice)
     else:
         st.warning("⚠️ Please enter a YouTube video URL!")
 
+# Current download (keeps running in the background across reruns)
+if "video_job" in st.session_state:
+    job = get_job_manager().get_job(st.session_state.video_job)
+    if job is not None and job['status'] not in DONE_STATUSES:
+        poll_job(st.session_state.video_job)
+    else:
+        show_job(st.session_state.video_job)
+
 # Usage information
 with st.expander("ℹ️ Usage Information"):
     st.markdown("""
@@ -211,7 +243,7 @@ with st.expander("ℹ️ Usage Information"):
     - `https://m.youtube.com/watch?v=VIDEO_ID`
     
     ### Notes:
-    - Files are saved in the `Downloads` folder
+    - Files are saved in the `Downloads` folder, or streamed straight to your browser
     - FFmpeg is required for MP3 conversion
     - yt-dlp is a reliable and up-to-date solution
     """)
@@ -1,35 +1,32 @@
 import streamlit as st 
-import yt_dlp
 import os
+import uuid
+
+from script.batch_results import failures_csv, failures_json
+from script.formats import AUDIO_QUALITY, FORMAT_CHOICES, VIDEO_QUALITIES
+from script.job_manager import (
+    EMBEDDED_WORKER, ERROR, FINISHED, MAX_WORKERS, PER_HOST_LIMIT, QUEUED, RUNNING, get_job_manager,
+)
+from script.playlist import is_playlist_url
+from script.prefetch import (
+    DUPLICATE, KEEP_STATUSES, PLAYLIST, PREFETCH_LIMIT, READY, UNAVAILABLE, UNCHECKED, prefetch,
+)
+from script.progress import format_bytes
+from script.urls import dedupe_urls, is_url
 
 
 st.set_page_config(page_title="Playlist Downloader", page_icon="🎶", layout="wide")
 
 path = "Downloads"
 
+# Identifies this browser session for its bandwidth share
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+
 # Create Downloads folder if it doesn't exist
 if not os.path.exists(path):
     os.makedirs(path)
 
-def get_playlist_info(url):
-    """Get playlist information"""
-    ydl_opts = {
-        'quiet': True,
-        'no_warnings': True,
-        'extract_flat': True,  # Get only the playlist info, don't download videos
-    }
-    
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        try:
-            info = ydl.extract_info(url, download=False)
-            return info
-        except Exception as e:
-            return None
-
-def safe_filename(filename):
-    """Create a safe file name"""
-    return "".join(c for c in filename if c.isalnum() or c in (' ', '-', '_', '.')).rstrip()
-
 st.title("🎶 YouTube Playlist Downloader")
 st.write("Download multiple YouTube video URLs in bulk (powered by yt-dlp)")
 
@@ -39,119 +36,246 @@ col1, col2 = st.columns(2)
 with col1:
     format_choice = st.selectbox(
         "📄 Format:",
-        ["MP4 (Video)", "MP3 (Audio)"]
+        FORMAT_CHOICES
     )
 
 with col2:
     if format_choice == "MP4 (Video)":
         quality_choice = st.selectbox(
             "🎯 Quality:",
-            ["Highest Quality", "720p", "480p", "360p"]
+            VIDEO_QUALITIES
         )
     else:
-        quality_choice = "Audio"
+        quality_choice = AUDIO_QUALITY
 
 st.info(f"📁 Files will be saved to: `{os.path.abspath(path)}`")
 
+manager = get_job_manager()
+if EMBEDDED_WORKER:
+    st.caption(
+        f"⚡ Downloads run in the background on a shared pool: {MAX_WORKERS} at a time, "
+        f"{PER_HOST_LIMIT} per site. You can leave this page while they run."
+    )
+else:
+    st.caption("⚡ Downloads run in the background on separate worker processes. You can leave this page while they run.")
+
+# Results table filters and page size; a poll renders one page, whatever the size of the batch
+RESULT_FILTERS = {
+    "All": None,
+    "❌ Errors": (ERROR,),
+    "✅ Finished": (FINISHED,),
+    "⏳ Waiting": (QUEUED, RUNNING),
+}
+PAGE_SIZE = 100
+
+def show_batch(batch_id):
+    """Render progress, counters and the per-item results of a batch"""
+    summary = get_job_manager().batch_summary(batch_id)
+    expanding = summary['expanding']
+    total_videos = summary['total']
+    success_count = summary[FINISHED]
+    error_count = summary[ERROR]
+    done_count = success_count + error_count
+    
+    # Progress bar (finished items plus the progress of running ones)
+    st.progress(min((done_count + summary['progress']) / total_videos, 1.0) if total_videos else 0.0 if expanding else 1.0)
+    if summary['duplicates']:
+        st.caption(f"🔁 {summary['duplicates']} duplicate URLs were merged and downloaded only once.")
+    if expanding:
+        st.text(f"🔎 Listing playlist entries... {total_videos} found so far, {done_count} processed")
+    elif done_count < total_videos:
+        current = summary['current'][:50] if summary['current'] else "waiting in the download queue"
+        speed_text = f" - {format_bytes(summary['speed'])}/s" if summary['speed'] else ""
+        st.text(f"🔄 Processed {done_count}/{total_videos} videos{speed_text}: {current}...")
+    else:
+        st.text("✅ All tasks completed!")
+    
+    # Summary
+    col1, col2, col3, col4, col5 = st.columns(5)
+    col1.metric("✅ Downloaded", success_count - summary['cached'])
+    col2.metric("♻️ Already downloaded", summary['cached'])
+    col3.metric("❌ Errored", error_count)
+    col4.metric("⏳ Waiting", summary[QUEUED] + summary[RUNNING])
+    col5.metric("📊 Total", total_videos)
+    
+    show_results(batch_id, summary)
+    
+    if expanding or done_count < total_videos:
+        return
+    
+    if success_count > 0:
+        if st.session_state.get("celebrated_batch") != batch_id:
+            st.session_state.celebrated_batch = batch_id
+            st.balloons()
+        st.success(f"🎉 Download completed! {success_count} videos were successfully downloaded.")
+
+def show_results(batch_id, summary):
+    """One page of per-item results in input order; failures can be downloaded"""
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        choice = st.radio("🔎 Show:", list(RESULT_FILTERS), horizontal=True, key="result_filter")
+    statuses = RESULT_FILTERS[choice]
+    count = summary['total'] if statuses is None else sum(summary[status] for status in statuses)
+    pages = max(1, -(-count // PAGE_SIZE))
+    with col2:
+        # No max_value: the number of pages grows while the batch is listed
+        page = min(st.number_input("📄 Page:", min_value=1, value=1, key="result_page"), pages)
+    
+    items = get_job_manager().batch_items(batch_id, (page - 1) * PAGE_SIZE, PAGE_SIZE, statuses)
+    if items:
+        st.dataframe([item.as_row() for item in items], use_container_width=True, hide_index=True)
+        st.caption(f"Page {page} of {pages} ({count} items)")
+    else:
+        st.caption("No items to show.")
+    
+    if summary[ERROR]:
+        # Built only when clicked, so polling does not resend the list every second
+        def failures():
+            return get_job_manager().batch_items(batch_id, statuses=(ERROR,))
+        col1, col2 = st.columns(2)
+        col1.download_button(
+            "📥 Download failures (CSV)", data=lambda: failures_csv(failures()),
+            file_name=f"failures-{batch_id[:8]}.csv", mime="text/csv",
+            on_click="ignore", key="failures_csv", use_container_width=True,
+        )
+        col2.download_button(
+            "📥 Download failures (JSON)", data=lambda: failures_json(failures()),
+            file_name=f"failures-{batch_id[:8]}.json", mime="application/json",
+            on_click="ignore", key="failures_json", use_container_width=True,
+        )
+
+def batch_done(batch_id):
+    return get_job_manager().batch_done(batch_id)
+
+PREFETCH_LABELS = {
+    READY: "✅ Ready",
+    PLAYLIST: "📜 Playlist",
+    UNCHECKED: "⚠️ Not checked",
+    DUPLICATE: "🔁 Duplicate",
+    UNAVAILABLE: "🚫 Unavailable",
+}
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    return f"{hours}:{rest // 60:02d}:{rest % 60:02d}" if hours else f"{rest // 60}:{rest % 60:02d}"
+
+def check_urls(urls, format_choice, quality_choice):
+    """Look up every pasted URL once per list/format; the results stay in the session"""
+    key = (tuple(urls), format_choice, quality_choice)
+    if st.session_state.get("prefetch_key") != key:
+        with st.spinner(f"🔎 Checking {min(len(urls), PREFETCH_LIMIT)} URLs..."):
+            st.session_state.prefetch_items = prefetch(urls, format_choice, quality_choice)
+        st.session_state.prefetch_key = key
+    return st.session_state.prefetch_items
+
+def show_preview(items):
+    """Preview table with totals; dropped URLs are listed but not downloaded"""
+    videos = [item for item in items if item['status'] == READY]
+    dropped = [item for item in items if item['status'] not in KEEP_STATUSES]
+    sizes = [item['size'] for item in videos if item['size']]
+    duration = sum(item['duration'] or 0 for item in videos)
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("🎬 Videos", len(videos))
+    col2.metric("⏱️ Total duration", format_duration(duration))
+    if not sizes:
+        size_text = "Unknown"
+    else:
+        # "~" when some sizes are unknown
+        size_text = ("~" if len(sizes) < len(videos) else "") + format_bytes(sum(sizes))
+    col3.metric("💾 Estimated size", size_text)
+    col4.metric("🗑️ Dropped", len(dropped))
+
+    st.dataframe(
+        [
+            {
+                "#": number,
+                "Status": PREFETCH_LABELS[item['status']],
+                "Title": item['title'] or "",
+                "Duration": format_duration(item['duration']) if item['duration'] else "",
+                "Size": format_bytes(item['size']) if item['size'] else "",
+                "URL": item['url'],
+                "Note": item['error'] or "",
+            }
+            for number, item in enumerate(items, start=1)
+        ],
+        use_container_width=True, hide_index=True,
+    )
+
+@st.fragment(run_every=1)
+def poll_batch(batch_id):
+    """Re-render the batch every second until every item is done"""
+    if batch_done(batch_id):
+        st.rerun()
+    show_batch(batch_id)
+
 # Video URLs input
 video_urls = st.text_area(
-    "🔗 Video URLs (one URL per line):",
-    placeholder="https://www.youtube.com/watch?v=...\nhttps://www.youtube.com/watch?v=...",
-    help="Enter one video URL per line"
+    "🔗 Video, playlist or channel URLs (one URL per line):",
+    placeholder="https://www.youtube.com/watch?v=...\nhttps://www.youtube.com/playlist?list=...",
+    help="Enter one URL per line. Playlists and channels are expanded into their videos."
 )
 
+# Playlist range
+col1, col2 = st.columns(2)
+with col1:
+    range_start = st.number_input(
+        "📍 Start from video:", min_value=1, value=1,
+        help="First video of each playlist to download"
+    )
+with col2:
+    range_end = st.number_input(
+        "🏁 End at video (0 = last):", min_value=0, value=0,
+        help="Last video of each playlist to download"
+    )
+
 if video_urls:
-    urls = [url.strip() for url in video_urls.splitlines() if url.strip()]
+    # One canonical URL per video, playlist or channel
+    urls, merged = dedupe_urls(video_urls.splitlines())
+    unsupported = [url for url in urls if not is_url(url)]
+    if unsupported:
+        st.warning(f"❓ {len(unsupported)} lines are not supported URLs and were skipped: "
+                   + ", ".join(f"`{url}`" for url in unsupported[:5]) + ("..." if len(unsupported) > 5 else ""))
+        urls = [url for url in urls if is_url(url)]
     if urls:
-        st.info(f"🔍 Found {len(urls)} video URLs.")
+        playlist_count = sum(1 for url in urls if is_playlist_url(url))
+        if playlist_count:
+            found = f"🔍 Found {len(urls) - playlist_count} video URLs and {playlist_count} playlists/channels."
+        else:
+            found = f"🔍 Found {len(urls)} video URLs."
+        if merged:
+            found += f" 🔁 Merged {merged} duplicate URLs."
+        st.info(found)
+        
+        active = manager.active_urls(format_choice, quality_choice)
+        already_queued = sum(1 for url in urls if url in active)
+        if already_queued:
+            st.info(f"🔗 {already_queued} videos are already being downloaded by another batch; "
+                    "they will finish together with that download.")
+        
+        # Resolve everything up front; the downloads reuse the cached metadata
+        items = check_urls(urls, format_choice, quality_choice)
+        show_preview(items)
+        urls = [item['url'] for item in items if item['status'] in KEEP_STATUSES]
         
-        if st.button("🚀 Download Videos", type="primary", use_container_width=True):
-            # Download statistics
-            success_count = 0
-            error_count = 0
-            
-            # Progress bar
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-            
-            # Container for results
-            results_container = st.container()
-            
-            total_videos = len(urls)
-            
-            # Download settings
-            if format_choice == "MP4 (Video)":
-                if quality_choice == "Highest Quality":
-                    format_selector = 'best[ext=mp4]'
-                elif quality_choice == "720p":
-                    format_selector = 'best[height<=720][ext=mp4]/best[ext=mp4]'
-                elif quality_choice == "480p":
-                    format_selector = 'best[height<=480][ext=mp4]/best[ext=mp4]'
-                else:  # 360p
-                    format_selector = 'best[height<=360][ext=mp4]/worst[ext=mp4]'
-            else:  # MP3
-                format_selector = 'bestaudio/best'
-            
-            for i, video_url in enumerate(urls):
-                current_video = i + 1
-                progress = current_video / total_videos
-                
-                try:
-                    status_text.text(f"🔄 Processing video {current_video}/{total_videos}: {video_url[:50]}...")
-                    progress_bar.progress(progress)
-                    
-                    # Safe file name
-                    output_template = os.path.join(path, f"%(title)s.%(ext)s")
-                    
-                    ydl_opts = {
-                        'format': format_selector,
-                        'outtmpl': output_template,
-                        'quiet': True,
-                        'no_warnings': True,
-                    }
-                    
-                    # Audio conversion for MP3
-                    if format_choice == "MP3 (Audio)":
-                        ydl_opts['postprocessors'] = [{
-                            'key': 'FFmpegExtractAudio',
-                            'preferredcodec': 'mp3',
-                            'preferredquality': '192',
-                        }]
-                    
-                    # Download
-                    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                        ydl.download([video_url])
-                    
-                    success_count += 1
-                    
-                    with results_container:
-                        st.success(f"✅ {current_video}. **{video_url}** - Downloaded")
-                        
-                except Exception as e:
-                    error_count += 1
-                    with results_container:
-                        st.error(f"❌ {current_video}. **{video_url}** - Error: {str(e)}")
-            
-            # Final status
-            progress_bar.progress(1.0)
-            status_text.text("✅ All tasks completed!")
-            
-            # Summary
-            st.divider()
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                st.metric("✅ Successful", success_count)
-            with col2:
-                st.metric("❌ Errored", error_count)
-            with col3:
-                st.metric("📊 Total", total_videos)
-            
-            if success_count > 0:
-                st.balloons()
-                st.success(f"🎉 Download completed! {success_count} videos were successfully downloaded.")
+        if not urls:
+            st.warning("⚠️ None of the URLs can be downloaded.")
+        elif st.button("🚀 Download Videos", type="primary", use_container_width=True):
+            st.session_state.batch_job = manager.submit_batch(
+                urls, format_choice, quality_choice,
+                start=range_start - 1, end=range_end or None, session=st.session_state.session_id,
+            )
     else:
         st.warning("⚠️ No valid video URL was entered.")
 
+# Current batch (keeps running in the background across reruns)
+if "batch_job" in st.session_state:
+    if batch_done(st.session_state.batch_job):
+        show_batch(st.session_state.batch_job)
+    else:
+        poll_batch(st.session_state.batch_job)
+
 # Usage information
 with st.expander("ℹ️ Usage Information"):
     st.markdown("""
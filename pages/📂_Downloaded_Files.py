@@ -0,0 +1,62 @@
+import streamlit as st
+import os
+from datetime import datetime
+
+from script.catalogue import get_catalogue
+from script.formats import FORMAT_CHOICES
+
+
+st.set_page_config(page_title="Downloaded Files", page_icon="📂", layout="wide")
+
+PAGE_SIZE = 25
+
+st.title("📂 Downloaded Files")
+st.write("Browse everything that has been downloaded on this server")
+
+# Filters
+col1, col2 = st.columns([2, 1])
+
+with col1:
+    title_filter = st.text_input(
+        "🔎 Title starts with:",
+        placeholder="Rick Astley",
+        help="Case-insensitive search on the start of the title"
+    )
+
+with col2:
+    format_filter = st.selectbox(
+        "📄 Format:",
+        ["All"] + FORMAT_CHOICES
+    )
+
+filters = {
+    'title': title_filter.strip() or None,
+    'format_choice': None if format_filter == "All" else format_filter,
+}
+
+catalogue = get_catalogue()
+total = catalogue.count(**filters)
+page_count = max(1, (total + PAGE_SIZE - 1) // PAGE_SIZE)
+
+if total == 0:
+    st.info("📭 No downloaded files found.")
+else:
+    page = st.number_input(f"📄 Page (of {page_count}):", min_value=1, max_value=page_count, value=1)
+    rows = catalogue.query(limit=PAGE_SIZE, offset=(page - 1) * PAGE_SIZE, **filters)
+
+    st.caption(f"Showing {len(rows)} of {total} files")
+    st.dataframe(
+        [
+            {
+                "Title": row['title'],
+                "Format": row['format'],
+                "Quality": row['quality'],
+                "Size (MB)": round(row['size'] / (1024 * 1024), 1),
+                "Downloaded": datetime.fromtimestamp(row['created']).strftime("%Y-%m-%d %H:%M"),
+                "File": os.path.abspath(row['path']),
+            }
+            for row in rows
+        ],
+        use_container_width=True,
+        hide_index=True,
+    )
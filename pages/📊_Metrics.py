@@ -0,0 +1,72 @@
+import streamlit as st
+import os
+
+from script import http_server
+from script.job_manager import get_job_manager
+from script.metrics import DOWNLOADS, ERRORS, REGISTRY, STAGE_SECONDS
+from script.progress import format_bytes
+
+
+st.set_page_config(page_title="Metrics", page_icon="📊", layout="wide")
+
+STAGES = ["extraction", "format_selection", "transfer", "merge", "transcode", "postprocess", "total"]
+
+st.title("📊 Download Metrics")
+st.write("Live numbers for capacity planning on the shared server")
+
+# Make sure the gauges are registered and /metrics is served
+get_job_manager()
+server = http_server.start()
+if server is not None:
+    host, port = server.server_address[:2]
+    st.caption(f"Prometheus endpoint: `http://{host}:{port}/metrics`")
+else:
+    st.caption(f"Prometheus endpoint is off (YTDL_HTTP_PORT={os.environ.get('YTDL_HTTP_PORT', '')})")
+
+
+def gauge(name):
+    metric = REGISTRY.get(name)
+    return metric.samples()[0][1] if metric is not None else 0
+
+
+@st.fragment(run_every=2)
+def show_metrics():
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("📥 Active downloads", gauge("ytdl_active_downloads"))
+    col2.metric("⏳ Queue depth", gauge("ytdl_queue_depth"))
+    col3.metric("🚀 Speed", f"{format_bytes(gauge('ytdl_download_speed_bytes'))}/s")
+    col4.metric("💾 Transferred", format_bytes(gauge("ytdl_transferred_bytes_total")))
+
+    col1, col2, col3, col4, col5 = st.columns(5)
+    col1.metric("✅ Downloaded", DOWNLOADS.value(result='downloaded'))
+    col2.metric("♻️ From the library", DOWNLOADS.value(result='cached'))
+    col3.metric("⚡ From the history", DOWNLOADS.value(result='instant'))
+    col4.metric("📡 Streamed", DOWNLOADS.value(result='streamed'))
+    col5.metric("❌ Failed", DOWNLOADS.value(result='error'))
+
+    st.subheader("⏱️ Time per stage")
+    snapshot = STAGE_SECONDS.snapshot()
+    rows = []
+    for stage in STAGES:
+        count, total, _ = snapshot.get((stage,), (0, 0.0, None))
+        if not count:
+            continue
+        rows.append({
+            "Stage": stage,
+            "Count": count,
+            "Average (s)": round(total / count, 2),
+            "p50 (s) ≤": STAGE_SECONDS.quantile(0.5, stage=stage),
+            "p95 (s) ≤": STAGE_SECONDS.quantile(0.95, stage=stage),
+        })
+    if rows:
+        st.dataframe(rows, use_container_width=True, hide_index=True)
+    else:
+        st.info("📭 No downloads measured yet.")
+
+    errors = [{"Category": values[0], "Errors": count} for values, count in ERRORS.samples()]
+    if errors:
+        st.subheader("🚨 Errors by category")
+        st.dataframe(errors, use_container_width=True, hide_index=True)
+
+
+show_metrics()
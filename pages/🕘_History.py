@@ -0,0 +1,61 @@
+import streamlit as st
+import os
+import uuid
+from datetime import datetime
+
+from script.job_manager import get_job_manager
+
+
+st.set_page_config(page_title="Download History", page_icon="🕘", layout="wide")
+
+PAGE_SIZE = 25
+
+# Identifies this browser session; its own downloads are its history
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+
+st.title("🕘 Download History")
+st.write("Finished downloads, newest first. Select any of them to download them again in one batch.")
+
+scope = st.radio("👥 Show:", ["👤 This session", "🌍 All users"], horizontal=True)
+session = st.session_state.session_id if scope == "👤 This session" else None
+
+manager = get_job_manager()
+total = manager.history_count(session)
+page_count = max(1, (total + PAGE_SIZE - 1) // PAGE_SIZE)
+
+if total == 0:
+    st.info("📭 No finished downloads yet.")
+else:
+    page = st.number_input(f"📄 Page (of {page_count}):", min_value=1, max_value=page_count, value=1)
+    jobs = manager.history(session, offset=(page - 1) * PAGE_SIZE, limit=PAGE_SIZE)
+    select_all = st.checkbox("☑️ Select all on this page")
+
+    st.caption(f"Showing {len(jobs)} of {total} downloads")
+    rows = st.data_editor(
+        [
+            {
+                "Re-queue": select_all,
+                "Title": job['info']['title'] if job['info'] else job['url'],
+                "Format": job['options']['format_choice'],
+                "Quality": job['options']['quality_choice'],
+                "Finished": datetime.fromtimestamp(job['updated']).strftime("%Y-%m-%d %H:%M"),
+                "File": "✅ On disk" if os.path.exists(job['result']['path']) else "🗑️ Removed",
+            }
+            for job in jobs
+        ],
+        column_config={"Re-queue": st.column_config.CheckboxColumn("🔁", help="Download again")},
+        disabled=["Title", "Format", "Quality", "Finished", "File"],
+        # A new page (or "select all") starts from a fresh selection
+        key=f"history_{session is None}_{page}_{select_all}",
+        use_container_width=True,
+        hide_index=True,
+    )
+    selected = [job['id'] for job, row in zip(jobs, rows) if row["Re-queue"]]
+
+    if st.button(f"🔁 Re-queue selected ({len(selected)})", type="primary", disabled=not selected,
+                 use_container_width=True):
+        # Shown on the Playlist page like any other batch
+        st.session_state.batch_job = manager.requeue(selected, session=st.session_state.session_id)
+        st.success(f"✅ {len(selected)} downloads queued again. Downloads still on disk are ready at once.")
+        st.info("🎶 Follow the batch on the \"🎶 Playlist Downloader\" page from the left menu.")
@@ -0,0 +1,197 @@
+"""Bandwidth shaping for downloads.
+
+Every running download is a flow. A flow takes tokens from up to three
+buckets before it may keep what it received: the global bucket, its
+session's bucket and its own. When a global cap is set, the flows split
+it by weight (interactive single videos weigh more than batch items), so
+one large batch cannot starve a single-video download.
+
+Flows are yt-dlp progress hooks: the hook blocks the downloading thread
+until the bytes it just received fit in the buckets. That covers yt-dlp's
+own downloaders and the RangeDownloader workers alike.
+"""
+import os
+import re
+import threading
+import time
+
+
+INTERACTIVE_WEIGHT = 4
+BATCH_WEIGHT = 1
+
+RATE_RE = re.compile(r"^\s*([\d.]+)\s*([kmg]?)i?b?\s*(?:/s)?\s*$", re.IGNORECASE)
+UNITS = {'': 1, 'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3}
+
+
+def parse_rate(text):
+    """Bytes per second from text like ``500K`` or ``2.5M``; None for no limit"""
+    if text is None or str(text).strip() in ("", "0"):
+        return None
+    match = RATE_RE.match(str(text))
+    if not match:
+        raise ValueError(f"Invalid rate: {text!r} (use e.g. 500K or 10M)")
+    rate = float(match.group(1)) * UNITS[match.group(2).lower()]
+    return rate or None
+
+
+class TokenBucket:
+    """Refills at ``rate`` bytes per second, holding at most one second of tokens.
+
+    It starts empty, so a new download does not begin with a burst. Takers
+    may overdraw it; the debt tells them how long to wait.
+    """
+
+    def __init__(self, rate):
+        self._lock = threading.Lock()
+        self.rate = rate
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+
+    def set_rate(self, rate):
+        with self._lock:
+            self._refill()
+            self.rate = rate
+            self._tokens = min(self._tokens, rate)
+
+    def take(self, nbytes):
+        """Take ``nbytes`` and return the seconds to wait before using them"""
+        with self._lock:
+            self._refill()
+            self._tokens -= nbytes
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+class Flow:
+    """One throttled download; use it as a yt-dlp progress hook"""
+
+    def __init__(self, shaper, session, weight, rate):
+        self.shaper = shaper
+        self.session = session
+        self.weight = weight
+        self.rate = rate
+        self.bucket = TokenBucket(rate) if rate else None
+        self._lock = threading.Lock()
+        self._last = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __call__(self, d):
+        if d.get('status') != 'downloading':
+            with self._lock:
+                self._last = 0
+            return
+        downloaded = d.get('downloaded_bytes') or 0
+        with self._lock:
+            # Counts going down mean a retried range or the next file: nothing new arrived
+            delta = max(downloaded - self._last, 0)
+            self._last = downloaded
+        self.consume(delta)
+
+    def consume(self, nbytes):
+        """Block until ``nbytes`` more bytes are within every limit"""
+        if nbytes <= 0:
+            return
+        wait = 0.0
+        for bucket in self.shaper.buckets(self):
+            wait = max(wait, bucket.take(nbytes))
+        if wait > 0:
+            time.sleep(wait)
+
+    def set_rate(self, rate):
+        self.rate = rate
+        if rate is None:
+            self.bucket = None
+        elif self.bucket is None:
+            self.bucket = TokenBucket(rate)
+        else:
+            self.bucket.set_rate(rate)
+
+    def close(self):
+        self.shaper.release(self)
+
+
+class BandwidthShaper:
+    """Global, per-session and per-job rate limits with weighted fair sharing"""
+
+    def __init__(self, global_rate=None, session_rate=None, job_rate=None):
+        self.global_rate = global_rate
+        self.session_rate = session_rate
+        self.job_rate = job_rate
+        self._lock = threading.Lock()
+        self._global = TokenBucket(global_rate) if global_rate else None
+        self._sessions = {}
+        self._flows = []
+
+    def flow(self, session=None, weight=BATCH_WEIGHT):
+        """Register a download; close the returned Flow when it is over"""
+        flow = Flow(self, session, weight, self.job_rate)
+        with self._lock:
+            self._flows.append(flow)
+            if session is not None and self.session_rate and session not in self._sessions:
+                self._sessions[session] = TokenBucket(self.session_rate)
+            self._rebalance()
+        return flow
+
+    def release(self, flow):
+        with self._lock:
+            if flow not in self._flows:
+                return
+            self._flows.remove(flow)
+            if flow.session is not None and not any(other.session == flow.session for other in self._flows):
+                self._sessions.pop(flow.session, None)
+            self._rebalance()
+
+    def buckets(self, flow):
+        buckets = []
+        if self._global is not None:
+            buckets.append(self._global)
+        session_bucket = self._sessions.get(flow.session)
+        if session_bucket is not None:
+            buckets.append(session_bucket)
+        if flow.bucket is not None:
+            buckets.append(flow.bucket)
+        return buckets
+
+    def active(self):
+        with self._lock:
+            return len(self._flows)
+
+    def _rebalance(self):
+        """Give every flow its weighted share of the global rate, capped by the per-job rate"""
+        if not self.global_rate:
+            return
+        total_weight = sum(flow.weight for flow in self._flows)
+        for flow in self._flows:
+            share = self.global_rate * flow.weight / total_weight
+            flow.set_rate(min(share, self.job_rate) if self.job_rate else share)
+
+
+_shaper = None
+_shaper_lock = threading.Lock()
+
+
+def get_shaper():
+    """The shaper shared by every session in this process.
+
+    ``YTDL_RATE_LIMIT`` caps all downloads together, ``YTDL_SESSION_RATE_LIMIT``
+    each browser session and ``YTDL_JOB_RATE_LIMIT`` each download (e.g.
+    ``20M`` for 20 MB/s; unset for no limit).
+    """
+    global _shaper
+    with _shaper_lock:
+        if _shaper is None:
+            _shaper = BandwidthShaper(
+                global_rate=parse_rate(os.environ.get("YTDL_RATE_LIMIT")),
+                session_rate=parse_rate(os.environ.get("YTDL_SESSION_RATE_LIMIT")),
+                job_rate=parse_rate(os.environ.get("YTDL_JOB_RATE_LIMIT")),
+            )
+        return _shaper
@@ -0,0 +1,64 @@
+"""Compact per-item results of a batch for the Playlist page.
+
+A batch can hold thousands of videos. The page renders one page of
+``BatchItem`` rows at a time plus counters from ``batch_summary``, so each
+poll costs the same whatever the size of the batch. Failures can be
+exported as CSV or JSON.
+"""
+import csv
+import io
+import json
+
+from script.job_store import ERROR, FINISHED, QUEUED, RUNNING
+
+
+STATUS_LABELS = {
+    QUEUED: "⏳ Queued",
+    RUNNING: "🔄 Downloading",
+    FINISHED: "✅ Downloaded",
+    ERROR: "❌ Error",
+}
+
+CACHED_LABEL = "♻️ Already downloaded"
+
+EXPORT_FIELDS = ('number', 'url', 'error')
+
+
+class BatchItem:
+    """One batch item: only what the results table and the exports need"""
+
+    __slots__ = ('number', 'url', 'status', 'cached', 'error')
+
+    def __init__(self, position, url, status, cached=False, error=None):
+        self.number = position + 1
+        self.url = url
+        self.status = status
+        self.cached = cached
+        self.error = error
+
+    @property
+    def label(self):
+        return CACHED_LABEL if self.status == FINISHED and self.cached else STATUS_LABELS[self.status]
+
+    def as_row(self):
+        """A row of the results table"""
+        return {"#": self.number, "Status": self.label, "URL": self.url, "Note": self.error or ""}
+
+
+def failures_csv(items):
+    """``number,url,error`` lines of the failed ``items``"""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(EXPORT_FIELDS)
+    for item in items:
+        if item.status == ERROR:
+            writer.writerow([getattr(item, field) for field in EXPORT_FIELDS])
+    return output.getvalue()
+
+
+def failures_json(items):
+    """The failed ``items`` as a JSON list of ``{number, url, error}``"""
+    return json.dumps(
+        [{field: getattr(item, field) for field in EXPORT_FIELDS} for item in items if item.status == ERROR],
+        ensure_ascii=False, indent=2,
+    )
@@ -0,0 +1,106 @@
+"""Indexed catalogue of downloaded files.
+
+Rows are written by a yt-dlp postprocessor (``CatalogueRecorder`` in
+``script.download_engine``) that runs once a file has reached its final
+location, so listing downloads never has to scan the
+Downloads folder.
+"""
+import os
+import threading
+import time
+
+from script.db import connect, state_file
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS downloads (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    store_key TEXT,
+    video_id TEXT NOT NULL,
+    title TEXT NOT NULL COLLATE NOCASE,
+    format TEXT NOT NULL,
+    quality TEXT,
+    ext TEXT,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS downloads_video ON downloads (video_id, created);
+CREATE INDEX IF NOT EXISTS downloads_title ON downloads (title COLLATE NOCASE, created);
+CREATE INDEX IF NOT EXISTS downloads_format ON downloads (format, created);
+CREATE INDEX IF NOT EXISTS downloads_created ON downloads (created);
+CREATE INDEX IF NOT EXISTS downloads_store_key ON downloads (store_key);
+"""
+
+
+class Catalogue:
+    """SQLite table of downloaded files with paged queries"""
+
+    def __init__(self, db_path):
+        self._db = connect(db_path)
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def record(self, video_id, title, format_choice, quality, path, store_key=None):
+        """Add a finished download"""
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO downloads (store_key, video_id, title, format, quality, ext, path, size, created)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    store_key, video_id, title, format_choice, quality,
+                    os.path.splitext(path)[1].lstrip('.'), path, os.path.getsize(path), time.time(),
+                ),
+            )
+
+    def forget(self, store_keys):
+        """Drop rows whose store entries were evicted"""
+        with self._lock:
+            self._db.executemany("DELETE FROM downloads WHERE store_key = ?", [(key,) for key in store_keys])
+
+    def query(self, video_id=None, title=None, format_choice=None, limit=20, offset=0):
+        """One page of downloads, newest first.
+
+        ``title`` matches titles starting with the given text (case-insensitive).
+        """
+        where, params = self._filters(video_id, title, format_choice)
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT * FROM downloads {where} ORDER BY created DESC LIMIT ? OFFSET ?",
+                (*params, limit, offset),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def count(self, video_id=None, title=None, format_choice=None):
+        where, params = self._filters(video_id, title, format_choice)
+        with self._lock:
+            return self._db.execute(f"SELECT COUNT(*) FROM downloads {where}", params).fetchone()[0]
+
+    @staticmethod
+    def _filters(video_id, title, format_choice):
+        clauses, params = [], []
+        if video_id:
+            clauses.append("video_id = ?")
+            params.append(video_id)
+        if title:
+            # Range scan on the NOCASE index instead of a full-table LIKE
+            clauses.append("title >= ? AND title < ?")
+            params += [title, title + "\U0010ffff"]
+        if format_choice:
+            clauses.append("format = ?")
+            params.append(format_choice)
+        where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+        return where, params
+
+
+_catalogue = None
+_catalogue_lock = threading.Lock()
+
+
+def get_catalogue():
+    """The catalogue shared by every session in this process"""
+    global _catalogue
+    with _catalogue_lock:
+        if _catalogue is None:
+            _catalogue = Catalogue(state_file("catalogue.sqlite"))
+        return _catalogue
@@ -0,0 +1,312 @@
+"""Content-addressed store for finished downloads.
+
+Every download is keyed by (video, format selector, postprocessor
+settings). A repeat request for the same key is answered from the index
+without downloading again. The store has a size cap and evicts the least
+recently (LRU) or least frequently (LFU) used entries to stay under it.
+
+Several processes (the app and ``python -m script.worker``) can share a
+store: a download holds an exclusive lock on its entry folder, so the
+same key is downloaded once however many processes ask for it.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: downloads are claimed within the process only
+    fcntl = None
+
+from script.catalogue import get_catalogue
+from script.db import connect, state_file
+from script.disk_space import (
+    PARTIAL_MAX_AGE, PARTIAL_SUFFIXES, RESUME_MAX_AGE, is_resumable, keep_resumable, partial_files, remove_partials,
+)
+from script.urls import video_id_from_url
+
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    video_id TEXT NOT NULL,
+    title TEXT,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS entries_video ON entries (video_id);
+CREATE INDEX IF NOT EXISTS entries_lru ON entries (accessed);
+CREATE INDEX IF NOT EXISTS entries_lfu ON entries (hits, accessed);
+"""
+
+EVICTION_ORDER = {
+    'lru': "accessed",
+    'lfu': "hits, accessed",
+}
+
+
+def video_identity(info):
+    """Stable identity of a video across URL spellings"""
+    return f"{info.get('extractor_key') or info.get('extractor') or 'generic'}:{info['id']}"
+
+
+def url_identity(url):
+    """``video_identity`` of a YouTube video URL without looking it up, else None"""
+    video_id = video_id_from_url(url)
+    return f"Youtube:{video_id}" if video_id else None
+
+
+def store_key(video_id, ydl_opts):
+    """Key of a download: the video plus everything that changes the output file"""
+    spec = {
+        'video': video_id,
+        'format': ydl_opts.get('format'),
+        'postprocessors': ydl_opts.get('postprocessors') or [],
+    }
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()
+
+
+class ContentStore:
+    """Files under ``root/<key[:2]>/<key>/`` plus an SQLite index"""
+
+    def __init__(self, root, db_path, max_bytes=None, policy='lru', on_evict=None):
+        if policy not in EVICTION_ORDER:
+            raise ValueError(f"Unknown eviction policy: {policy}")
+        self.root = root
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.on_evict = on_evict
+        self._db = connect(db_path)
+        self._db.executescript(SCHEMA)
+        self._lock = threading.RLock()
+        self._key_locks = {}
+
+    def entry_dir(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def get(self, key):
+        """Stored entry for ``key`` (and count the hit), or None"""
+        with self._lock:
+            row = self._db.execute("SELECT * FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if not os.path.exists(row['path']):
+                # Removed behind our back
+                self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                return None
+            self._db.execute("UPDATE entries SET accessed = ?, hits = hits + 1 WHERE key = ?", (time.time(), key))
+            return dict(row)
+
+    def fetch(self, key, video_id, title, download):
+        """Return ``(entry, cached)`` for ``key``.
+
+        When the key is not stored yet, ``download(entry_dir)`` is called to
+        produce the file. Concurrent requests for the same key wait for the
+        first one instead of downloading twice. A failed download leaves
+        its partial files in ``entry_dir`` for the next attempt to resume.
+        """
+        entry = self.get(key)
+        if entry is not None:
+            return entry, True
+
+        with self._locked(key):
+            entry = self.get(key)
+            if entry is not None:
+                return entry, True
+
+            entry_dir = self.entry_dir(key)
+            try:
+                download(entry_dir)
+                entry = self._add(key, video_id, title, entry_dir)
+            except BaseException:
+                keep_resumable(entry_dir)
+                raise
+        self.evict()
+        return entry, False
+
+    def remove(self, keys):
+        """Delete entries and their files, e.g. videos no longer in a mirrored playlist"""
+        removed = []
+        with self._lock:
+            for key in keys:
+                if self._db.execute("DELETE FROM entries WHERE key = ?", (key,)).rowcount:
+                    removed.append(key)
+                shutil.rmtree(self.entry_dir(key), ignore_errors=True)
+        if removed and self.on_evict is not None:
+            self.on_evict(removed)
+        return removed
+
+    def total_size(self):
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def evict(self):
+        """Remove entries until the store fits in ``max_bytes``"""
+        if not self.max_bytes:
+            return []
+        return self.free_up(self.total_size() - self.max_bytes)
+
+    def free_up(self, nbytes):
+        """Remove entries in eviction order until ``nbytes`` are freed, e.g. for a download that does not fit"""
+        evicted = []
+        if nbytes <= 0:
+            return evicted
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT key, size FROM entries ORDER BY {EVICTION_ORDER[self.policy]}"
+            ).fetchall()
+            for row in rows:
+                if nbytes <= 0:
+                    break
+                if row['key'] in self._key_locks:
+                    continue
+                shutil.rmtree(self.entry_dir(row['key']), ignore_errors=True)
+                self._db.execute("DELETE FROM entries WHERE key = ?", (row['key'],))
+                nbytes -= row['size']
+                evicted.append(row['key'])
+        if evicted and self.on_evict is not None:
+            self.on_evict(evicted)
+        return evicted
+
+    def remove_orphans(self, max_age=PARTIAL_MAX_AGE):
+        """Delete what crashed downloads left behind; returns how many folders.
+
+        Unfinished entry folders and staged conversions count as left behind
+        once nothing touched them for ``max_age`` seconds; entry folders
+        with a resumable partial download only after ``RESUME_MAX_AGE``.
+        """
+        if not os.path.isdir(self.root):
+            return 0
+        with self._lock:
+            keys = {row[0] for row in self._db.execute("SELECT key FROM entries")}
+            busy = set(self._key_locks)
+        orphans = []
+        resumable = []
+        for prefix in os.listdir(self.root):
+            folder = os.path.join(self.root, prefix)
+            if not os.path.isdir(folder):
+                continue
+            if prefix == ".staging":
+                orphans += [os.path.join(folder, name) for name in os.listdir(folder)]
+            elif len(prefix) == 2:
+                for key in os.listdir(folder):
+                    if key in keys or key in busy:
+                        continue
+                    path = os.path.join(folder, key)
+                    if os.path.isdir(path) and any(is_resumable(name) for name in os.listdir(path)):
+                        resumable.append(path)
+                    else:
+                        orphans.append(path)
+        return remove_partials(orphans, max_age) + remove_partials(resumable, max(max_age, RESUME_MAX_AGE))
+
+    def _add(self, key, video_id, title, entry_dir):
+        files = [
+            os.path.join(entry_dir, name) for name in os.listdir(entry_dir)
+            if not name.endswith(PARTIAL_SUFFIXES)
+        ]
+        if not files:
+            raise RuntimeError("Download finished without producing a file")
+        path = max(files, key=os.path.getsize)
+        now = time.time()
+        entry = {
+            'key': key, 'video_id': video_id, 'title': title, 'path': path,
+            'size': os.path.getsize(path), 'created': now, 'accessed': now, 'hits': 0,
+        }
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, video_id, title, path, size, created, accessed, hits)"
+                " VALUES (:key, :video_id, :title, :path, :size, :created, :accessed, :hits)",
+                entry,
+            )
+        return entry
+
+    @contextmanager
+    def _locked(self, key):
+        with self._lock:
+            lock, users = self._key_locks.get(key, (threading.Lock(), 0))
+            self._key_locks[key] = (lock, users + 1)
+        try:
+            with lock, self._claimed(key):
+                yield
+        finally:
+            with self._lock:
+                lock, users = self._key_locks[key]
+                if users == 1:
+                    del self._key_locks[key]
+                else:
+                    self._key_locks[key] = (lock, users - 1)
+
+    @contextmanager
+    def _claimed(self, key):
+        """Hold ``key`` against other processes: an exclusive ``flock`` on its entry folder"""
+        entry_dir = self.entry_dir(key)
+        os.makedirs(entry_dir, exist_ok=True)
+        if fcntl is None:
+            yield
+            return
+        fd = os.open(entry_dir, os.O_RDONLY)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            # Closing releases the lock
+            os.close(fd)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_content_store(download_path="Downloads"):
+    """The content store shared by every session in this process.
+
+    ``YTDL_STORE_MAX_GB`` caps its size (20 GB by default, 0 for no cap) and
+    ``YTDL_STORE_POLICY`` picks the eviction policy (``lru`` or ``lfu``).
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            max_gb = float(os.environ.get("YTDL_STORE_MAX_GB", 20))
+            _store = ContentStore(
+                os.path.join(download_path, "store"),
+                state_file("store.sqlite"),
+                max_bytes=int(max_gb * 1024 ** 3) or None,
+                policy=os.environ.get("YTDL_STORE_POLICY", "lru"),
+                on_evict=get_catalogue().forget,
+            )
+            removed = _store.remove_orphans() + remove_partials(partial_files(download_path))
+            if removed:
+                logger.info("🧹 Removed %d unfinished downloads", removed)
+        return _store
+
+
+def open_store(download_path, default_path="Downloads"):
+    """The shared store for the default folder, a separate one anywhere else.
+
+    A separate store keeps its index next to its files
+    (``<folder>/store.sqlite``): evicting from one store never touches the
+    files of another.
+    """
+    if os.path.abspath(download_path) == os.path.abspath(default_path):
+        return get_content_store(default_path)
+    os.makedirs(download_path, exist_ok=True)
+    store = ContentStore(
+        os.path.join(download_path, "store"),
+        os.path.join(download_path, "store.sqlite"),
+        on_evict=get_catalogue().forget,
+    )
+    removed = store.remove_orphans()
+    if removed:
+        logger.info("🧹 Removed %d unfinished downloads", removed)
+    return store
@@ -0,0 +1,24 @@
+"""SQLite helpers shared by the on-disk stores."""
+import os
+import sqlite3
+
+
+STATE_PATH = ".ytdl"
+
+
+def state_file(name):
+    """Path of a state file inside the application state folder"""
+    if not os.path.exists(STATE_PATH):
+        os.makedirs(STATE_PATH, exist_ok=True)
+    return os.path.join(STATE_PATH, name)
+
+
+def connect(path):
+    """Open a connection that can be shared between threads behind a lock"""
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
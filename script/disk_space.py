@@ -0,0 +1,240 @@
+"""Disk space admission for downloads.
+
+Before a download starts, its expected size (from the planned formats,
+twice that when a merge or conversion writes a second copy) is reserved
+against the free space of the download volume. Downloads that do not
+fit wait until the running ones finish; one that does not fit even with
+nothing else running first makes the content store evict cached files,
+then fails at once instead of filling the disk halfway through.
+
+While a download runs its reservation shrinks by the bytes written, and
+the free space is checked again every few megabytes: a download larger
+than announced, or another process filling the volume, stops the
+download before the disk is full. Reservations are per process; workers
+in other processes only show up in the free space checks.
+
+``remove_partials`` deletes partial files that crashed downloads left;
+``keep_resumable`` clears a failed download's folder except for what the
+next attempt resumes from.
+"""
+import errno
+import logging
+import os
+import shutil
+import threading
+import time
+
+from script.metrics import REGISTRY, Counter, Gauge
+from script.progress import format_bytes
+
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+# Kept free for everything else on the volume (and the catalogue, logs...)
+HEADROOM = int(float(os.environ.get("YTDL_DISK_HEADROOM_MB", 256)) * MB)
+# Running downloads check the free space again after this many bytes
+CHECK_BYTES = 8 * MB
+# Partial downloads untouched for this long belong to crashed downloads
+PARTIAL_MAX_AGE = float(os.environ.get("YTDL_PARTIAL_MAX_AGE_HOURS", 1)) * 3600
+PARTIAL_SUFFIXES = ('.part', '.ytdl', '.part.json', '.tmp')
+# What an interrupted transfer continues from: the partial file and its
+# chunk manifest (``script.range_download``) or yt-dlp's fragment state
+RESUME_SUFFIXES = ('.part', '.part.json', '.ytdl')
+# Resumable partial downloads are kept this long
+RESUME_MAX_AGE = float(os.environ.get("YTDL_RESUME_MAX_AGE_HOURS", 24)) * 3600
+# Waiting downloads look again this often, for space freed by other processes
+WAIT_INTERVAL = 5.0
+
+HOLDS = REGISTRY.register(Counter(
+    "ytdl_disk_holds_total", "Downloads held back until enough disk space was free",
+))
+
+
+class InsufficientSpaceError(OSError):
+    """Raised instead of filling the download volume"""
+
+    def __init__(self, message):
+        super().__init__(errno.ENOSPC, f"Not enough disk space: {message}")
+
+
+class Reservation:
+    """Space promised to one running download; also a yt-dlp progress hook"""
+
+    def __init__(self, guard, nbytes):
+        self.guard = guard
+        self.nbytes = nbytes
+        self._written = {}
+        self._checked = 0
+        self._error = None
+        self._lock = threading.Lock()
+
+    @property
+    def remaining(self):
+        """Reserved bytes not written yet"""
+        with self._lock:
+            return max(self.nbytes - sum(self._written.values()), 0)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def __call__(self, d):
+        if self._error is not None:
+            # Range downloads retry their chunks; keep failing them
+            raise self._error
+        if d.get('status') != 'downloading':
+            return
+        with self._lock:
+            # Merged formats download one file after the other
+            self._written[d.get('filename')] = d.get('downloaded_bytes') or 0
+            written = sum(self._written.values())
+            if written - self._checked < CHECK_BYTES:
+                return
+            self._checked = written
+        free = self.guard.free()
+        if free < self.guard.headroom // 2:
+            self._error = InsufficientSpaceError(f"only {format_bytes(free)} left on the download volume")
+            raise self._error
+
+    def release(self):
+        self.guard._release(self)
+
+
+class DiskGuard:
+    """Space reservations on the volume that holds ``path``"""
+
+    def __init__(self, path, headroom=HEADROOM):
+        self.path = path
+        self.headroom = headroom
+        self._reservations = set()
+        self._changed = threading.Condition()
+
+    def free(self):
+        return shutil.disk_usage(self.path).free
+
+    def reserved(self):
+        """Bytes promised to running downloads and not written yet"""
+        with self._changed:
+            return sum(reservation.remaining for reservation in self._reservations)
+
+    def available(self):
+        """Free bytes not promised to running downloads, minus the headroom"""
+        return self.free() - self.reserved() - self.headroom
+
+    def reserve(self, nbytes, on_hold=None, reclaim=None):
+        """A ``Reservation`` of ``nbytes``, once they fit.
+
+        ``on_hold()`` is called when the download has to wait;
+        ``reclaim(nbytes)`` may delete cached files and returns whether it
+        did. Raises ``InsufficientSpaceError`` when the bytes cannot fit
+        even with nothing else running.
+        """
+        nbytes = max(int(nbytes or 0), 0)
+        held = False
+        with self._changed:
+            while True:
+                available = self.available()
+                if nbytes <= available:
+                    break
+                if not self._reservations:
+                    # Nothing to wait for
+                    if reclaim is not None and reclaim(nbytes - available):
+                        continue
+                    raise InsufficientSpaceError(
+                        f"{format_bytes(nbytes)} needed, {format_bytes(max(available, 0))} available"
+                    )
+                if not held:
+                    held = True
+                    HOLDS.inc()
+                    logger.info("Holding a download of %s until disk space is free", format_bytes(nbytes))
+                    if on_hold is not None:
+                        on_hold()
+                self._changed.wait(WAIT_INTERVAL)
+            reservation = Reservation(self, nbytes)
+            self._reservations.add(reservation)
+        return reservation
+
+    def _release(self, reservation):
+        with self._changed:
+            self._reservations.discard(reservation)
+            self._changed.notify_all()
+
+
+_guards = {}
+_guards_lock = threading.Lock()
+
+
+def get_disk_guard(path):
+    """The guard of the volume holding ``path``, shared by every download of this process"""
+    os.makedirs(path, exist_ok=True)
+    device = os.stat(path).st_dev
+    with _guards_lock:
+        guard = _guards.get(device)
+        if guard is None:
+            guard = _guards[device] = DiskGuard(path)
+            if len(_guards) == 1:
+                REGISTRY.register(Gauge("ytdl_disk_free_bytes", "Free space on the download volume", func=guard.free))
+                REGISTRY.register(Gauge(
+                    "ytdl_disk_reserved_bytes", "Disk space reserved by running downloads", func=guard.reserved,
+                ))
+        return guard
+
+
+def last_modified(path):
+    """Newest modification time of ``path`` and everything below it"""
+    newest = os.path.getmtime(path)
+    for folder, _, files in os.walk(path):
+        for name in files:
+            try:
+                newest = max(newest, os.path.getmtime(os.path.join(folder, name)))
+            except OSError:
+                pass
+    return newest
+
+
+def remove_partials(paths, max_age=PARTIAL_MAX_AGE):
+    """Delete files and folders among ``paths`` untouched for ``max_age`` seconds; returns how many"""
+    cutoff = time.time() - max_age
+    removed = 0
+    for path in paths:
+        try:
+            if last_modified(path) > cutoff:
+                continue
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+        except OSError:
+            continue
+        removed += 1
+    return removed
+
+
+def is_resumable(name):
+    return name.endswith(RESUME_SUFFIXES)
+
+
+def keep_resumable(folder):
+    """Delete everything in ``folder`` but resumable partial files; the folder too when nothing is left"""
+    for name in os.listdir(folder):
+        path = os.path.join(folder, name)
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        elif not is_resumable(name):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    if not os.listdir(folder):
+        os.rmdir(folder)
+
+
+def partial_files(folder):
+    """Partial download files directly in ``folder``"""
+    if not os.path.isdir(folder):
+        return []
+    return [os.path.join(folder, name) for name in os.listdir(folder) if name.endswith(PARTIAL_SUFFIXES)]
@@ -0,0 +1,719 @@
+"""Shared download core: format selection and a bounded download worker pool."""
+import copy
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import yt_dlp
+from yt_dlp.networking import Request
+from yt_dlp.postprocessor.common import PostProcessor
+from yt_dlp.utils import DownloadError
+
+from script.catalogue import get_catalogue
+from script.content_store import store_key, url_identity, video_identity
+from script.disk_space import get_disk_guard
+from script.errors import classify_error, is_expired_url
+from script.formats import plan_formats
+from script.metadata_cache import cache_key, get_metadata_cache
+from script.metrics import DOWNLOADS, ERRORS, METADATA_LOOKUPS, RETRIES, STAGE_SECONDS
+from script.progress import ProgressPipeline
+from script.range_download import RangeDownloader
+from script.retry import CircuitBreaker, RetryPolicy
+from script.transcode import audio_options
+from script.ydl_pool import borrow_ydl, session_ydl
+
+
+logger = logging.getLogger(__name__)
+
+DOWNLOAD_PATH = "Downloads"
+
+# Progressive files at least this large are fetched as parallel byte ranges
+RANGE_MIN_SIZE = 8 * 1024 * 1024
+RANGE_WORKERS = int(os.environ.get("YTDL_RANGE_WORKERS", 4))
+
+# Seconds a failed lookup of ``get_video_info`` is answered from memory
+FAILED_LOOKUP_TTL = float(os.environ.get("YTDL_FAILED_LOOKUP_TTL", 60))
+_failed_lookups = {}
+_failed_lookups_lock = threading.Lock()
+
+
+def extract_video_info(url):
+    """Fetch video information, using the metadata cache when possible.
+
+    Raises the yt-dlp error when the video cannot be extracted.
+    """
+    return lookup_video_info(url)[0]
+
+
+def lookup_video_info(url):
+    """Like ``extract_video_info``, but returns ``(info, cached)``.
+
+    ``cached`` tells whether the info came from the metadata cache.
+    """
+    cache = get_metadata_cache()
+    key = cache_key(url)
+    info = cache.get(key)
+    cached = info is not None
+    METADATA_LOOKUPS.inc(result='hit' if cached else 'miss')
+    if not cached:
+        ydl_opts = {
+            'quiet': True,
+            'no_warnings': True,
+        }
+        with STAGE_SECONDS.time(stage='extraction'), borrow_ydl(ydl_opts) as ydl:
+            info = ydl.sanitize_info(ydl.extract_info(url, download=False), remove_private_keys=True)
+        cache.put(key, info)
+    return info, cached
+
+
+def get_video_info(url):
+    """Fetch video information, or None when it cannot be extracted.
+
+    Failures are remembered for ``FAILED_LOOKUP_TTL`` seconds, so a page
+    asking again does not repeat the network call. Downloads use
+    ``extract_video_info`` and are not affected.
+    """
+    key = cache_key(url)
+    now = time.monotonic()
+    with _failed_lookups_lock:
+        if _failed_lookups.get(key, 0) > now:
+            return None
+    try:
+        return extract_video_info(url)
+    except Exception:
+        with _failed_lookups_lock:
+            for stale in [stale for stale, until in _failed_lookups.items() if until <= now]:
+                del _failed_lookups[stale]
+            _failed_lookups[key] = now + FAILED_LOOKUP_TTL
+        return None
+
+
+def get_playlist_info(url):
+    """Get playlist information"""
+    cache = get_metadata_cache()
+    key = cache_key(url, prefix="playlist")
+    info = cache.get(key)
+    if info is None:
+        ydl_opts = {
+            'quiet': True,
+            'no_warnings': True,
+            'extract_flat': True,  # Get only the playlist info, don't download videos
+        }
+        with borrow_ydl(ydl_opts) as ydl:
+            try:
+                info = ydl.sanitize_info(ydl.extract_info(url, download=False))
+            except Exception:
+                return None
+        cache.put(key, info)
+    return info
+
+
+def safe_filename(filename):
+    """Create a safe file name"""
+    return "".join(c for c in filename if c.isalnum() or c in (' ', '-', '_', '.')).rstrip()
+
+
+def get_format_selector(format_choice, quality_choice):
+    """Return the yt-dlp format selector and a readable quality label"""
+    if format_choice == "MP4 (Video)":
+        if quality_choice == "Highest Quality":
+            return 'best[ext=mp4]', "Highest Quality"
+        elif quality_choice == "720p":
+            return 'best[height<=720][ext=mp4]/best[ext=mp4]', "720p or best available"
+        elif quality_choice == "480p":
+            return 'best[height<=480][ext=mp4]/best[ext=mp4]', "480p or best available"
+        else:  # 360p
+            return 'best[height<=360][ext=mp4]/worst[ext=mp4]', "360p or lowest available"
+    if format_choice == "M4A (Audio)":
+        return 'bestaudio[ext=m4a]/bestaudio/best', "Best Audio Quality"
+    # MP3 (Audio)
+    return 'bestaudio/best', "Best Audio Quality"
+
+
+def build_ydl_opts(format_choice, format_selector, output_template):
+    """Build the yt-dlp options used by every download"""
+    ydl_opts = {
+        'format': format_selector,
+        'outtmpl': output_template,
+        'quiet': True,
+        'no_warnings': True,
+        'noprogress': True,  # progress is reported through ProgressPipeline
+    }
+
+    # Separate video and audio streams are merged into MP4 without re-encoding
+    if format_choice == "MP4 (Video)":
+        ydl_opts['merge_output_format'] = 'mp4'
+
+    # MP3 conversion settings
+    if format_choice == "MP3 (Audio)":
+        ydl_opts['postprocessors'] = [{
+            'key': 'FFmpegExtractAudio',
+            'preferredcodec': 'mp3',
+            'preferredquality': '192',
+        }]
+
+    # M4A: AAC audio is only remuxed, anything else is converted
+    if format_choice == "M4A (Audio)":
+        ydl_opts['postprocessors'] = [{
+            'key': 'FFmpegExtractAudio',
+            'preferredcodec': 'm4a',
+        }]
+
+    return ydl_opts
+
+
+class ResumableYoutubeDL(yt_dlp.YoutubeDL):
+    """YoutubeDL that fetches large single-file HTTP formats with RangeDownloader.
+
+    Interrupted transfers resume from the ``.part.json`` manifest next to
+    the partial file. Everything else (DASH, HLS, merges, subtitles) goes
+    through yt-dlp's own downloaders.
+
+    It also times format selection, the transfer and postprocessing for
+    the stage metrics.
+    """
+
+    # Postprocessor names and the stage they are reported under
+    PP_STAGES = {'Merger': 'merge', 'ExtractAudio': 'transcode'}
+
+    def __init__(self, params=None, auto_init=True):
+        super().__init__(params, auto_init)
+        self._selecting_since = None
+        self._pp_started = {}
+        self.add_postprocessor_hook(self._hook_postprocessor)
+
+    def process_video_result(self, info_dict, download=True):
+        self._selecting_since = time.monotonic()
+        return super().process_video_result(info_dict, download=download)
+
+    def process_info(self, info_dict):
+        if self._selecting_since is not None:
+            STAGE_SECONDS.observe(time.monotonic() - self._selecting_since, stage='format_selection')
+            self._selecting_since = None
+        return super().process_info(info_dict)
+
+    def dl(self, name, info, subtitle=False, test=False):
+        if test or subtitle:
+            return super().dl(name, info, subtitle=subtitle, test=test)
+        with STAGE_SECONDS.time(stage='transfer'):
+            return self._download(name, info)
+
+    def _download(self, name, info, subtitle=False, test=False):
+        size = info.get('filesize') or info.get('filesize_approx') or 0
+        if (
+            test or subtitle or name == '-'
+            or info.get('protocol') not in ('http', 'https')
+            or info.get('requested_formats')
+            or 0 < size < RANGE_MIN_SIZE
+            or RANGE_WORKERS < 2
+        ):
+            return super().dl(name, info, subtitle=subtitle, test=test)
+
+        if os.path.isfile(name):
+            self._hook_finished(name, info, os.path.getsize(name))
+            return True, False
+
+        started = time.time()
+
+        def progress(downloaded, total):
+            elapsed = time.time() - started
+            self._hook_progress({
+                'status': 'downloading',
+                'filename': name,
+                'tmpfilename': name + '.part',
+                'downloaded_bytes': downloaded,
+                'total_bytes': total,
+                'elapsed': elapsed,
+                'speed': downloaded / elapsed if elapsed else None,
+            }, info)
+
+        headers = info.get('http_headers') or self._calc_headers(info)
+        RangeDownloader(
+            info['url'], name, headers=headers, workers=RANGE_WORKERS,
+            opener=lambda url, headers: self.urlopen(Request(url, headers=headers)),
+            progress=progress,
+        ).download()
+        self._hook_finished(name, info, os.path.getsize(name))
+        return True, True
+
+    def _hook_postprocessor(self, d):
+        name = d.get('postprocessor')
+        if d.get('status') == 'started':
+            self._pp_started[name] = time.monotonic()
+        elif d.get('status') == 'finished' and name in self._pp_started:
+            STAGE_SECONDS.observe(
+                time.monotonic() - self._pp_started.pop(name), stage=self.PP_STAGES.get(name, 'postprocess'),
+            )
+
+    def _hook_progress(self, status, info):
+        status['info_dict'] = info
+        for hook in self._progress_hooks:
+            hook(status)
+
+    def _hook_finished(self, name, info, size):
+        self._hook_progress({
+            'status': 'finished',
+            'filename': name,
+            'downloaded_bytes': size,
+            'total_bytes': size,
+        }, info)
+
+
+class CatalogueRecorder(PostProcessor):
+    """Records the final file of every download in the catalogue"""
+
+    def __init__(self, catalogue, video_id, format_choice, quality, store_key=None, downloader=None):
+        super().__init__(downloader)
+        self.catalogue = catalogue
+        self.video_id = video_id
+        self.format_choice = format_choice
+        self.quality = quality
+        self.store_key = store_key
+
+    def run(self, info):
+        path = info.get('filepath')
+        if path and os.path.exists(path):
+            self.catalogue.record(
+                self.video_id, info.get('title') or "Unknown", self.format_choice,
+                self.quality, path, store_key=self.store_key,
+            )
+        return [], info
+
+
+def download_url(url, ydl_opts, postprocessors=()):
+    """Download a single URL, extracting its metadata at most once.
+
+    The cached info dict is handed to ``process_ie_result`` so yt-dlp only
+    runs format selection and the download. If cached metadata has gone
+    stale (expired stream URLs: HTTP 403/410 or a transient error) the URL
+    is extracted afresh; other errors are raised as they are.
+    ``postprocessors`` are ``(postprocessor, when)`` pairs added to the
+    YoutubeDL instance, which runs on the shared download session.
+    """
+    info, cached = lookup_video_info(url)
+    with session_ydl(ydl_opts, ResumableYoutubeDL) as ydl:
+        for pp, when in postprocessors:
+            ydl.add_post_processor(pp, when=when)
+        try:
+            ydl.process_ie_result(copy.deepcopy(info), download=True)
+        except DownloadError as e:
+            if not cached or not is_expired_url(e):
+                raise
+            get_metadata_cache().invalidate(cache_key(url))
+            ydl.download([url])
+
+
+def space_needed(plan):
+    """Bytes to reserve for a planned download (0 when the size is unknown).
+
+    Merging and audio extraction write the output next to the downloaded
+    streams, so those need twice the size for a moment.
+    """
+    if plan is None or not plan['size']:
+        return 0
+    return plan['size'] * (2 if plan['merge'] or plan['audio'] else 1)
+
+
+def fetch_video(url, format_choice, quality_choice, store, video_info=None, progress_sinks=(), on_info=None,
+                on_download=None, transcoder=None, throttle=None, on_hold=None):
+    """Download one video the way the pages do, or reuse the stored copy.
+
+    The file goes into the content store and is recorded in the catalogue.
+    Returns ``{'path', 'size', 'cached', 'video_id', 'key'}`` (``key`` is the
+    content store key). With a ``transcoder``
+    the MP3 conversion is queued on it after the download and a Future of
+    that result is returned instead. ``on_info(video_info, quality_info)``
+    is called once the metadata is known. ``throttle`` is a progress hook
+    that paces the transfer (a ``script.bandwidth.Flow``).
+
+    The expected size is reserved on the download volume first (see
+    ``script.disk_space``); ``on_hold()`` is called when the download has
+    to wait for space.
+    """
+    started = time.monotonic()
+
+    def record_outcome(result=None, error=None):
+        STAGE_SECONDS.observe(time.monotonic() - started, stage='total')
+        if error is not None:
+            DOWNLOADS.inc(result='error')
+            ERRORS.inc(category=classify_error(error))
+        else:
+            DOWNLOADS.inc(result='cached' if result['cached'] else 'downloaded')
+
+    try:
+        result = _fetch_video(url, format_choice, quality_choice, store, video_info, progress_sinks, on_info,
+                              on_download, transcoder, throttle, on_hold)
+    except Exception as e:
+        record_outcome(error=e)
+        raise
+    if isinstance(result, Future):
+        result.add_done_callback(
+            lambda future: record_outcome(None if future.exception() else future.result(), future.exception())
+        )
+    else:
+        record_outcome(result)
+    return result
+
+
+def _fetch_video(url, format_choice, quality_choice, store, video_info, progress_sinks, on_info, on_download,
+                 transcoder, throttle, on_hold):
+    format_selector, quality_info = get_format_selector(format_choice, quality_choice)
+    ydl_opts = build_ydl_opts(format_choice, format_selector, None)
+    if video_info is None:
+        # Only what is cached already; a stored copy needs no lookup
+        video_info = get_metadata_cache().get(cache_key(url))
+
+    # The same video with the same choice is only ever downloaded once. The
+    # key uses the preset, not the formats planned from today's format list.
+    video_id = video_identity(video_info) if video_info is not None else url_identity(url)
+    key = store_key(video_id, ydl_opts) if video_id is not None else None
+
+    def result(entry, cached):
+        return {'path': entry['path'], 'size': entry['size'], 'cached': cached, 'video_id': video_id, 'key': key}
+
+    entry = store.get(key) if key is not None else None
+    if entry is not None:
+        if on_info is not None and video_info is not None:
+            on_info(video_info, quality_info)
+        return result(entry, True)
+
+    if video_info is None:
+        video_info = extract_video_info(url)
+        video_id = video_identity(video_info)
+        key = store_key(video_id, ydl_opts)
+    plan = plan_formats(video_info, format_choice, quality_choice)
+    if plan is not None:
+        # The planned formats, with the preset as a fallback if they are gone
+        ydl_opts['format'] = f"{plan['format']}/{format_selector}"
+        quality_info = plan['label']
+    if on_info is not None:
+        on_info(video_info, quality_info)
+
+    hooks = [throttle] if throttle is not None else []
+    if progress_sinks:
+        hooks.append(ProgressPipeline(progress_sinks))
+    if hooks:
+        ydl_opts['progress_hooks'] = hooks
+    title = video_info.get('title')
+
+    def reserve():
+        # The reservation also watches the free space while the file is written
+        reservation = get_disk_guard(store.root).reserve(space_needed(plan), on_hold=on_hold, reclaim=store.free_up)
+        ydl_opts['progress_hooks'] = [reservation, *hooks]
+        return reservation
+
+    # A stream copy is too cheap to be worth a trip to the transcode pool
+    copy_only = plan is not None and plan['audio'] == "copy"
+    options = audio_options(ydl_opts) if transcoder is not None and not copy_only else None
+    if options is not None:
+        entry = store.get(key)
+        if entry is not None:
+            return result(entry, True)
+
+        def record(path):
+            get_catalogue().record(video_id, title or "Unknown", format_choice, quality_info, path, store_key=key)
+
+        return _download_and_transcode(
+            url, ydl_opts, store, key, video_id, title, transcoder, options, on_download, record, result, reserve,
+        )
+
+    def download(entry_dir):
+        ydl_opts['outtmpl'] = os.path.join(entry_dir, "%(title)s [%(id)s].%(ext)s")
+        recorder = CatalogueRecorder(get_catalogue(), video_id, format_choice, quality_info, store_key=key)
+        if on_download is not None:
+            on_download()
+        download_url(url, ydl_opts, postprocessors=[(recorder, 'after_move')])
+
+    entry = store.get(key)
+    if entry is not None:
+        return result(entry, True)
+    # Held until the file is in the store, where the next download that
+    # does not fit can evict it
+    with reserve():
+        entry, cached = store.fetch(key, video_id, title, download)
+    return result(entry, cached)
+
+
+def _download_and_transcode(url, ydl_opts, store, key, video_id, title, transcoder, options, on_download, record, result,
+                            reserve):
+    """Download the source audio into a staging folder and queue its conversion.
+
+    The disk space stays reserved until the converted file is stored.
+    """
+    reservation = reserve()
+    staging_root = os.path.join(store.root, ".staging")
+    os.makedirs(staging_root, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=key[:16] + "-", dir=staging_root)
+    try:
+        ydl_opts['postprocessors'] = []
+        ydl_opts['outtmpl'] = os.path.join(staging, "%(title)s [%(id)s].%(ext)s")
+        if on_download is not None:
+            on_download()
+        download_url(url, ydl_opts)
+        files = [os.path.join(staging, name) for name in os.listdir(staging) if not name.endswith(('.part', '.ytdl'))]
+        if not files:
+            raise RuntimeError("Download finished without producing a file")
+        converted = transcoder.submit(max(files, key=os.path.getsize), options)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        reservation.release()
+        raise
+
+    future = Future()
+
+    def finish(converted):
+        try:
+            path = converted.result()
+            entry, cached = store.fetch(key, video_id, title, lambda entry_dir: shutil.move(path, entry_dir))
+            if not cached:
+                record(entry['path'])
+            future.set_result(result(entry, cached))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+            reservation.release()
+
+    converted.add_done_callback(finish)
+    return future
+
+
+def url_host(url):
+    """Host name used for the per-host concurrency limit"""
+    host = (urlparse(url).hostname or "").lower()
+    for prefix in ("www.", "m."):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+    return host
+
+
+class _Task:
+    """A submitted download and the Future its caller waits on"""
+
+    __slots__ = ('host', 'future', 'func', 'args', 'attempt', 'on_retry')
+
+    def __init__(self, host, future, func, args, on_retry):
+        self.host = host
+        self.future = future
+        self.func = func
+        self.args = args
+        self.attempt = 1
+        self.on_retry = on_retry
+
+
+class DownloadEngine:
+    """Runs downloads on a bounded thread pool.
+
+    At most ``max_workers`` downloads run at once, and at most
+    ``per_host_limit`` of them talk to the same host. Items waiting for a
+    busy host do not hold a worker thread, so other hosts keep flowing.
+
+    Items that fail with a transient error go back into the queue after
+    the ``retry`` policy's backoff. Every host has a circuit breaker: after
+    repeated transient failures its items wait until a trial item gets
+    through, while permanent failures fail at once.
+    """
+
+    def __init__(self, max_workers=4, per_host_limit=2, retry=None, breaker_threshold=5, breaker_reset=60.0):
+        self.max_workers = max(1, int(max_workers))
+        self.per_host_limit = max(1, int(per_host_limit or self.max_workers))
+        self.retry = retry or RetryPolicy(retries=0)
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset = breaker_reset
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="download")
+        self._lock = threading.Lock()
+        self._pending = deque()
+        self._active = 0
+        self._active_per_host = {}
+        self._breakers = {}
+        self._waiting = {}
+        self._wake_at = None
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+    def submit(self, url, ydl_opts, func=download_url, on_retry=None):
+        """Queue a download and return a Future for its result.
+
+        ``on_retry(attempt, delay, error)`` is called when a failed attempt
+        is scheduled again.
+        """
+        future = Future()
+        with self._lock:
+            self._pending.append(_Task(url_host(url), future, func, (url, ydl_opts), on_retry))
+        self._dispatch()
+        return future
+
+    def map(self, urls, ydl_opts):
+        """Download ``urls`` concurrently and yield ``(url, error)`` in input order.
+
+        ``urls`` may be any iterable, including a lazy generator: only a small
+        window of items ahead of the one being reported is queued at a time.
+        """
+        window = deque()
+        for url in urls:
+            window.append((url, self.submit(url, ydl_opts)))
+            if len(window) >= self.max_workers * 2:
+                yield self._result(*window.popleft())
+        while window:
+            yield self._result(*window.popleft())
+
+    def breaker(self, host):
+        with self._lock:
+            return self._breaker(host)
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            self._closed = True
+            pending, self._pending = list(self._pending), deque()
+            waiting, self._waiting = self._waiting, {}
+        for task, timer in waiting.items():
+            timer.cancel()
+            pending.append(task)
+        for task in pending:
+            # Retried tasks are already running and cannot be cancelled normally
+            if not task.future.cancel():
+                task.future.set_exception(CancelledError())
+        self._executor.shutdown(wait=wait)
+
+    @staticmethod
+    def _result(url, future):
+        error = future.exception()
+        return url, error
+
+    def _breaker(self, host):
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = self._breakers[host] = CircuitBreaker(self.breaker_threshold, self.breaker_reset)
+        return breaker
+
+    def _dispatch(self):
+        """Start every pending item whose host has a free slot and a closed breaker"""
+        with self._lock:
+            if self._closed:
+                return
+            started = []
+            skipped = deque()
+            blocked = set()
+            while self._pending and self._active < self.max_workers:
+                task = self._pending.popleft()
+                if task.future.cancelled():
+                    continue
+                if task.host in blocked or self._active_per_host.get(task.host, 0) >= self.per_host_limit:
+                    skipped.append(task)
+                    continue
+                breaker = self._breaker(task.host)
+                if not breaker.allow(task):
+                    blocked.add(task.host)
+                    skipped.append(task)
+                    delay = breaker.reopens_in()
+                    if delay is not None:
+                        self._wake_after(delay)
+                    # else a trial item runs and dispatches again when it ends
+                    continue
+                self._active += 1
+                self._active_per_host[task.host] = self._active_per_host.get(task.host, 0) + 1
+                started.append(task)
+            skipped.extend(self._pending)
+            self._pending = skipped
+
+        for task in started:
+            self._executor.submit(self._run, task)
+
+    def _run(self, task):
+        future = task.future
+        if task.attempt > 1 or future.set_running_or_notify_cancel():
+            try:
+                result = task.func(*task.args)
+            except BaseException as e:
+                self._failed(task, e)
+            else:
+                self.breaker(task.host).record_success()
+                if isinstance(result, Future):
+                    # A later stage (e.g. audio conversion) finishes the item
+                    # elsewhere, so this download slot is free already
+                    result.add_done_callback(lambda done: _copy_result(done, future))
+                else:
+                    future.set_result(result)
+        else:
+            # Cancelled before it started
+            self.breaker(task.host).cancel_trial(task)
+        with self._lock:
+            self._active -= 1
+            self._active_per_host[task.host] -= 1
+            if not self._active_per_host[task.host]:
+                del self._active_per_host[task.host]
+        self._dispatch()
+
+    def _failed(self, task, error):
+        """Queue ``task`` again after a backoff, or fail its Future"""
+        breaker = self.breaker(task.host)
+        if not isinstance(error, Exception):
+            # Interrupted: says nothing about the host
+            breaker.cancel_trial(task)
+        elif breaker.record_failure(error):
+            logger.warning("Too many failures from %s, pausing it for %.0fs", task.host, self.breaker_reset)
+        if not isinstance(error, Exception) or not self.retry.should_retry(error, task.attempt):
+            task.future.set_exception(error)
+            return
+
+        delay = self.retry.delay(task.attempt)
+        task.attempt += 1
+        RETRIES.inc(category=classify_error(error))
+        if task.on_retry is not None:
+            task.on_retry(task.attempt, delay, error)
+        # The task holds no worker while it waits for its next attempt
+        with self._lock:
+            if self._closed:
+                task.future.set_exception(error)
+                return
+            timer = threading.Timer(delay, self._requeue, (task,))
+            timer.daemon = True
+            self._waiting[task] = timer
+        timer.start()
+
+    def _requeue(self, task):
+        with self._lock:
+            if self._waiting.pop(task, None) is None:
+                # Shut down meanwhile
+                return
+            self._pending.append(task)
+        self._dispatch()
+
+    def _wake_after(self, delay):
+        """Dispatch again once a blocked host may take a trial item (call with the lock held)"""
+        wake_at = time.monotonic() + delay
+        if self._wake_at is not None and self._wake_at <= wake_at:
+            return
+        self._wake_at = wake_at
+        timer = threading.Timer(delay + 0.01, self._wake)
+        timer.daemon = True
+        timer.start()
+
+    def _wake(self):
+        with self._lock:
+            self._wake_at = None
+        self._dispatch()
+
+
+def _copy_result(source, target):
+    error = source.exception()
+    if error is None:
+        target.set_result(source.result())
+    else:
+        target.set_exception(error)
+
+
+def default_output_template(path=DOWNLOAD_PATH):
+    """Output template used by batch downloads"""
+    return os.path.join(path, "%(title)s.%(ext)s")
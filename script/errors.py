@@ -0,0 +1,132 @@
+"""Categories of download errors, shared by the pages, the batch runner and the metrics.
+
+Each category is either transient (worth another attempt after a pause:
+network trouble, HTTP 429 and 5xx, failed fragments) or permanent (a
+private or removed video, missing FFmpeg, a full disk), in which case
+the item fails at once. Errors that match nothing known (bugs, broken
+files) are ``unknown`` and not retried either.
+"""
+import errno
+import socket
+
+
+class ErrorCategory:
+    """A kind of failure and whether retrying it can help"""
+
+    __slots__ = ('name', 'retryable', 'hint')
+
+    def __init__(self, name, retryable, hint):
+        self.name = name
+        self.retryable = retryable
+        self.hint = hint
+
+
+CATEGORIES = {category.name: category for category in [
+    ErrorCategory('age_restricted', False, "🔞 This video may have age restrictions."),
+    ErrorCategory('private', False, "🔒 This video may be private."),
+    ErrorCategory('unavailable', False, "🚫 This video is unavailable or was removed."),
+    ErrorCategory('geo_restricted', False, "🌍 This video is not available in your country."),
+    ErrorCategory('unsupported', False, "❓ This URL is not supported."),
+    ErrorCategory('ffmpeg', False, "🔧 FFmpeg is required! Please check the installation instructions."),
+    ErrorCategory('disk_full', False, "💾 The server is out of disk space. Free some space and try again."),
+    ErrorCategory('rate_limited', True, "⏳ YouTube is rate limiting this server. Please try again later."),
+    ErrorCategory('server_error', True, "🛠️ The server had a temporary problem. Please try again later."),
+    ErrorCategory('network', True, "🌐 Check your internet connection or ensure the URL is correct."),
+    ErrorCategory('unknown', False, "⚠️ Something unexpected went wrong. Please try again or report the problem."),
+]}
+
+ERROR_HINTS = {name: category.hint for name, category in CATEGORIES.items()}
+
+# Checked in order against the lower-cased error message, before the exception types
+ERROR_PATTERNS = [
+    ('age_restricted', ("age-restricted", "confirm your age", "inappropriate for some users")),
+    ('private', ("private video", "video is private", "members-only", "join this channel")),
+    ('geo_restricted', ("not available in your country", "geo restriction", "geo-restricted")),
+    ('unavailable', ("video unavailable", "has been removed", "account associated with this video has been terminated",
+                     "does not exist", "no video formats found", "requested format is not available")),
+    ('unsupported', ("unsupported url", "is not a valid url")),
+    ('ffmpeg', ("ffmpeg", "ffprobe")),
+    ('disk_full', ("not enough disk space", "no space left on device")),
+    ('rate_limited', ("http error 429", "too many requests", "rate-limit", "rate limit")),
+    ('server_error', ("http error 500", "http error 502", "http error 503", "http error 504")),
+]
+
+# Looser wording, checked when neither the patterns above nor the exception types matched
+FALLBACK_PATTERNS = [
+    ('private', ("private",)),
+    ('unavailable', ("http error 404", "http error 410")),
+    ('network', ("fragment", "timed out", "connection", "temporary failure", "incomplete", "unable to download")),
+]
+
+
+def _causes(error):
+    """The error and the exceptions it wraps (yt-dlp's ``exc_info`` and ``__cause__``)"""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        yield error
+        exc_info = getattr(error, 'exc_info', None)
+        wrapped = exc_info[1] if isinstance(exc_info, tuple) and len(exc_info) > 1 else None
+        error = wrapped or getattr(error, 'cause', None) or error.__cause__ or error.__context__
+
+
+def _classify_type(error):
+    # Imported here so the pages can show the hints without loading yt-dlp
+    from yt_dlp.networking.exceptions import HTTPError, TransportError
+    from yt_dlp.utils import ContentTooShortError, GeoRestrictedError, PostProcessingError, UnsupportedError
+
+    if isinstance(error, OSError) and error.errno == errno.ENOSPC:
+        return 'disk_full'
+    if isinstance(error, HTTPError):
+        if error.status == 429:
+            return 'rate_limited'
+        if error.status >= 500:
+            return 'server_error'
+        if error.status in (404, 410):
+            return 'unavailable'
+    if isinstance(error, GeoRestrictedError):
+        return 'geo_restricted'
+    if isinstance(error, UnsupportedError):
+        return 'unsupported'
+    if isinstance(error, PostProcessingError):
+        return 'ffmpeg'
+    if isinstance(error, (TransportError, ContentTooShortError, ConnectionError, socket.timeout, socket.gaierror,
+                          TimeoutError)):
+        return 'network'
+    return None
+
+
+def classify_error(error):
+    """Category name of a download error (see ``CATEGORIES``), ``unknown`` when nothing matches"""
+    message = str(error).lower()
+    # The message first: yt-dlp's wording is more specific than the HTTP status
+    for name, patterns in ERROR_PATTERNS:
+        if any(pattern in message for pattern in patterns):
+            return name
+    for cause in _causes(error):
+        name = _classify_type(cause)
+        if name is not None:
+            return name
+    for name, patterns in FALLBACK_PATTERNS:
+        if any(pattern in message for pattern in patterns):
+            return name
+    return 'unknown'
+
+
+def is_retryable(error):
+    """True when another attempt may succeed"""
+    return CATEGORIES[classify_error(error)].retryable
+
+
+# HTTP statuses the site answers expired stream URLs with
+EXPIRED_URL_STATUSES = (403, 410)
+
+
+def is_expired_url(error):
+    """True when fresh stream URLs may fix a download: HTTP 403/410 or a transient error"""
+    message = str(error).lower()
+    if any(f"http error {status}" in message for status in EXPIRED_URL_STATUSES):
+        return True
+    if any(getattr(cause, 'status', None) in EXPIRED_URL_STATUSES for cause in _causes(error)):
+        return True
+    return is_retryable(error)
@@ -0,0 +1,172 @@
+"""Format planning: the fewest bytes that still give the requested quality.
+
+The quality presets used to be plain selectors like
+``best[height<=720][ext=mp4]``, which only consider progressive MP4
+files (often a lower resolution than asked for) and, for MP3, could pick
+a whole video stream. The planner looks at the extracted format list
+instead:
+
+* video: the highest height up to the requested one, as a progressive
+  MP4 or an MP4 video stream plus M4A audio (merged without re-encoding),
+  whichever is smaller;
+* audio: an audio-only stream, preferring one that needs no re-encoding
+  (M4A for "M4A (Audio)", MP3 for "MP3 (Audio)"), else the smallest one
+  of good enough bitrate.
+"""
+import math
+
+from script.ydl_pool import borrow_ydl
+
+
+FORMAT_CHOICES = ["MP4 (Video)", "MP3 (Audio)", "M4A (Audio)"]
+VIDEO_QUALITIES = ["Highest Quality", "720p", "480p", "360p"]
+AUDIO_QUALITY = "Audio"
+
+QUALITY_HEIGHTS = {"Highest Quality": None, "720p": 720, "480p": 480, "360p": 360}
+
+# Audio codec each audio choice ends up with, and the source codecs it is copied from
+AUDIO_TARGETS = {
+    "MP3 (Audio)": ("mp3", ("mp3",)),
+    "M4A (Audio)": ("m4a", ("mp4a", "aac")),
+}
+
+# Below this bitrate an audio stream only counts when nothing better exists
+MIN_AUDIO_ABR = 128
+
+_can_merge = None
+
+
+def can_merge():
+    """True when FFmpeg can merge separate video and audio streams"""
+    global _can_merge
+    if _can_merge is None:
+        from yt_dlp.postprocessor import FFmpegMergerPP
+
+        with borrow_ydl({'quiet': True, 'no_warnings': True}) as ydl:
+            merger = FFmpegMergerPP(ydl)
+            _can_merge = bool(merger.available and merger.can_merge())
+    return _can_merge
+
+
+def format_size(fmt, duration):
+    """Bytes of one format: its (approximate) file size, else bitrate times duration"""
+    size = fmt.get('filesize') or fmt.get('filesize_approx')
+    if not size and fmt.get('tbr') and duration:
+        size = fmt['tbr'] * 1000 / 8 * duration
+    return int(size) if size else None
+
+
+# yt-dlp marks a missing stream with codec "none"; no codec at all means unknown
+def _has_video(fmt):
+    return fmt.get('vcodec') != 'none'
+
+
+def _has_audio(fmt):
+    return fmt.get('acodec') != 'none'
+
+
+def _bytes_key(size, fmt):
+    # Unknown sizes last; among them the lowest bitrate first
+    return (size is None, size or 0, fmt.get('tbr') or math.inf)
+
+
+def _plan_video(formats, quality_choice, duration, merge):
+    target = QUALITY_HEIGHTS.get(quality_choice)
+    mp4 = [fmt for fmt in formats if fmt.get('ext') == 'mp4' and _has_video(fmt) and fmt.get('height')]
+    progressive = [fmt for fmt in mp4 if _has_audio(fmt)]
+    video_only = [fmt for fmt in mp4 if not _has_audio(fmt)] if merge else []
+    audio = [fmt for fmt in formats if fmt.get('ext') == 'm4a' and _has_audio(fmt) and not _has_video(fmt)]
+    if not audio:
+        video_only = []
+
+    heights = {fmt['height'] for fmt in progressive + video_only}
+    if not heights:
+        return None
+    fitting = [height for height in heights if target is None or height <= target]
+    height = max(fitting) if fitting else min(heights)
+
+    candidates = []
+    for fmt in progressive:
+        if fmt['height'] == height:
+            candidates.append((format_size(fmt, duration), fmt, [fmt]))
+    if video_only:
+        # Best audio: it is small next to the video
+        best_audio = max(audio, key=lambda fmt: (fmt.get('abr') or fmt.get('tbr') or 0, -(format_size(fmt, duration) or 0)))
+        audio_size = format_size(best_audio, duration)
+        for fmt in video_only:
+            if fmt['height'] != height:
+                continue
+            video_size = format_size(fmt, duration)
+            size = video_size + audio_size if video_size and audio_size else None
+            candidates.append((size, fmt, [fmt, best_audio]))
+    # Equal sizes: the progressive file, which needs no merge
+    size, fmt, chosen = min(candidates, key=lambda candidate: (*_bytes_key(candidate[0], candidate[1]), len(candidate[2])))
+    merged = len(chosen) > 1
+    return {
+        'format': "+".join(part['format_id'] for part in chosen),
+        'size': size,
+        'height': height,
+        'merge': merged,
+        'audio': None,
+        'label': f"{height}p" + (" (video + audio merged, no re-encoding)" if merged else ""),
+    }
+
+
+def _plan_audio(formats, format_choice, duration):
+    codec, copy_from = AUDIO_TARGETS[format_choice]
+    audio = [fmt for fmt in formats if _has_audio(fmt) and not _has_video(fmt)]
+    if not audio:
+        # Only muxed files: the smallest one has the same audio track
+        audio = [fmt for fmt in formats if _has_audio(fmt)]
+    if not audio:
+        return None
+
+    def copyable(fmt):
+        return (fmt.get('acodec') or "").split(".")[0] in copy_from
+
+    def bitrate(fmt):
+        return fmt.get('abr') or fmt.get('tbr') or 0
+
+    best = max(bitrate(fmt) for fmt in audio)
+    good = [fmt for fmt in audio if bitrate(fmt) >= min(MIN_AUDIO_ABR, best)]
+    copies = [fmt for fmt in good if copyable(fmt)]
+    pool = copies or good
+    fmt = min(pool, key=lambda fmt: _bytes_key(format_size(fmt, duration), fmt))
+    action = "copy" if copyable(fmt) else "transcode"
+    rate = f"{round(bitrate(fmt))} kbps " if bitrate(fmt) else ""
+    return {
+        'format': fmt['format_id'],
+        'size': format_size(fmt, duration),
+        'height': None,
+        'merge': False,
+        'audio': action,
+        'label': f"{rate}{fmt.get('ext', '')} audio" + (", no re-encoding" if action == "copy" else f" → {codec.upper()}"),
+    }
+
+
+def plan_formats(info, format_choice, quality_choice, merge=None):
+    """Formats to download for a choice, or None when ``info`` lists no usable formats.
+
+    Returns ``{'format', 'size', 'height', 'merge', 'audio', 'label'}``:
+    a yt-dlp format spec of explicit format IDs, the expected bytes (None
+    when unknown), whether video and audio are merged, whether the audio
+    is copied or transcoded, and a readable label. ``merge`` defaults to
+    whether FFmpeg is available.
+    """
+    formats = [fmt for fmt in info.get('formats') or [] if fmt.get('format_id') and fmt.get('url')]
+    if not formats:
+        return None
+    duration = info.get('duration')
+    if format_choice in AUDIO_TARGETS:
+        return _plan_audio(formats, format_choice, duration)
+    return _plan_video(formats, quality_choice, duration, can_merge() if merge is None else merge)
+
+
+def plan_choices(info):
+    """Plans for every format and quality choice, for showing the sizes side by side"""
+    plans = []
+    for format_choice in FORMAT_CHOICES:
+        qualities = VIDEO_QUALITIES if format_choice == "MP4 (Video)" else [AUDIO_QUALITY]
+        for quality_choice in qualities:
+            plans.append((format_choice, quality_choice, plan_formats(info, format_choice, quality_choice)))
+    return plans
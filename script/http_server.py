@@ -0,0 +1,114 @@
+"""Small HTTP server that runs next to Streamlit for machine-readable routes.
+
+Modules register handlers with ``@route(path)``; a handler receives the
+request handler object and returns ``(status, content_type, body)`` or
+``(status, content_type, body, headers)``. A body that is not ``bytes`` is
+an iterable of chunks, sent with chunked transfer encoding as they are
+produced. The server listens on ``YTDL_HTTP_HOST:YTDL_HTTP_PORT`` (127.0.0.1:8599 by
+default); set ``YTDL_HTTP_PORT=0`` to turn it off. Download workers pass
+their own port (see ``script.worker``).
+"""
+import logging
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+
+logger = logging.getLogger(__name__)
+
+ROUTES = {}
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def route(path):
+    """Register the decorated function as the handler of ``path``"""
+    def register(handler):
+        ROUTES[path] = handler
+        return handler
+    return register
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    # Needed for chunked responses
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def do_GET(self):
+        handler = ROUTES.get(urlparse(self.path).path)
+        if handler is None:
+            self.send_error(404)
+            return
+        try:
+            status, content_type, body, *headers = handler(self)
+        except Exception:
+            logger.exception("Handler for %s failed", self.path)
+            self.send_error(500)
+            return
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        for name, value in (headers[0] if headers else {}).items():
+            self.send_header(name, value)
+        if isinstance(body, bytes):
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            self._send_chunks(body)
+
+    def _send_chunks(self, body):
+        try:
+            for chunk in body:
+                if chunk:
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            self.wfile.write(b"0\r\n\r\n")
+        except Exception as e:
+            # Headers are gone: dropping the connection is the only way to report it
+            if not isinstance(e, ConnectionError):
+                logger.exception("Streaming %s failed", self.path)
+            self.close_connection = True
+        finally:
+            if hasattr(body, "close"):
+                body.close()
+
+
+def public_url():
+    """Base URL browsers reach the server on: ``YTDL_HTTP_PUBLIC_URL`` (e.g. behind a proxy), else its address"""
+    if os.environ.get("YTDL_HTTP_PUBLIC_URL"):
+        return os.environ["YTDL_HTTP_PUBLIC_URL"].rstrip("/")
+    server = start()
+    if server is None:
+        return None
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}"
+
+
+def start(port=None):
+    """Start the shared server once per process; returns it, or None when disabled or the port is taken.
+
+    ``port`` overrides ``YTDL_HTTP_PORT``.
+    """
+    global _server
+    with _server_lock:
+        if _server is not None:
+            return _server
+        if port is None:
+            port = int(os.environ.get("YTDL_HTTP_PORT", 8599))
+        if not port:
+            return None
+        host = os.environ.get("YTDL_HTTP_HOST", "127.0.0.1")
+        try:
+            _server = ThreadingHTTPServer((host, port), RequestHandler)
+        except OSError as e:
+            logger.warning("HTTP server not started on %s:%s: %s", host, port, e)
+            return None
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="http-server", daemon=True).start()
+        logger.info("HTTP server listening on http://%s:%s", host, port)
+        return _server
@@ -0,0 +1,329 @@
+"""Background job queue shared by every Streamlit session.
+
+Jobs live in a job store (SQLite by default, see ``script.job_store``) so
+they survive reruns, page changes and restarts of the server. The pages
+only submit jobs and poll their state; the downloads run on workers that
+lease jobs from the store: one inside the app, plus any started with
+``python -m script.worker``. The app's worker (and with it yt-dlp) is
+loaded once there is something to download, so pages open quickly.
+
+A request that matches a finished job (same video, format and quality)
+whose file is still on disk is finished on the spot from that job's
+preview and result, without a worker, a metadata lookup or a download.
+"""
+import atexit
+import os
+import threading
+import uuid
+
+from script import http_server
+from script.batch_results import BatchItem
+from script.job_store import (  # noqa: F401 (re-exported for the pages)
+    DONE_STATUSES, ERROR, FINISHED, QUEUED, RUNNING, default_store_url, new_job, open_job_store,
+)
+from script.metrics import DOWNLOADS, REGISTRY, Gauge
+from script.playlist import is_playlist_url, iter_playlist_entries
+from script.urls import canonical_url, dedupe_urls
+
+
+EMBEDDED_WORKER = os.environ.get("YTDL_EMBEDDED_WORKER", "1") != "0"
+MAX_WORKERS = int(os.environ.get("YTDL_MAX_WORKERS", 4))
+PER_HOST_LIMIT = int(os.environ.get("YTDL_PER_HOST_LIMIT", 4))
+
+
+class JobManager:
+    """Submits jobs to the job store and reads their state back"""
+
+    def __init__(self, store, worker=None, worker_factory=None):
+        self.store = store
+        # The worker in this process, if any; it is woken up for new jobs.
+        # With a ``worker_factory`` it is built on the first job.
+        self.worker = worker
+        self._worker_factory = worker_factory
+        self._worker_lock = threading.Lock()
+
+    # Submitting
+
+    def submit_video(self, url, format_choice, quality_choice, session=None):
+        """Queue a single video download and return its job id.
+
+        Single videos are interactive: they start before queued batch items
+        and get a larger share of the bandwidth. ``session`` identifies the
+        browser session for its bandwidth cap.
+        """
+        options = {'format_choice': format_choice, 'quality_choice': quality_choice, 'session': session}
+        job = self._new_job(None, 0, "video", canonical_url(url), options)
+        self.store.add_jobs([job])
+        self._wake([job])
+        return job['id']
+
+    def submit_batch(self, urls, format_choice, quality_choice, start=0, end=None, session=None):
+        """Queue a batch and return its id.
+
+        Video URLs become jobs right away. Playlist and channel URLs are
+        expanded in the background: their first entries start downloading
+        while later pages are still being listed. ``start``/``end`` slice
+        every playlist.
+
+        Every spelling of a video is downloaded once: repeats within the
+        batch are merged (see ``batch_duplicates``), and videos another
+        batch is already downloading in the same format follow that
+        download and finish with it.
+        """
+        batch_id = uuid.uuid4().hex
+        options = {'format_choice': format_choice, 'quality_choice': quality_choice, 'session': session}
+        urls, duplicates = dedupe_urls(urls)
+        active = self.active_urls(format_choice, quality_choice)
+        expanding = any(is_playlist_url(url) for url in urls)
+
+        if not expanding:
+            self.store.add_batch(batch_id, False, duplicates)
+            jobs = [
+                self._new_job(batch_id, position, "batch_item", url, options, follows=active.get(url))
+                for position, url in enumerate(urls)
+            ]
+            self._add_jobs(jobs)
+        else:
+            self.store.add_batch(batch_id, True, duplicates)
+            threading.Thread(
+                target=self._expand, args=(batch_id, urls, options, start, end, active),
+                name=f"expand-{batch_id[:8]}", daemon=True,
+            ).start()
+        return batch_id
+
+    def requeue(self, job_ids, session=None):
+        """Queue past jobs again as one batch, each in its own format and quality; returns the batch id.
+
+        Jobs whose file is still on disk finish at once; repeats are
+        counted as duplicates, and downloads already queued or running
+        are followed (see ``submit_batch``).
+        """
+        batch_id = uuid.uuid4().hex
+        active = {
+            (url, options['format_choice'], options['quality_choice']): job_id
+            for job_id, url, options in self.store.active_jobs()
+        }
+        seen = set()
+        jobs = []
+        duplicates = 0
+        for job_id in job_ids:
+            past = self.store.get_job(job_id)
+            if past is None:
+                continue
+            options = {
+                'format_choice': past['options']['format_choice'],
+                'quality_choice': past['options']['quality_choice'],
+                'session': session,
+            }
+            request = (past['url'], options['format_choice'], options['quality_choice'])
+            if request in seen:
+                duplicates += 1
+                continue
+            seen.add(request)
+            jobs.append(
+                self._new_job(batch_id, len(jobs), "batch_item", past['url'], options, follows=active.get(request))
+            )
+        self.store.add_batch(batch_id, False, duplicates)
+        self._add_jobs(jobs)
+        return batch_id
+
+    # History
+
+    def last_delivery(self, url, format_choice, quality_choice):
+        """Newest finished job of this download whose file is still on disk, or None"""
+        job = self.store.last_finished(url, format_choice, quality_choice)
+        if job is None or not job['result'] or not os.path.exists(job['result']['path']):
+            return None
+        return job
+
+    def history(self, session=None, offset=0, limit=None):
+        """Finished jobs, newest first; only those of ``session`` if given"""
+        return [self._to_job(job) for job in self.store.history(session, offset, limit)]
+
+    def history_count(self, session=None):
+        return self.store.history_count(session)
+
+    # Polling
+
+    def get_job(self, job_id):
+        """Current state of a job, or None if it does not exist"""
+        job = self.store.get_job(job_id)
+        return self._to_job(job) if job else None
+
+    def get_batch(self, batch_id):
+        """Jobs of a batch in input order"""
+        return [self._to_job(job) for job in self.store.get_batch(batch_id)]
+
+    def batch_summary(self, batch_id):
+        """Item counts (see ``empty_summary`` in ``script.job_store``) with ``expanding`` and ``duplicates``"""
+        summary = self.store.batch_summary(batch_id)
+        state = self.store.get_batch_state(batch_id) or {'expanding': False, 'duplicates': 0}
+        summary.update(state)
+        return summary
+
+    def batch_items(self, batch_id, offset=0, limit=None, statuses=None):
+        """``BatchItem`` rows of a slice of a batch, optionally only in ``statuses``"""
+        return [BatchItem(*row) for row in self.store.batch_items(batch_id, offset, limit, statuses)]
+
+    def batch_done(self, batch_id):
+        """True once the batch is listed and every item finished or failed"""
+        summary = self.batch_summary(batch_id)
+        return not summary['expanding'] and not summary[QUEUED] and not summary[RUNNING]
+
+    def batch_duplicates(self, batch_id):
+        """Number of URLs merged into other items instead of being downloaded again"""
+        state = self.store.get_batch_state(batch_id)
+        return state['duplicates'] if state else 0
+
+    def active_urls(self, format_choice, quality_choice):
+        """URLs queued or downloading in this format and quality, in any batch, with their job ids"""
+        return {
+            url: job_id for job_id, url, options in self.store.active_jobs()
+            if options['format_choice'] == format_choice and options['quality_choice'] == quality_choice
+        }
+
+    def is_expanding(self, batch_id):
+        """True while playlists of the batch are still being listed"""
+        state = self.store.get_batch_state(batch_id)
+        return bool(state and state['expanding'])
+
+    def queue_depth(self):
+        return self.store.queue_depth()
+
+    def inflight(self):
+        """Jobs the worker in this process is running"""
+        return self.worker.inflight() if self.worker else 0
+
+    def start_worker(self):
+        """Build the worker of this process if it has one and it is not running yet"""
+        with self._worker_lock:
+            if self.worker is None and self._worker_factory is not None:
+                self.worker = self._worker_factory(self.store)
+        return self.worker
+
+    # Internals
+
+    def _add_jobs(self, jobs):
+        self.store.add_jobs(jobs)
+        for job in jobs:
+            if job['follows']:
+                # The followed job may have finished before these were added
+                self.store.follow(job['follows'])
+        self._wake(jobs)
+
+    def _wake(self, jobs):
+        if not any(job['status'] == QUEUED and not job['follows'] for job in jobs):
+            # Nothing for a worker to do; do not load one
+            return
+        worker = self.start_worker()
+        if worker:
+            worker.wake()
+
+    def _new_job(self, batch_id, position, kind, url, options, follows=None):
+        """A queued job, or a finished one when the same download is still on disk.
+
+        ``follows`` is the id of an active job downloading the same video.
+        """
+        job = new_job(uuid.uuid4().hex, batch_id, position, kind, url, options)
+        past = self.last_delivery(url, options['format_choice'], options['quality_choice'])
+        if past is None:
+            job['follows'] = follows
+        else:
+            job.update(status=FINISHED, info=past['info'], result={**past['result'], 'cached': True, 'instant': True},
+                       progress=1.0)
+            DOWNLOADS.inc(result='instant')
+        return job
+
+    def _add(self, batch_id, position, kind, url, options, status=QUEUED, error=None, follows=None):
+        if status == QUEUED:
+            job = self._new_job(batch_id, position, kind, url, options, follows)
+        else:
+            job = new_job(uuid.uuid4().hex, batch_id, position, kind, url, options, status, error)
+        self._add_jobs([job])
+
+    def _expand(self, batch_id, urls, options, start, end, active):
+        """List playlists of a batch and queue their entries as they arrive.
+
+        ``active`` maps the URLs other batches are downloading to their
+        jobs, which the entries follow; entries shared by several
+        playlists are queued once.
+        """
+        seen = set()
+        position = 0
+        duplicates = 0
+        try:
+            for url in urls:
+                if not is_playlist_url(url):
+                    if url in seen:
+                        duplicates += 1
+                        continue
+                    seen.add(url)
+                    self._add(batch_id, position, "batch_item", url, options, follows=active.get(url))
+                    position += 1
+                    continue
+                try:
+                    for entry in iter_playlist_entries(url, start, end):
+                        entry_url = canonical_url(entry['url'])
+                        if entry_url in seen:
+                            duplicates += 1
+                            continue
+                        seen.add(entry_url)
+                        self._add(batch_id, position, "batch_item", entry_url, options, follows=active.get(entry_url))
+                        position += 1
+                except Exception as e:
+                    # Show the broken playlist as a failed item of the batch
+                    self._add(batch_id, position, "batch_item", url, options,
+                              status=ERROR, error=f"Could not list playlist: {e}")
+                    position += 1
+        finally:
+            self.store.end_expanding(batch_id, duplicates)
+
+    @staticmethod
+    def _to_job(job):
+        # Live state comes from the workers' heartbeats
+        if job['status'] == FINISHED:
+            job['progress'] = 1.0
+        job['progress'] = job['progress'] or 0.0
+        job['message'] = job['message'] or ""
+        return job
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def start_embedded_worker(store):
+    """Start the worker that runs inside the app"""
+    from script.download_engine import DOWNLOAD_PATH
+    from script.worker import Worker, retry_policy
+
+    if not os.path.exists(DOWNLOAD_PATH):
+        os.makedirs(DOWNLOAD_PATH)
+    worker = Worker(store, max_workers=MAX_WORKERS, per_host_limit=PER_HOST_LIMIT, retry=retry_policy()).start()
+    # Hand unfinished jobs to the other workers right away instead of after the lease
+    atexit.register(worker.stop)
+    return worker
+
+
+def get_job_manager():
+    """The job manager shared by every session in this process.
+
+    The store comes from ``YTDL_JOB_STORE``. Unless ``YTDL_EMBEDDED_WORKER``
+    is ``0`` a worker runs in this process too; with it off, downloads
+    wait for ``python -m script.worker`` processes.
+    """
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            store = open_job_store(default_store_url())
+            # Playlist listings cannot be resumed; keep the entries found so far
+            store.end_expanding()
+            _manager = JobManager(store, worker_factory=start_embedded_worker if EMBEDDED_WORKER else None)
+            if store.active_jobs():
+                # Jobs left from before a restart
+                _manager.start_worker()
+            REGISTRY.register(Gauge("ytdl_queue_depth", "Jobs waiting to start", func=_manager.queue_depth))
+            REGISTRY.register(Gauge("ytdl_inflight_jobs", "Jobs run by the worker in this process", func=_manager.inflight))
+            # Serves /metrics
+            http_server.start()
+        return _manager
@@ -0,0 +1,635 @@
+"""Shared job stores: the queue between the pages and the download workers.
+
+The pages add jobs and read their state; workers (in the Streamlit
+process or started with ``python -m script.worker``, on any number of
+hosts) lease queued jobs, report progress with heartbeats and finish
+them. A job whose lease runs out because its worker crashed or lost
+its connection is queued again for another worker. Finished jobs stay
+in the store: they are the download history.
+
+A job may follow another one: a video that a batch asks for while
+another batch is already downloading it in the same format is added as
+a follower of that job. Workers never lease followers; they finish with
+the job they follow (see ``finish``).
+
+Backends are picked by URL (``YTDL_JOB_STORE``):
+
+* ``sqlite:///path/jobs.sqlite``: the default, for workers on one host;
+* ``memory://``: an in-process stand-in with the same behaviour, for
+  running several workers offline in tests and benchmarks.
+
+Other backends (e.g. a database server shared by several hosts) plug in
+with ``register_backend``.
+"""
+import copy
+import json
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+from script.db import connect, state_file
+
+
+QUEUED = "queued"
+RUNNING = "running"
+FINISHED = "finished"
+ERROR = "error"
+
+DONE_STATUSES = (FINISHED, ERROR)
+
+# Fields a heartbeat may update on a running job
+LIVE_FIELDS = ('progress', 'message', 'speed')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    batch_id TEXT,
+    position INTEGER NOT NULL DEFAULT 0,
+    kind TEXT NOT NULL,
+    url TEXT NOT NULL,
+    options TEXT NOT NULL,
+    status TEXT NOT NULL,
+    info TEXT,
+    result TEXT,
+    error TEXT,
+    progress REAL,
+    message TEXT,
+    speed REAL,
+    worker TEXT,
+    lease_until REAL,
+    follows TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created, position);
+CREATE INDEX IF NOT EXISTS jobs_batch ON jobs (batch_id, position);
+CREATE INDEX IF NOT EXISTS jobs_url ON jobs (url, status);
+CREATE INDEX IF NOT EXISTS jobs_history ON jobs (status, updated);
+CREATE INDEX IF NOT EXISTS jobs_session ON jobs (json_extract(options, '$.session'), status, updated);
+CREATE TABLE IF NOT EXISTS batches (
+    id TEXT PRIMARY KEY,
+    expanding INTEGER NOT NULL DEFAULT 0,
+    duplicates INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL
+);
+"""
+
+# Columns added since the first version of the queue
+MIGRATIONS = [
+    ('batches', 'duplicates', "INTEGER NOT NULL DEFAULT 0"),
+    ('jobs', 'progress', "REAL"),
+    ('jobs', 'message', "TEXT"),
+    ('jobs', 'speed', "REAL"),
+    ('jobs', 'worker', "TEXT"),
+    ('jobs', 'lease_until', "REAL"),
+    ('jobs', 'follows', "TEXT"),
+]
+
+# Indexes on migrated columns, created once the columns exist
+INDEXES = "CREATE INDEX IF NOT EXISTS jobs_follows ON jobs (follows, status);"
+
+# Next jobs to start: single videos first, then batches take turns (the
+# first queued item of every batch, then the second, ...) so one long
+# batch does not hold back the others
+FAIR_QUEUE_SQL = """
+SELECT id FROM (
+    SELECT id, kind, created, ROW_NUMBER() OVER (PARTITION BY batch_id ORDER BY position, created) AS turn
+    FROM jobs WHERE status = ? AND follows IS NULL
+)
+ORDER BY kind != 'video', CASE WHEN kind = 'video' THEN created END, turn, created
+LIMIT ?
+"""
+
+JSON_FIELDS = ('options', 'info', 'result')
+
+# Finished jobs of one session, for the history
+SESSION_SQL = "json_extract(options, '$.session') = ?"
+
+
+def empty_summary():
+    """Counts of a batch without items.
+
+    ``total`` and one count per status, ``cached`` finished items, and the
+    summed ``progress`` and ``speed`` of the running items with the URL of
+    the first one (``current``).
+    """
+    return {
+        'total': 0, QUEUED: 0, RUNNING: 0, FINISHED: 0, ERROR: 0, 'cached': 0,
+        'progress': 0.0, 'speed': 0.0, 'current': None,
+    }
+
+
+def new_job(job_id, batch_id, position, kind, url, options, status=QUEUED, error=None, follows=None):
+    """A job as the stores expect it in ``add_jobs``; ``follows`` is the id of the job it waits for"""
+    now = time.time()
+    return {
+        'id': job_id, 'batch_id': batch_id, 'position': position, 'kind': kind, 'url': url,
+        'options': options, 'status': status, 'info': None, 'result': None, 'error': error,
+        'progress': None, 'message': None, 'speed': None, 'worker': None, 'lease_until': None,
+        'follows': follows, 'created': now, 'updated': now,
+    }
+
+
+class SQLiteJobStore:
+    """Jobs in an SQLite file; safe for several worker processes on one host"""
+
+    def __init__(self, path):
+        self._db = connect(path)
+        self._db.executescript(SCHEMA)
+        for table, column, definition in MIGRATIONS:
+            if column not in {row[1] for row in self._db.execute(f"PRAGMA table_info({table})")}:
+                self._db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        self._db.executescript(INDEXES)
+        self._lock = threading.RLock()
+
+    # Batches
+
+    def add_batch(self, batch_id, expanding, duplicates=0):
+        self._execute(
+            "INSERT INTO batches (id, expanding, duplicates, created) VALUES (?, ?, ?, ?)",
+            (batch_id, int(expanding), duplicates, time.time()),
+        )
+
+    def end_expanding(self, batch_id=None, duplicates=0):
+        """Mark a batch (or every batch) as fully listed"""
+        if batch_id is None:
+            self._execute("UPDATE batches SET expanding = 0")
+        else:
+            self._execute(
+                "UPDATE batches SET expanding = 0, duplicates = duplicates + ? WHERE id = ?", (duplicates, batch_id)
+            )
+
+    def get_batch_state(self, batch_id):
+        """``{'expanding', 'duplicates'}`` of a batch, or None"""
+        rows = self._query("SELECT expanding, duplicates FROM batches WHERE id = ?", (batch_id,))
+        return {'expanding': bool(rows[0][0]), 'duplicates': rows[0][1]} if rows else None
+
+    # Jobs
+
+    def add_jobs(self, jobs):
+        """Insert jobs (see ``new_job``) in one transaction"""
+        with self._lock:
+            self._execute("BEGIN")
+            try:
+                for job in jobs:
+                    row = self._encode(job)
+                    columns = ", ".join(row)
+                    self._execute(
+                        f"INSERT INTO jobs ({columns}) VALUES ({', '.join('?' for _ in row)})", tuple(row.values())
+                    )
+                self._execute("COMMIT")
+            except BaseException:
+                self._execute("ROLLBACK")
+                raise
+
+    def get_job(self, job_id):
+        rows = self._query("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        return self._decode(rows[0]) if rows else None
+
+    def get_batch(self, batch_id):
+        rows = self._query("SELECT * FROM jobs WHERE batch_id = ? ORDER BY position", (batch_id,))
+        return [self._decode(row) for row in rows]
+
+    def batch_summary(self, batch_id):
+        """Item counts of a batch by status (see ``empty_summary``)"""
+        summary = empty_summary()
+        rows = self._query(
+            "SELECT status, COUNT(*), SUM(json_extract(result, '$.cached')), SUM(progress), SUM(speed)"
+            " FROM jobs WHERE batch_id = ? GROUP BY status",
+            (batch_id,),
+        )
+        for status, count, cached, progress, speed in rows:
+            summary[status] = count
+            summary['total'] += count
+            if status == FINISHED:
+                summary['cached'] = cached or 0
+            elif status == RUNNING:
+                summary['progress'] = progress or 0.0
+                summary['speed'] = speed or 0.0
+        if summary[RUNNING]:
+            summary['current'] = self._query(
+                "SELECT url FROM jobs WHERE batch_id = ? AND status = ? ORDER BY position LIMIT 1", (batch_id, RUNNING)
+            )[0][0]
+        return summary
+
+    def batch_items(self, batch_id, offset=0, limit=None, statuses=None):
+        """``(position, url, status, cached, error)`` of a slice of a batch, in input order"""
+        where = "batch_id = ?"
+        params = [batch_id]
+        if statuses:
+            where += f" AND status IN ({', '.join('?' for _ in statuses)})"
+            params.extend(statuses)
+        rows = self._query(
+            f"SELECT position, url, status, json_extract(result, '$.cached'), error FROM jobs WHERE {where}"
+            " ORDER BY position LIMIT ? OFFSET ?",
+            (*params, -1 if limit is None else limit, offset),
+        )
+        return [(position, url, status, bool(cached), error) for position, url, status, cached, error in rows]
+
+    # History
+
+    def last_finished(self, url, format_choice, quality_choice):
+        """Newest finished job of ``url`` in this format and quality, or None.
+
+        Jobs with a preview (single videos) come before batch items.
+        """
+        rows = self._query(
+            "SELECT * FROM jobs WHERE url = ? AND status = ? AND json_extract(options, '$.format_choice') = ?"
+            " AND json_extract(options, '$.quality_choice') = ? ORDER BY info IS NULL, updated DESC LIMIT 1",
+            (url, FINISHED, format_choice, quality_choice),
+        )
+        return self._decode(rows[0]) if rows else None
+
+    def history(self, session=None, offset=0, limit=None):
+        """Finished jobs, newest first; only those of ``session`` if given"""
+        where, params = self._history_filter(session)
+        rows = self._query(
+            f"SELECT * FROM jobs WHERE {where} ORDER BY updated DESC LIMIT ? OFFSET ?",
+            (*params, -1 if limit is None else limit, offset),
+        )
+        return [self._decode(row) for row in rows]
+
+    def history_count(self, session=None):
+        where, params = self._history_filter(session)
+        return self._query(f"SELECT COUNT(*) FROM jobs WHERE {where}", params)[0][0]
+
+    @staticmethod
+    def _history_filter(session):
+        if session is None:
+            return "status = ?", (FINISHED,)
+        return f"{SESSION_SQL} AND status = ?", (session, FINISHED)
+
+    def finished_keys(self, keys):
+        """Content-store keys among ``keys`` that finished jobs downloaded"""
+        keys = list(keys)
+        if not keys:
+            return set()
+        rows = self._query(
+            f"SELECT DISTINCT json_extract(result, '$.key') FROM jobs WHERE status = ?"
+            f" AND json_extract(result, '$.key') IN ({', '.join('?' for _ in keys)})",
+            (FINISHED, *keys),
+        )
+        return {row[0] for row in rows}
+
+    def active_jobs(self):
+        """``(id, url, options)`` of every queued or running job that follows no other job"""
+        rows = self._query(
+            "SELECT id, url, options FROM jobs WHERE status IN (?, ?) AND follows IS NULL", (QUEUED, RUNNING)
+        )
+        return [(job_id, url, json.loads(options)) for job_id, url, options in rows]
+
+    def queue_depth(self):
+        return self._query("SELECT COUNT(*) FROM jobs WHERE status = ? AND follows IS NULL", (QUEUED,))[0][0]
+
+    def update(self, job_id, **fields):
+        fields['updated'] = time.time()
+        row = self._encode(fields)
+        columns = ", ".join(f"{key} = ?" for key in row)
+        self._execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*row.values(), job_id))
+
+    # Workers
+
+    def lease(self, worker, limit, lease_seconds):
+        """Move up to ``limit`` queued jobs to ``worker`` and return them"""
+        now = time.time()
+        with self._lock:
+            # IMMEDIATE: other processes cannot lease the same rows in between
+            self._execute("BEGIN IMMEDIATE")
+            try:
+                ids = [row[0] for row in self._query(FAIR_QUEUE_SQL, (QUEUED, limit))]
+                for job_id in ids:
+                    self._execute(
+                        "UPDATE jobs SET status = ?, worker = ?, lease_until = ?, progress = 0, message = NULL,"
+                        " speed = NULL, updated = ? WHERE id = ?",
+                        (RUNNING, worker, now + lease_seconds, now, job_id),
+                    )
+                self._execute("COMMIT")
+            except BaseException:
+                self._execute("ROLLBACK")
+                raise
+        return [self.get_job(job_id) for job_id in ids]
+
+    def heartbeat(self, worker, live, lease_seconds):
+        """Extend the worker's leases and save the live state of its jobs.
+
+        ``live`` maps job ids to ``progress``/``message``/``speed`` updates.
+        Returns the ids in ``live`` the worker no longer holds.
+        """
+        now = time.time()
+        with self._lock:
+            self._execute(
+                "UPDATE jobs SET lease_until = ? WHERE worker = ? AND status = ?", (now + lease_seconds, worker, RUNNING)
+            )
+            for job_id, fields in live.items():
+                fields = {key: fields[key] for key in LIVE_FIELDS if key in fields}
+                if fields:
+                    columns = ", ".join(f"{key} = ?" for key in fields)
+                    self._execute(
+                        f"UPDATE jobs SET {columns} WHERE id = ? AND worker = ? AND status = ?",
+                        (*fields.values(), job_id, worker, RUNNING),
+                    )
+            held = {row[0] for row in self._query("SELECT id FROM jobs WHERE worker = ? AND status = ?", (worker, RUNNING))}
+        return set(live) - held
+
+    def finish(self, job_id, worker, status, result=None, error=None):
+        """Record the outcome, for the job's followers too.
+
+        False when the lease was lost and the job belongs to another worker now.
+        """
+        with self._lock:
+            cursor = self._execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, progress = ?, message = NULL, speed = NULL,"
+                " lease_until = NULL, updated = ? WHERE id = ? AND worker = ? AND status = ?",
+                (status, json.dumps(result) if result is not None else None, error, 1.0 if status == FINISHED else None,
+                 time.time(), job_id, worker, RUNNING),
+            )
+            if cursor.rowcount == 0:
+                return False
+            self.follow(job_id)
+        return True
+
+    def follow(self, job_id):
+        """Finish the queued followers of ``job_id`` like it, if it is done"""
+        job = self.get_job(job_id)
+        if job is None or job['status'] not in DONE_STATUSES:
+            return
+        result = {**job['result'], 'cached': True} if job['result'] else None
+        self._execute(
+            "UPDATE jobs SET status = ?, info = ?, result = ?, error = ?, progress = ?, message = NULL, updated = ?"
+            " WHERE follows = ? AND status = ?",
+            (job['status'], json.dumps(job['info']) if job['info'] else None, json.dumps(result) if result else None,
+             job['error'], job['progress'], time.time(), job_id, QUEUED),
+        )
+
+    def requeue_expired(self):
+        """Queue again the jobs whose worker stopped sending heartbeats; returns how many"""
+        cursor = self._execute(
+            "UPDATE jobs SET status = ?, worker = NULL, lease_until = NULL, message = ?, speed = NULL, updated = ?"
+            " WHERE status = ? AND lease_until < ?",
+            (QUEUED, "🔁 Queued again after its worker stopped responding", time.time(), RUNNING, time.time()),
+        )
+        return cursor.rowcount
+
+    def release(self, worker):
+        """Queue again every job of a worker that is shutting down"""
+        self._execute(
+            "UPDATE jobs SET status = ?, worker = NULL, lease_until = NULL, speed = NULL, updated = ?"
+            " WHERE worker = ? AND status = ?",
+            (QUEUED, time.time(), worker, RUNNING),
+        )
+
+    # Internals
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._db.execute(sql, params)
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    @staticmethod
+    def _encode(fields):
+        return {
+            key: json.dumps(value) if key in JSON_FIELDS and value is not None else value
+            for key, value in fields.items()
+        }
+
+    @staticmethod
+    def _decode(row):
+        job = dict(row)
+        for key in JSON_FIELDS:
+            job[key] = json.loads(job[key]) if job[key] else None
+        return job
+
+
+class MemoryJobStore:
+    """In-process job store with the same semantics as ``SQLiteJobStore``.
+
+    A stand-in for a shared backend: several workers in one process can
+    use it to exercise leases, heartbeats and requeueing offline.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._jobs = {}
+        self._batches = {}
+
+    def add_batch(self, batch_id, expanding, duplicates=0):
+        with self._lock:
+            self._batches[batch_id] = {'expanding': bool(expanding), 'duplicates': duplicates, 'created': time.time()}
+
+    def end_expanding(self, batch_id=None, duplicates=0):
+        with self._lock:
+            for key, batch in self._batches.items():
+                if batch_id is None or key == batch_id:
+                    batch['expanding'] = False
+                    if key == batch_id:
+                        batch['duplicates'] += duplicates
+
+    def get_batch_state(self, batch_id):
+        with self._lock:
+            batch = self._batches.get(batch_id)
+            return {'expanding': batch['expanding'], 'duplicates': batch['duplicates']} if batch else None
+
+    def add_jobs(self, jobs):
+        with self._lock:
+            for job in jobs:
+                self._jobs[job['id']] = copy.deepcopy(job)
+
+    def get_job(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return copy.deepcopy(job) if job else None
+
+    def get_batch(self, batch_id):
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if job['batch_id'] == batch_id]
+            return copy.deepcopy(sorted(jobs, key=lambda job: job['position']))
+
+    def batch_summary(self, batch_id):
+        summary = empty_summary()
+        with self._lock:
+            jobs = sorted(
+                (job for job in self._jobs.values() if job['batch_id'] == batch_id), key=lambda job: job['position']
+            )
+            for job in jobs:
+                summary[job['status']] += 1
+                summary['total'] += 1
+                if job['status'] == FINISHED:
+                    summary['cached'] += bool((job['result'] or {}).get('cached'))
+                elif job['status'] == RUNNING:
+                    summary['progress'] += job['progress'] or 0.0
+                    summary['speed'] += job['speed'] or 0.0
+                    summary['current'] = summary['current'] or job['url']
+        return summary
+
+    def batch_items(self, batch_id, offset=0, limit=None, statuses=None):
+        with self._lock:
+            jobs = sorted(
+                (
+                    job for job in self._jobs.values()
+                    if job['batch_id'] == batch_id and (not statuses or job['status'] in statuses)
+                ),
+                key=lambda job: job['position'],
+            )
+            return [
+                (job['position'], job['url'], job['status'], bool((job['result'] or {}).get('cached')), job['error'])
+                for job in jobs[offset:None if limit is None else offset + limit]
+            ]
+
+    def last_finished(self, url, format_choice, quality_choice):
+        with self._lock:
+            jobs = [
+                job for job in self._jobs.values()
+                if job['url'] == url and job['status'] == FINISHED
+                and job['options']['format_choice'] == format_choice and job['options']['quality_choice'] == quality_choice
+            ]
+            if not jobs:
+                return None
+            return copy.deepcopy(min(jobs, key=lambda job: (job['info'] is None, -job['updated'])))
+
+    def history(self, session=None, offset=0, limit=None):
+        with self._lock:
+            jobs = sorted(self._finished(session), key=lambda job: job['updated'], reverse=True)
+            return copy.deepcopy(jobs[offset:None if limit is None else offset + limit])
+
+    def history_count(self, session=None):
+        with self._lock:
+            return len(self._finished(session))
+
+    def _finished(self, session):
+        return [
+            job for job in self._jobs.values()
+            if job['status'] == FINISHED and (session is None or job['options'].get('session') == session)
+        ]
+
+    def finished_keys(self, keys):
+        with self._lock:
+            return {
+                job['result'].get('key') for job in self._jobs.values()
+                if job['status'] == FINISHED and job['result'] and job['result'].get('key') in keys
+            }
+
+    def active_jobs(self):
+        with self._lock:
+            return [
+                (job['id'], job['url'], copy.deepcopy(job['options']))
+                for job in self._jobs.values() if job['status'] in (QUEUED, RUNNING) and not job['follows']
+            ]
+
+    def queue_depth(self):
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job['status'] == QUEUED and not job['follows'])
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(copy.deepcopy(fields), updated=time.time())
+
+    def lease(self, worker, limit, lease_seconds):
+        now = time.time()
+        with self._lock:
+            queued = [job for job in self._jobs.values() if job['status'] == QUEUED and not job['follows']]
+            # Same order as FAIR_QUEUE_SQL
+            turns = {}
+            counts = {}
+            for job in sorted(queued, key=lambda job: (job['position'], job['created'])):
+                counts[job['batch_id']] = counts.get(job['batch_id'], 0) + 1
+                turns[job['id']] = counts[job['batch_id']]
+            queued.sort(key=lambda job: (
+                job['kind'] != "video",
+                job['created'] if job['kind'] == "video" else 0,
+                turns[job['id']],
+                job['created'],
+            ))
+            leased = []
+            for job in queued[:limit]:
+                job.update(status=RUNNING, worker=worker, lease_until=now + lease_seconds,
+                           progress=0.0, message=None, speed=None, updated=now)
+                leased.append(copy.deepcopy(job))
+            return leased
+
+    def heartbeat(self, worker, live, lease_seconds):
+        now = time.time()
+        with self._lock:
+            held = set()
+            for job in self._jobs.values():
+                if job['worker'] == worker and job['status'] == RUNNING:
+                    job['lease_until'] = now + lease_seconds
+                    held.add(job['id'])
+            for job_id, fields in live.items():
+                if job_id in held:
+                    self._jobs[job_id].update({key: fields[key] for key in LIVE_FIELDS if key in fields})
+            return set(live) - held
+
+    def finish(self, job_id, worker, status, result=None, error=None):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job['worker'] != worker or job['status'] != RUNNING:
+                return False
+            job.update(status=status, result=copy.deepcopy(result), error=error,
+                       progress=1.0 if status == FINISHED else None, message=None, speed=None,
+                       lease_until=None, updated=time.time())
+            self.follow(job_id)
+            return True
+
+    def follow(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job['status'] not in DONE_STATUSES:
+                return
+            for follower in self._jobs.values():
+                if follower['follows'] == job_id and follower['status'] == QUEUED:
+                    follower.update(
+                        status=job['status'], info=copy.deepcopy(job['info']),
+                        result={**job['result'], 'cached': True} if job['result'] else None,
+                        error=job['error'], progress=job['progress'], message=None, updated=time.time(),
+                    )
+
+    def requeue_expired(self):
+        now = time.time()
+        count = 0
+        with self._lock:
+            for job in self._jobs.values():
+                if job['status'] == RUNNING and job['lease_until'] is not None and job['lease_until'] < now:
+                    job.update(status=QUEUED, worker=None, lease_until=None, speed=None, updated=now,
+                               message="🔁 Queued again after its worker stopped responding")
+                    count += 1
+        return count
+
+    def release(self, worker):
+        with self._lock:
+            for job in self._jobs.values():
+                if job['worker'] == worker and job['status'] == RUNNING:
+                    job.update(status=QUEUED, worker=None, lease_until=None, speed=None, updated=time.time())
+
+
+def _open_sqlite(url):
+    # Like SQLAlchemy: sqlite:///relative/path, sqlite:////absolute/path
+    return SQLiteJobStore(url.path[1:])
+
+
+BACKENDS = {
+    'sqlite': _open_sqlite,
+    'memory': lambda url: MemoryJobStore(),
+}
+
+
+def register_backend(scheme, factory):
+    """Make ``scheme://...`` store URLs open with ``factory(parsed_url)``"""
+    BACKENDS[scheme] = factory
+
+
+def default_store_url():
+    """``YTDL_JOB_STORE``, else the SQLite queue in the state folder"""
+    return os.environ.get("YTDL_JOB_STORE") or "sqlite:///" + state_file("jobs.sqlite")
+
+
+def open_job_store(url):
+    """Open the job store at ``url`` (e.g. ``sqlite:///.ytdl/jobs.sqlite`` or ``memory://``)"""
+    parsed = urlparse(url)
+    if parsed.scheme not in BACKENDS:
+        raise ValueError(f"Unknown job store: {url} (known: {', '.join(sorted(BACKENDS))})")
+    return BACKENDS[parsed.scheme](parsed)
@@ -0,0 +1,127 @@
+"""Metadata cache for yt-dlp info dicts, keyed by video ID.
+
+Entries expire after a TTL and the least recently used ones are evicted
+once the cache is full. An optional SQLite backend keeps entries across
+restarts and shares them between processes.
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from script.db import connect, state_file
+from script.urls import canonical_url, video_id_from_url
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (
+    key TEXT PRIMARY KEY,
+    info TEXT NOT NULL,
+    expires REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS metadata_accessed ON metadata (accessed);
+"""
+
+
+def cache_key(url, prefix="video"):
+    """Cache key for a URL: the video ID when there is one, else its canonical form"""
+    return f"{prefix}:{video_id_from_url(url) or canonical_url(url)}"
+
+
+class MetadataCache:
+    """TTL + LRU cache with an optional SQLite backend"""
+
+    def __init__(self, ttl=1800, max_entries=512, db_path=None, max_disk_entries=4096):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            self._db = connect(db_path)
+            self._db.executescript(SCHEMA)
+
+    def get(self, key):
+        """Cached info for ``key``, or None when missing or expired"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, info = entry
+                if expires > now:
+                    self._entries.move_to_end(key)
+                    return info
+                del self._entries[key]
+
+            if self._db is None:
+                return None
+            row = self._db.execute("SELECT info, expires FROM metadata WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row['expires'] <= now:
+                self._db.execute("DELETE FROM metadata WHERE key = ?", (key,))
+                return None
+            self._db.execute("UPDATE metadata SET accessed = ? WHERE key = ?", (now, key))
+            info = json.loads(row['info'])
+            self._remember(key, row['expires'], info)
+            return info
+
+    def put(self, key, info):
+        """Store a JSON-serialisable info dict"""
+        now = time.time()
+        expires = now + self.ttl
+        with self._lock:
+            self._remember(key, expires, info)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO metadata (key, info, expires, accessed) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(info), expires, now),
+                )
+                self._db.execute(
+                    "DELETE FROM metadata WHERE key IN"
+                    " (SELECT key FROM metadata ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                    (self.max_disk_entries,),
+                )
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+            if self._db is not None:
+                self._db.execute("DELETE FROM metadata WHERE key = ?", (key,))
+
+    def _remember(self, key, expires, info):
+        self._entries[key] = (expires, info)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_metadata_cache():
+    """The metadata cache shared by every session in this process.
+
+    Set ``YTDL_METADATA_CACHE=sqlite`` to keep entries on disk as well,
+    shared with the other processes, or ``memory`` to keep them in this
+    process only. The default is ``sqlite`` when the downloads run in
+    separate worker processes (``YTDL_EMBEDDED_WORKER=0`` in the app, and
+    ``python -m script.worker``), so they reuse the pages' lookups.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            db_path = None
+            default = "sqlite" if os.environ.get("YTDL_EMBEDDED_WORKER", "1") == "0" else "memory"
+            if os.environ.get("YTDL_METADATA_CACHE", default) == "sqlite":
+                db_path = state_file("metadata.sqlite")
+            _cache = MetadataCache(
+                ttl=float(os.environ.get("YTDL_METADATA_TTL", 1800)),
+                max_entries=int(os.environ.get("YTDL_METADATA_ENTRIES", 512)),
+                db_path=db_path,
+            )
+        return _cache
@@ -0,0 +1,186 @@
+"""Download metrics in the Prometheus text format.
+
+Counters, gauges and histograms are kept in process memory and served
+on ``/metrics`` by the local HTTP server (see ``script.http_server``).
+The Metrics page reads the same registry.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+from script import http_server
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; wide enough for a metadata lookup and a long transcode alike
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+def _label_key(labelnames, labels):
+    if set(labels) != set(labelnames):
+        raise ValueError(f"Expected labels {labelnames}, got {tuple(labels)}")
+    return tuple(str(labels[name]) for name in labelnames)
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=(), func=None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.func = func
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, value in self.samples():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, values)} {value}")
+        return lines
+
+    def samples(self):
+        if self.func is not None:
+            # Read from elsewhere when rendered, e.g. the transfer statistics
+            return [((), self.func())]
+        with self._lock:
+            return sorted(self._values.items())
+
+
+class Counter(Metric):
+    """A value that only goes up, or is read from ``func`` when rendered"""
+
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(_label_key(self.labelnames, labels), 0)
+
+
+class Gauge(Metric):
+    """A value that goes up and down, or is read from ``func`` when rendered"""
+
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[_label_key(self.labelnames, labels)] = value
+
+
+class Histogram(Metric):
+    """Observations counted in cumulative buckets, with their sum"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - started, **labels)
+
+    def snapshot(self):
+        """``{label values: (count, sum, bucket counts)}``"""
+        with self._lock:
+            return {key: (sum(counts), total, list(counts)) for key, (counts, total) in self._values.items()}
+
+    def quantile(self, fraction, **labels):
+        """Approximate quantile: the upper bound of the bucket it falls in"""
+        with self._lock:
+            counts, _ = self._values.get(_label_key(self.labelnames, labels), (None, 0.0))
+        if not counts:
+            return None
+        rank = fraction * sum(counts)
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, (count, total, counts) in sorted(self.snapshot().items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, values, [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, values)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, values)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def register(self, metric):
+        with self._lock:
+            # Re-registering (e.g. a second JobManager) replaces the old metric
+            self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name):
+        with self._lock:
+            return self._metrics.get(name)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "ytdl_stage_seconds", "Time spent per download stage", ["stage"],
+))
+DOWNLOADS = REGISTRY.register(Counter(
+    "ytdl_downloads_total", "Download attempts by result (downloaded, cached, instant, streamed, error)", ["result"],
+))
+ERRORS = REGISTRY.register(Counter(
+    "ytdl_errors_total", "Failed download attempts by error category", ["category"],
+))
+RETRIES = REGISTRY.register(Counter(
+    "ytdl_retries_total", "Download attempts scheduled again by error category", ["category"],
+))
+METADATA_LOOKUPS = REGISTRY.register(Counter(
+    "ytdl_metadata_lookups_total", "Metadata cache lookups by result (hit, miss)", ["result"],
+))
+
+
+@http_server.route("/metrics")
+def metrics_endpoint(request):
+    return 200, CONTENT_TYPE, REGISTRY.render().encode()
@@ -0,0 +1,89 @@
+"""Lazy expansion of playlist and channel URLs into video entries.
+
+The playlist is extracted with ``process=False`` so yt-dlp hands back its
+entries as a generator (or a paged list) instead of resolving every
+video first. Pages are fetched only as entries are consumed, and a
+``start``/``end`` slice stops the listing as soon as it is satisfied.
+"""
+import itertools
+import re
+
+from script.ydl_pool import borrow_ydl
+
+
+PLAYLIST_URL_RE = re.compile(r"/playlist\?|/@[^/?#]+|/channel/|/c/|/user/|[?&]list=")
+
+
+def is_playlist_url(url):
+    """True for playlist and channel URLs (not for a single video)"""
+    if "list=" in url and ("v=" in url or "youtu.be/" in url):
+        # A video opened from a playlist: download the video only
+        return False
+    return bool(PLAYLIST_URL_RE.search(url))
+
+
+def _resolve(ydl, url, ie_key=None):
+    """Follow ``url`` results until reaching an unprocessed playlist or video"""
+    info = ydl.extract_info(url, download=False, ie_key=ie_key, process=False)
+    for _ in range(5):
+        if info.get('_type') not in ('url', 'url_transparent'):
+            break
+        info = ydl.extract_info(info['url'], download=False, ie_key=info.get('ie_key'), process=False)
+    return info
+
+
+def _entries(ydl, info):
+    """Yield video entries of a raw playlist result, descending into sub-playlists"""
+    entries = info.get('entries')
+    if entries is None:
+        if info.get('_type', 'video') == 'video':
+            yield info
+        return
+
+    for entry in entries:
+        if not entry:
+            continue
+        entry_type = entry.get('_type', 'video')
+        if entry_type in ('playlist', 'multi_video'):
+            yield from _entries(ydl, entry)
+        elif entry_type == 'url' and entry.get('ie_key') not in (None, 'Youtube') and is_playlist_url(entry['url']):
+            # Channel tabs and similar nested playlists
+            yield from _entries(ydl, _resolve(ydl, entry['url'], entry.get('ie_key')))
+        else:
+            yield entry
+
+
+def entry_url(entry):
+    return entry.get('webpage_url') or entry.get('original_url') or entry['url']
+
+
+def iter_playlist_entries(url, start=0, end=None, ydl_opts=None):
+    """Yield ``{'url', 'id', 'title'}`` for each video of a playlist or channel.
+
+    ``start`` and ``end`` are zero-based slice bounds, like the legacy
+    ``playlist.video_urls[start:end]``. Entries are yielded while later
+    pages are still unlisted.
+    """
+    opts = {
+        'quiet': True,
+        'no_warnings': True,
+        'extract_flat': 'in_playlist',
+        'lazy_playlist': True,
+    }
+    opts.update(ydl_opts or {})
+    with borrow_ydl(opts) as ydl:
+        info = _resolve(ydl, url)
+        for entry in itertools.islice(_entries(ydl, info), start, end):
+            yield {
+                'url': entry_url(entry),
+                'id': entry.get('id'),
+                'title': entry.get('title'),
+            }
+
+
+def get_playlist_title(url):
+    """Title of a playlist without listing its entries"""
+    opts = {'quiet': True, 'no_warnings': True, 'extract_flat': 'in_playlist'}
+    with borrow_ydl(opts) as ydl:
+        info = _resolve(ydl, url)
+    return info.get('title') or info.get('playlist_title') or url, info.get('playlist_count')
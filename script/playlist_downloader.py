@@ -1,43 +1,289 @@
-from pytube import YouTube, Playlist
+"""Legacy playlist helpers and the headless batch runner.
 
+Run ``python -m script.playlist_downloader --help`` for the command line
+options. Downloads go through the same format selection, content store
+and catalogue as the Streamlit pages.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future
 
-path = "Downloads"
+from script.bandwidth import BandwidthShaper, parse_rate
+from script.content_store import open_store
+from script.db import state_file
+from script.download_engine import (
+    DOWNLOAD_PATH, DownloadEngine, build_ydl_opts, default_output_template, download_url, fetch_video,
+    get_format_selector,
+)
+from script.errors import CATEGORIES, classify_error
+from script.formats import VIDEO_QUALITIES
+from script.job_store import default_store_url, open_job_store
+from script.playlist import get_playlist_title, is_playlist_url, iter_playlist_entries
+from script.playlist_sync import PlaylistSync, SyncState
+from script.progress import transfer_stats
+from script.retry import RetryPolicy
+from script.transcode import get_transcode_pool
+from script.urls import canonical_url
 
 
-def playlist_downloader(playlist_url, start, end):
+path = DOWNLOAD_PATH
+
+
+def playlist_downloader(playlist_url, start, end, max_workers=4):
     
-    playlist = Playlist(playlist_url)
+    title, count = get_playlist_title(playlist_url)
     
-    print(f"Downloading : {playlist.title}")
+    print(f"Downloading : {title}")
     
     print("-------------")
-    print(playlist.title)
-    print(f"Video Sayısı: {len(playlist.videos)}")
+    print(title)
+    if count:
+        print(f"Video Sayısı: {count}")
     print("-------------")
     
-    for url in playlist.video_urls[start:end]:
-        video = YouTube(url,use_oauth=True)
-        print(f"{video.title} İndiriliyor...")
-        video.streams.get_highest_resolution().download(path, filename=video.title + ".mp4")
-        print(f"{video.title} indirildi.")
+    format_selector, _ = get_format_selector("MP4 (Video)", "Highest Quality")
+    ydl_opts = build_ydl_opts("MP4 (Video)", format_selector, default_output_template(path))
+    
+    # Entries are listed lazily: the first videos download while later pages load
+    urls = (entry['url'] for entry in iter_playlist_entries(playlist_url, start, end))
+    with DownloadEngine(max_workers=max_workers) as engine:
+        for url, error in engine.map(urls, ydl_opts):
+            if error is None:
+                print(f"{url} indirildi.")
+            else:
+                print(f"{url} indirilemedi: {error}")
 
     
 def video_downloader(video_url):
     
-    video = YouTube(video_url)
-    video_stream = video.streams.get_highest_resolution()
-    print(f"{video.title} Dönüştürülüyor...")
-    video_stream.download(path, filename=video.title + ".mp4")
-    print(f"{video.title} indirildi.")
+    format_selector, _ = get_format_selector("MP4 (Video)", "Highest Quality")
+    print(f"{video_url} İndiriliyor...")
+    download_url(video_url, build_ydl_opts("MP4 (Video)", format_selector, default_output_template(path)))
+    print(f"{video_url} indirildi.")
+
+FORMATS = {
+    'mp4': "MP4 (Video)",
+    'mp3': "MP3 (Audio)",
+    'm4a': "M4A (Audio)",
+}
+
+QUALITIES = VIDEO_QUALITIES
+
+logger = logging.getLogger("ytdl.batch")
+
+
+def read_urls(sources):
+    """Yield URLs from files (``-`` is stdin), skipping blanks and ``#`` comments"""
+    for source in sources:
+        handle = sys.stdin if source == "-" else open(source, encoding="utf-8")
+        try:
+            for line in handle:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    yield line
+        finally:
+            if handle is not sys.stdin:
+                handle.close()
+
+
+def expand_urls(urls, start=0, end=None, sync=None):
+    """Yield ``(url, source, error)``: playlists and channels are expanded into their videos.
+
+    URLs are yielded in canonical form and only once, however often they
+    were listed or spelled. With a ``sync`` (``PlaylistSync``) only the
+    playlist entries not downloaded by an earlier run are yielded. A
+    playlist that cannot be listed is yielded once with the ``error``
+    (None for everything else), to be reported instead of downloaded.
+    """
+    seen = set()
+    duplicates = 0
+    for url in urls:
+        url = canonical_url(url)
+        if url in seen:
+            duplicates += 1
+            continue
+        seen.add(url)
+        if not is_playlist_url(url):
+            yield url, None, None
+            continue
+        try:
+            entries = iter_playlist_entries(url, start, end)
+            if sync is not None:
+                entries = sync.new_entries(url, entries)
+            for entry in entries:
+                entry_url = canonical_url(entry['url'])
+                if entry_url in seen:
+                    duplicates += 1
+                    continue
+                seen.add(entry_url)
+                yield entry_url, url, None
+        except Exception as e:
+            logger.error("Could not list %s: %s", url, e)
+            # Like the web app: the playlist becomes a failed item, classified by the listing error
+            error = RuntimeError(f"Could not list playlist: {e}")
+            error.__cause__ = e
+            yield url, url, error
+    if duplicates:
+        logger.info("Merged %d duplicate URLs", duplicates)
+
+
+def app_keys(keys):
+    """Store keys among ``keys`` that finished downloads of the web app use"""
+    return open_job_store(default_store_url()).finished_keys(keys)
+
+
+def open_sync_state(output_dir):
+    """Sync state next to the store that ``open_store`` uses for ``output_dir``"""
+    if os.path.abspath(output_dir) == os.path.abspath(DOWNLOAD_PATH):
+        return SyncState(state_file("sync.sqlite"))
+    os.makedirs(output_dir, exist_ok=True)
+    return SyncState(os.path.join(output_dir, "sync.sqlite"))
+
+
+def run_batch(urls, format_choice, quality_choice, store, concurrency=4, per_host=2, retries=2, backoff=5.0,
+              transcoder=None, shaper=None):
+    """Download ``urls`` and yield one report record per item, in input order.
+
+    ``urls`` are ``(url, source, error)`` items as ``expand_urls`` yields
+    them; items with an ``error`` are reported as failed. Transient failures are retried with jittered exponential backoff;
+    permanent ones (private or removed videos, missing FFmpeg) fail at once.
+    A ``shaper`` (``script.bandwidth.BandwidthShaper``) caps the bandwidth.
+    """
+    shaper = shaper or BandwidthShaper()
+
+    def download(url, state):
+        with shaper.flow() as flow:
+            return fetch_video(url, format_choice, quality_choice, store, transcoder=transcoder,
+                               progress_sinks=[transfer_stats.sink(url)], throttle=flow)
+
+    def retrying(url, state, attempt, delay, error):
+        state['attempts'] = attempt
+        logger.warning("%s failed (%s), attempt %d/%d in %.1fs", url, error, attempt, retries + 1, delay)
+
+    window = deque()
+    retry = RetryPolicy(retries=retries, backoff=backoff)
+    with DownloadEngine(max_workers=concurrency, per_host_limit=per_host, retry=retry) as engine:
+        for url, source, error in urls:
+            state = {'attempts': 1}
+            if error is not None:
+                # Nothing to download
+                future = Future()
+                future.set_exception(error)
+            else:
+                future = engine.submit(
+                    url, state, func=download,
+                    on_retry=lambda attempt, delay, error, url=url, state=state: retrying(
+                        url, state, attempt, delay, error,
+                    ),
+                )
+            window.append((url, source, state, time.monotonic(), future))
+            if len(window) >= concurrency * 2:
+                yield report_record(*window.popleft())
+        while window:
+            yield report_record(*window.popleft())
+
+
+def report_record(url, source, state, started, future):
+    record = {'url': url}
+    if source:
+        record['playlist'] = source
+    error = future.exception()
+    if error is None:
+        record.update(status="ok", attempts=state['attempts'], **future.result())
+    else:
+        category = classify_error(error)
+        record.update(
+            status="error", attempts=state['attempts'], error=str(error),
+            category=category, retryable=CATEGORIES[category].retryable,
+        )
+    record['seconds'] = round(time.monotonic() - started, 2)
+    return record
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m script.playlist_downloader",
+        description="Download YouTube videos and playlists without the web interface.",
+    )
+    parser.add_argument("inputs", nargs="*", default=["-"], help="files with one URL per line (default: stdin)")
+    parser.add_argument("-f", "--format", choices=sorted(FORMATS), default="mp4")
+    parser.add_argument("-q", "--quality", choices=QUALITIES, default="Highest Quality")
+    parser.add_argument("-j", "--concurrency", type=int, default=4, help="parallel downloads (default: 4)")
+    parser.add_argument("--per-host", type=int, default=2, help="parallel downloads per host (default: 2)")
+    parser.add_argument("--retries", type=int, default=2, help="retries per URL after transient errors (default: 2)")
+    parser.add_argument("--backoff", type=float, default=5.0,
+                        help="seconds before the first retry, doubled each time and jittered (default: 5)")
+    parser.add_argument("-r", "--limit-rate", type=parse_rate, default=None,
+                        help="total bandwidth for all downloads, e.g. 500K or 10M (default: no limit)")
+    parser.add_argument("-o", "--output-dir", default=DOWNLOAD_PATH, help=f"download folder (default: {DOWNLOAD_PATH})")
+    parser.add_argument("--start", type=int, default=0, help="first playlist entry (zero-based)")
+    parser.add_argument("--end", type=int, default=None, help="stop before this playlist entry")
+    parser.add_argument("--sync", action="store_true",
+                        help="download only playlist entries that earlier --sync runs have not downloaded")
+    parser.add_argument("--prune", action="store_true",
+                        help="with --sync, delete downloads of entries that left their playlist")
+    parser.add_argument("--report", default="-", help="JSON-lines report file (default: stdout)")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args(argv)
+    if args.prune and not args.sync:
+        parser.error("--prune needs --sync")
+    if args.prune and (args.start or args.end is not None):
+        # A slice does not show which entries left the playlist
+        parser.error("--prune cannot be combined with --start/--end")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format="%(asctime)s %(levelname)s %(message)s",
+        stream=sys.stderr,
+    )
+
+    store = open_store(args.output_dir, DOWNLOAD_PATH)
+    sync = None
+    if args.sync:
+        # Only the default folder's store is shared with the web app
+        shared = os.path.abspath(args.output_dir) == os.path.abspath(DOWNLOAD_PATH)
+        sync = PlaylistSync(
+            open_sync_state(args.output_dir), store, FORMATS[args.format], args.quality, prune=args.prune,
+            in_use=app_keys if shared else None,
+        )
+    urls = expand_urls(read_urls(args.inputs), args.start, args.end, sync=sync)
+    report = sys.stdout if args.report == "-" else open(args.report, "a", encoding="utf-8")
 
-def main():
+    # Start Download
+    ok = failed = 0
+    try:
+        for record in run_batch(
+            urls, FORMATS[args.format], args.quality, store,
+            concurrency=args.concurrency, per_host=args.per_host, retries=args.retries, backoff=args.backoff,
+            transcoder=get_transcode_pool(), shaper=BandwidthShaper(global_rate=args.limit_rate),
+        ):
+            report.write(json.dumps(record, ensure_ascii=False) + "\n")
+            report.flush()
+            if sync is not None:
+                sync.record(record)
+            if record['status'] == "ok":
+                ok += 1
+                logger.info("✅ %s -> %s", record['url'], record['path'])
+            else:
+                failed += 1
+                logger.error("❌ %s: %s", record['url'], record['error'])
+    finally:
+        if report is not sys.stdout:
+            report.close()
 
-        
-    # start = int(input("Başlangıç: "))
-    # end = int(input("Bitiş: "))
-    pass
+    logger.info("Finished: %d downloaded, %d failed", ok, failed)
+    return 1 if failed else 0
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
     
     
\ No newline at end of file
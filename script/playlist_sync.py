@@ -0,0 +1,160 @@
+"""Incremental playlist mirroring for the batch runner (``--sync``).
+
+Every entry downloaded from a playlist is remembered per format and
+quality. The next run only lists the playlist (flat, a page at a time)
+and downloads the entries it has not seen, so a daily mirror of a
+playlist that gained three videos costs three downloads plus the
+listing. Entries that failed are not remembered and are tried again.
+
+With ``prune`` the entries that left the playlist are forgotten and
+their files removed from the store, but only files the sync downloaded
+itself that no other synced playlist has and nothing else uses: a file
+that was already in the store, or that downloads of the web app list
+in their history, is kept. A listing that comes back empty, or without
+more than ``PRUNE_MAX_SHARE`` of the known entries, looks more like a
+hiccup of the site (a private or region-blocked playlist, a truncated
+listing) than like a real change: nothing is pruned then.
+"""
+import logging
+import os
+import threading
+import time
+
+from script.db import connect
+from script.urls import canonical_url
+
+
+logger = logging.getLogger("ytdl.sync")
+
+# Largest share of the known entries one run may prune (1 to allow any)
+PRUNE_MAX_SHARE = float(os.environ.get("YTDL_SYNC_PRUNE_MAX_SHARE", 0.5))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sync_entries (
+    playlist TEXT NOT NULL,
+    format TEXT NOT NULL,
+    quality TEXT NOT NULL,
+    entry_id TEXT NOT NULL,
+    url TEXT NOT NULL,
+    store_key TEXT,
+    owned INTEGER NOT NULL DEFAULT 0,
+    synced REAL NOT NULL,
+    PRIMARY KEY (playlist, format, quality, entry_id)
+);
+CREATE INDEX IF NOT EXISTS sync_entries_key ON sync_entries (store_key);
+"""
+
+# Columns added since the first version; entries synced before are not owned, so never pruned
+MIGRATIONS = [
+    ('owned', "INTEGER NOT NULL DEFAULT 0"),
+]
+
+
+class SyncState:
+    """Entries already downloaded per playlist, format and quality"""
+
+    def __init__(self, db_path):
+        self._db = connect(db_path)
+        self._db.executescript(SCHEMA)
+        for column, definition in MIGRATIONS:
+            if column not in {row[1] for row in self._db.execute("PRAGMA table_info(sync_entries)")}:
+                self._db.execute(f"ALTER TABLE sync_entries ADD COLUMN {column} {definition}")
+        self._lock = threading.Lock()
+
+    def known(self, playlist, format_choice, quality):
+        """``{entry_id: store_key}`` of the entries downloaded from ``playlist``"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT entry_id, store_key FROM sync_entries WHERE playlist = ? AND format = ? AND quality = ?",
+                (playlist, format_choice, quality),
+            ).fetchall()
+        return {row['entry_id']: row['store_key'] for row in rows}
+
+    def add(self, playlist, format_choice, quality, entry_id, url, store_key=None, owned=False):
+        """Remember an entry; ``owned`` when the sync downloaded its file rather than finding it in the store"""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sync_entries (playlist, format, quality, entry_id, url, store_key, owned, synced)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (playlist, format_choice, quality, entry_id, url, store_key, int(owned), time.time()),
+            )
+
+    def remove(self, playlist, format_choice, quality, entry_ids):
+        """Forget entries; returns the store keys the sync owns that no synced playlist uses any more"""
+        with self._lock:
+            keys = set()
+            for entry_id in entry_ids:
+                params = (playlist, format_choice, quality, entry_id)
+                where = "WHERE playlist = ? AND format = ? AND quality = ? AND entry_id = ?"
+                row = self._db.execute(f"SELECT store_key, owned FROM sync_entries {where}", params).fetchone()
+                self._db.execute(f"DELETE FROM sync_entries {where}", params)
+                if row and row['store_key'] and row['owned']:
+                    keys.add(row['store_key'])
+            used = {
+                row[0] for row in self._db.execute(
+                    f"SELECT store_key FROM sync_entries WHERE store_key IN ({', '.join('?' for _ in keys)})",
+                    tuple(keys),
+                )
+            } if keys else set()
+        return keys - used
+
+
+class PlaylistSync:
+    """Filters playlist listings down to new entries and records finished ones"""
+
+    def __init__(self, state, store, format_choice, quality, prune=False, in_use=None):
+        self.state = state
+        self.store = store
+        self.format_choice = format_choice
+        self.quality = quality
+        self.prune = prune
+        # Returns the keys among its argument that something besides the sync still uses
+        self.in_use = in_use
+        # Canonical URL -> (playlist, entry id) of every new entry handed out
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def new_entries(self, playlist, entries):
+        """Yield the entries of ``playlist`` not downloaded yet.
+
+        ``entries`` is the listing (see ``iter_playlist_entries``); pruning
+        happens only once it has been read to the end.
+        """
+        known = self.state.known(playlist, self.format_choice, self.quality)
+        listed = set()
+        new = 0
+        for entry in entries:
+            url = canonical_url(entry['url'])
+            entry_id = entry.get('id') or url
+            listed.add(entry_id)
+            if entry_id in known:
+                continue
+            new += 1
+            with self._lock:
+                self._pending.setdefault(url, []).append((playlist, entry_id))
+            yield entry
+
+        removed = set(known) - listed
+        logger.info("🔄 %s: %d new, %d already downloaded, %d no longer listed",
+                    playlist, new, len(known) - len(removed), len(removed))
+        if removed and self.prune and not listed:
+            logger.warning("⚠️ %s: the listing is empty; not pruning %d entries", playlist, len(removed))
+        elif removed and self.prune and len(removed) > PRUNE_MAX_SHARE * len(known):
+            logger.warning("⚠️ %s: %d of %d entries are no longer listed; not pruning that many"
+                           " (YTDL_SYNC_PRUNE_MAX_SHARE=%s)", playlist, len(removed), len(known), PRUNE_MAX_SHARE)
+        elif removed and self.prune:
+            keys = self.state.remove(playlist, self.format_choice, self.quality, removed)
+            if keys and self.in_use is not None:
+                keys -= self.in_use(keys)
+            self.store.remove(keys)
+            logger.info("🧹 %s: pruned %d entries (%d files)", playlist, len(removed), len(keys))
+
+    def record(self, record):
+        """Remember the entries behind a finished report record (see ``run_batch``)"""
+        with self._lock:
+            pending = self._pending.pop(record['url'], [])
+        if record['status'] != "ok":
+            return
+        for playlist, entry_id in pending:
+            self.state.add(playlist, self.format_choice, self.quality, entry_id, record['url'], record.get('key'),
+                           owned=not record.get('cached', True))
@@ -0,0 +1,102 @@
+"""Concurrent metadata lookup for pasted URL batches.
+
+The Playlist page resolves every pasted video URL as soon as the list is
+entered, a few at a time, instead of one by one in the download loop.
+The preview shows titles, durations and estimated sizes, and dead,
+private and duplicate URLs are dropped before anything is queued.
+
+Lookups go through ``extract_video_info``, so the metadata cache holds
+every result by the time the downloads start: nothing is extracted twice.
+Workers in other processes see the results through the SQLite metadata
+cache (see ``get_metadata_cache``). Only the first ``PREFETCH_LIMIT``
+videos are looked up, so a list of thousands of URLs does not hold the
+page for minutes; the rest are checked when they download.
+"""
+import asyncio
+import os
+
+from script.content_store import video_identity
+from script.errors import CATEGORIES, classify_error
+from script.formats import plan_formats
+from script.playlist import is_playlist_url
+
+
+PREFETCH_CONCURRENCY = int(os.environ.get("YTDL_PREFETCH_CONCURRENCY", 8))
+# Below the in-memory metadata cache's size, so the results are still there for the downloads
+PREFETCH_LIMIT = int(os.environ.get("YTDL_PREFETCH_LIMIT", 200))
+
+# Status of a pasted URL after the lookup
+READY = "ready"
+PLAYLIST = "playlist"        # expanded when the batch runs
+UNCHECKED = "unchecked"      # transient lookup failure: the download retries it
+DUPLICATE = "duplicate"
+UNAVAILABLE = "unavailable"  # private, removed, unsupported...
+
+KEEP_STATUSES = (READY, PLAYLIST, UNCHECKED)
+
+
+async def _lookup(url, semaphore):
+    # Loads yt-dlp on the first lookup instead of with the page
+    from script.download_engine import extract_video_info
+
+    async with semaphore:
+        # yt-dlp is blocking; each lookup runs on the default thread pool
+        return await asyncio.to_thread(extract_video_info, url)
+
+
+async def prefetch_async(urls, format_choice, quality_choice, concurrency=PREFETCH_CONCURRENCY, limit=PREFETCH_LIMIT):
+    """Look up the first ``limit`` videos with at most ``concurrency`` lookups at a time; see ``prefetch``"""
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    videos = [url for url in dict.fromkeys(urls) if not is_playlist_url(url)]
+    lookups = {url: asyncio.ensure_future(_lookup(url, semaphore)) for url in videos[:limit]}
+    await asyncio.gather(*lookups.values(), return_exceptions=True)
+
+    items = []
+    seen = {}
+    for url in urls:
+        item = {'url': url, 'status': READY, 'title': None, 'duration': None, 'size': None, 'error': None}
+        items.append(item)
+        if url in seen:
+            item['status'] = DUPLICATE
+            item['error'] = "Pasted more than once"
+            continue
+        seen[url] = url
+        if is_playlist_url(url):
+            item['status'] = PLAYLIST
+            continue
+        if url not in lookups:
+            item['status'] = UNCHECKED
+            item['error'] = f"Checked when it downloads (only the first {limit} videos are checked here)"
+            continue
+
+        error = lookups[url].exception()
+        if error is not None:
+            category = classify_error(error)
+            # An unexplained failure is left to the download, which reports it
+            item['status'] = UNCHECKED if category == 'unknown' or CATEGORIES[category].retryable else UNAVAILABLE
+            item['error'] = str(error)
+            continue
+
+        info = lookups[url].result()
+        item['title'] = info.get('title')
+        item['duration'] = info.get('duration')
+        plan = plan_formats(info, format_choice, quality_choice)
+        item['size'] = plan['size'] if plan else None
+        # Two spellings of the same video count as duplicates too
+        identity = video_identity(info)
+        if identity in seen:
+            item['status'] = DUPLICATE
+            item['error'] = f"Same video as {seen[identity]}"
+        else:
+            seen[identity] = url
+    return items
+
+
+def prefetch(urls, format_choice, quality_choice, concurrency=PREFETCH_CONCURRENCY, limit=PREFETCH_LIMIT):
+    """Resolve pasted URLs (the first ``limit`` videos) before they are queued.
+
+    Returns one dict per URL, in input order, with ``url``, ``status``
+    (see ``KEEP_STATUSES`` for the ones worth downloading), ``title``,
+    ``duration``, ``size`` (estimated bytes) and ``error``.
+    """
+    return asyncio.run(prefetch_async(urls, format_choice, quality_choice, concurrency, limit))
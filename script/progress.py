@@ -0,0 +1,195 @@
+"""Throttled progress reporting for yt-dlp downloads.
+
+yt-dlp calls its progress hooks for every block it receives. A
+ProgressPipeline coalesces those callbacks into at most a few events per
+second (or one per percent step), smooths speed and ETA with an
+exponential moving average and fans the events out to any number of
+sinks: job state for the UI, logs and transfer statistics.
+"""
+import logging
+import threading
+import time
+
+from script.metrics import REGISTRY, Counter, Gauge
+
+
+logger = logging.getLogger(__name__)
+
+
+class ProgressEvent:
+    """One coalesced progress update"""
+
+    __slots__ = ('status', 'downloaded', 'total', 'fraction', 'speed', 'eta', 'filename')
+
+    def __init__(self, status, downloaded, total, fraction, speed, eta, filename):
+        self.status = status
+        self.downloaded = downloaded
+        self.total = total
+        self.fraction = fraction
+        self.speed = speed
+        self.eta = eta
+        self.filename = filename
+
+
+class ProgressPipeline:
+    """A yt-dlp progress hook that throttles and fans out progress events"""
+
+    def __init__(self, sinks, min_interval=0.5, min_delta=0.05, smoothing=0.3):
+        self.sinks = list(sinks)
+        self.min_interval = min_interval
+        self.min_delta = min_delta
+        self.smoothing = smoothing
+        self._lock = threading.Lock()
+        self._last_emit = 0.0
+        self._last_fraction = 0.0
+        self._last_sample = None
+        self._speed = None
+
+    def __call__(self, d):
+        status = d.get('status')
+        if status == 'downloading':
+            self._downloading(d)
+        elif status in ('finished', 'error'):
+            total = d.get('total_bytes') or d.get('downloaded_bytes') or 0
+            fraction = 1.0 if status == 'finished' else None
+            self._emit(ProgressEvent(status, d.get('downloaded_bytes') or total, total, fraction, self._speed, 0, d.get('filename')))
+            with self._lock:
+                self._last_sample = None
+                self._last_fraction = 0.0
+
+    def _downloading(self, d):
+        now = time.monotonic()
+        downloaded = d.get('downloaded_bytes') or 0
+        total = d.get('total_bytes') or d.get('total_bytes_estimate')
+        if total:
+            fraction = min(downloaded / total, 1.0)
+        elif d.get('fragment_count'):
+            # Fragmented downloads without a size estimate: count fragments
+            fraction = (d.get('fragment_index') or 0) / d['fragment_count']
+        else:
+            fraction = None
+
+        with self._lock:
+            self._update_speed(now, downloaded)
+            if (
+                now - self._last_emit < self.min_interval
+                and (fraction or 0.0) - self._last_fraction < self.min_delta
+            ):
+                return
+            self._last_emit = now
+            self._last_fraction = fraction or 0.0
+            speed = self._speed
+
+        eta = None
+        if speed and total:
+            eta = max(total - downloaded, 0) / speed
+        self._emit(ProgressEvent('downloading', downloaded, total, fraction, speed, eta, d.get('filename')))
+
+    def _update_speed(self, now, downloaded):
+        if self._last_sample is not None:
+            last_time, last_bytes = self._last_sample
+            elapsed = now - last_time
+            if elapsed < 0.05:
+                return
+            sample = max(downloaded - last_bytes, 0) / elapsed
+            if self._speed is None:
+                self._speed = sample
+            else:
+                self._speed = self.smoothing * sample + (1 - self.smoothing) * self._speed
+        self._last_sample = (now, downloaded)
+
+    def _emit(self, event):
+        for sink in self.sinks:
+            try:
+                sink(event)
+            except Exception:
+                logger.exception("Progress sink %r failed", sink)
+
+
+def format_bytes(nbytes):
+    for unit in ("B", "KB", "MB", "GB"):
+        if nbytes < 1024 or unit == "GB":
+            return f"{nbytes:.1f} {unit}"
+        nbytes /= 1024
+
+
+def format_eta(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+
+def describe(event):
+    """Status line for an event, e.g. ``📥 Downloading... 42.0% at 3.1 MB/s, ETA 0:12``"""
+    if event.status == 'finished':
+        return "⚙️ Finishing..."
+    parts = ["📥 Downloading..."]
+    if event.fraction is not None:
+        parts.append(f"{event.fraction * 100:.1f}%")
+    if event.speed:
+        parts.append(f"at {format_bytes(event.speed)}/s")
+    text = " ".join(parts)
+    if event.eta is not None:
+        text += f", ETA {format_eta(event.eta)}"
+    return text
+
+
+class LogSink:
+    """Logs progress events for one download"""
+
+    def __init__(self, label, level=logging.DEBUG):
+        self.label = label
+        self.level = level
+
+    def __call__(self, event):
+        logger.log(self.level, "%s: %s", self.label, describe(event))
+
+
+class TransferStats:
+    """Process-wide totals of bytes transferred and current speed per download"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.bytes_total = 0
+        self._downloads = {}
+
+    def sink(self, key):
+        """A sink that attributes events to download ``key``"""
+        def record(event):
+            with self._lock:
+                if event.status != 'downloading' and key not in self._downloads:
+                    # Nothing was transferred (e.g. the file already existed)
+                    return
+                last = self._downloads.get(key, (0, None))[0]
+                if event.downloaded >= last:
+                    self.bytes_total += event.downloaded - last
+                else:
+                    # The next file of a multi-file download started
+                    self.bytes_total += event.downloaded
+                if event.status == 'downloading':
+                    self._downloads[key] = (event.downloaded, event.speed)
+                else:
+                    self._downloads.pop(key, None)
+        return record
+
+    def active(self):
+        with self._lock:
+            return len(self._downloads)
+
+    def speed(self):
+        """Sum of the smoothed speeds of every active download"""
+        with self._lock:
+            return sum(speed or 0 for _, speed in self._downloads.values())
+
+
+transfer_stats = TransferStats()
+
+REGISTRY.register(Counter(
+    "ytdl_transferred_bytes_total", "Bytes downloaded", func=lambda: transfer_stats.bytes_total,
+))
+REGISTRY.register(Gauge(
+    "ytdl_active_downloads", "Downloads currently transferring", func=transfer_stats.active,
+))
+REGISTRY.register(Gauge(
+    "ytdl_download_speed_bytes", "Combined speed of the active downloads in bytes per second",
+    func=transfer_stats.speed,
+))
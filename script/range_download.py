@@ -0,0 +1,222 @@
+"""Resumable downloads that fetch byte ranges of one file in parallel.
+
+The file is split into fixed-size chunks. Chunks are written into a
+preallocated ``.part`` file and every finished chunk is recorded in a
+sidecar ``.part.json`` manifest, so an interrupted download continues
+with the missing chunks only, as long as the server still reports the
+same size and ``ETag``/``Last-Modified`` validator. A chunk that fails
+for good stops the other chunks: the download is lost anyway.
+"""
+import json
+import os
+import re
+import threading
+import urllib.request
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+
+
+CHUNK_SIZE = 4 * 1024 * 1024
+READ_SIZE = 64 * 1024
+CONTENT_RANGE_RE = re.compile(r"bytes (\d+)-(\d+)/(\d+|\*)")
+
+
+class RangeNotSupported(Exception):
+    """The server ignored a Range request"""
+
+
+class Stopped(Exception):
+    """Another chunk failed; this one gave up"""
+
+
+def urllib_opener(url, headers):
+    """Open ``url`` with urllib; used when no yt-dlp opener is given"""
+    return urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=30)
+
+
+class RangeDownloader:
+    """Downloads ``url`` to ``dest`` using up to ``workers`` parallel ranges.
+
+    ``opener(url, headers)`` returns a response with ``status``,
+    ``headers`` and ``read(n)``. ``progress(downloaded, total)`` is called
+    as data arrives.
+    """
+
+    def __init__(self, url, dest, headers=None, workers=4, chunk_size=CHUNK_SIZE,
+                 retries=3, opener=urllib_opener, progress=None):
+        self.url = url
+        self.dest = dest
+        self.headers = dict(headers or {})
+        self.workers = max(1, workers)
+        self.chunk_size = chunk_size
+        self.retries = retries
+        self.opener = opener
+        self.progress = progress
+        self.part_path = dest + ".part"
+        self.manifest_path = dest + ".part.json"
+        self._lock = threading.Lock()
+        self._downloaded = 0
+        self._total = None
+        self._stop = threading.Event()
+
+    def download(self):
+        """Download the file, resuming from the manifest if there is one"""
+        response = self._open(0, 0)
+        total = self._range_total(response)
+        if total is None:
+            # No range support: stream the whole body from the probe response
+            self._stream(response)
+            return
+        validator = self._validator(response)
+        response.close()
+
+        self._total = total
+        manifest = self._load_manifest(total, validator)
+        done = set(manifest['done'])
+        chunks = [i for i in range(self._chunk_count(total)) if i not in done]
+        self._downloaded = sum(self._chunk_length(i, total) for i in done)
+        self._report()
+
+        if not os.path.exists(self.part_path) or os.path.getsize(self.part_path) != total:
+            with open(self.part_path, "ab") as f:
+                f.truncate(total)
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="range") as pool:
+            futures = [pool.submit(self._fetch_chunk, i, total, manifest) for i in chunks]
+            wait(futures, return_when=FIRST_EXCEPTION)
+            failed = [future for future in futures if future.done() and not future.cancelled() and future.exception()]
+            if failed:
+                # Drop the queued chunks and make the running ones give up
+                self._stop.set()
+                pool.shutdown(cancel_futures=True)
+                raise failed[0].exception()
+
+        os.replace(self.part_path, self.dest)
+        self._remove_manifest()
+
+    # Chunks
+
+    def _chunk_count(self, total):
+        return (total + self.chunk_size - 1) // self.chunk_size
+
+    def _chunk_length(self, index, total):
+        start = index * self.chunk_size
+        return min(self.chunk_size, total - start)
+
+    def _fetch_chunk(self, index, total, manifest):
+        start = index * self.chunk_size
+        length = self._chunk_length(index, total)
+        end = start + length - 1
+        for attempt in range(self.retries + 1):
+            written = 0
+            try:
+                if self._stop.is_set():
+                    raise Stopped()
+                response = self._open(start, end)
+                if response.status != 206:
+                    raise RangeNotSupported(f"expected 206 for bytes {start}-{end}, got {response.status}")
+                with response, open(self.part_path, "r+b") as f:
+                    f.seek(start)
+                    while written < length:
+                        if self._stop.is_set():
+                            raise Stopped()
+                        data = response.read(min(READ_SIZE, length - written))
+                        if not data:
+                            raise OSError(f"connection closed after {written} bytes of chunk {index}")
+                        f.write(data)
+                        written += len(data)
+                        self._advance(len(data))
+                    f.flush()
+                    os.fsync(f.fileno())
+                break
+            except RangeNotSupported:
+                raise
+            except Exception:
+                self._advance(-written)
+                if attempt == self.retries or self._stop.is_set():
+                    raise
+                self._stop.wait(min(2 ** attempt, 10))
+
+        with self._lock:
+            manifest['done'].append(index)
+            self._save_manifest(manifest)
+
+    def _stream(self, response):
+        """Plain sequential download for servers without range support"""
+        total = response.headers.get("Content-Length")
+        self._total = int(total) if total else None
+        with response, open(self.part_path, "wb") as f:
+            while True:
+                data = response.read(READ_SIZE)
+                if not data:
+                    break
+                f.write(data)
+                self._advance(len(data))
+        os.replace(self.part_path, self.dest)
+        self._remove_manifest()
+
+    # HTTP
+
+    def _open(self, start, end):
+        headers = dict(self.headers)
+        headers["Range"] = f"bytes={start}-{end}"
+        return self.opener(self.url, headers)
+
+    @staticmethod
+    def _range_total(response):
+        """Total size from a 206 response, or None when ranges are not supported"""
+        if response.status != 206:
+            return None
+        match = CONTENT_RANGE_RE.match(response.headers.get("Content-Range", ""))
+        if not match or match.group(3) == "*":
+            return None
+        return int(match.group(3))
+
+    @staticmethod
+    def _validator(response):
+        """``ETag`` or ``Last-Modified`` of the resource, None when the server sends neither"""
+        return response.headers.get("ETag") or response.headers.get("Last-Modified")
+
+    # Manifest
+
+    def _load_manifest(self, total, validator=None):
+        try:
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = None
+        if (
+            manifest is None
+            or manifest.get('size') != total
+            or manifest.get('chunk_size') != self.chunk_size
+            or manifest.get('validator') != validator
+            or not os.path.exists(self.part_path)
+        ):
+            # Unknown or mismatching state (e.g. the file changed on the server): start over
+            manifest = {'size': total, 'chunk_size': self.chunk_size, 'validator': validator, 'done': []}
+            if os.path.exists(self.part_path):
+                os.remove(self.part_path)
+            self._save_manifest(manifest)
+        return manifest
+
+    def _save_manifest(self, manifest):
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.manifest_path)
+
+    def _remove_manifest(self):
+        if os.path.exists(self.manifest_path):
+            os.remove(self.manifest_path)
+
+    # Progress
+
+    def _advance(self, nbytes):
+        with self._lock:
+            self._downloaded += nbytes
+        self._report()
+
+    def _report(self):
+        if self.progress is not None:
+            self.progress(self._downloaded, self._total)
@@ -0,0 +1,106 @@
+"""Retry timing and per-host circuit breaking for the download engine."""
+import random
+import threading
+import time
+
+from script.errors import CATEGORIES, classify_error
+
+
+class RetryPolicy:
+    """How often and after how long a failed item is tried again.
+
+    Only transient errors (see ``script.errors``) are retried. The delay
+    doubles with every attempt, up to ``max_delay``, and is jittered by
+    ±50% so items that failed together do not come back together.
+    """
+
+    def __init__(self, retries=3, backoff=5.0, max_delay=300.0):
+        self.retries = max(0, int(retries))
+        self.backoff = float(backoff)
+        self.max_delay = float(max_delay)
+
+    def should_retry(self, error, attempt):
+        """``attempt`` is the number of the attempt that just failed, starting at 1"""
+        return attempt <= self.retries and CATEGORIES[classify_error(error)].retryable
+
+    def delay(self, attempt):
+        delay = min(self.backoff * 2 ** (attempt - 1), self.max_delay)
+        return delay * random.uniform(0.5, 1.5)
+
+
+class CircuitBreaker:
+    """Stops sending work to a host after ``threshold`` transient failures in a row.
+
+    After ``reset_after`` seconds a single trial item is let through: if
+    the host answers (a success, or a permanent error such as a private
+    video) it is back to normal, after another transient failure it stays
+    blocked for another ``reset_after`` seconds. A trial that never ran
+    (cancelled, interrupted) is given up with ``cancel_trial``.
+    """
+
+    def __init__(self, threshold=5, reset_after=60.0):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        # Whatever ``allow`` was given for the running trial item, or None
+        self._trial = None
+
+    @property
+    def is_open(self):
+        with self._lock:
+            return self._opened_at is not None
+
+    def allow(self, item=True):
+        """True if ``item`` may start now; when the breaker is open it becomes the trial item"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial is not None or time.monotonic() - self._opened_at < self.reset_after:
+                return False
+            self._trial = item
+            return True
+
+    def reopens_in(self):
+        """Seconds until a trial item may start.
+
+        0 when not blocked, and None while a trial item runs: its outcome
+        decides, not the clock.
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return 0.0
+            if self._trial is not None:
+                return None
+            return max(0.0, self._opened_at + self.reset_after - time.monotonic())
+
+    def record_success(self):
+        with self._lock:
+            self._close()
+
+    def record_failure(self, error):
+        """Count ``error`` if it says something about the host; returns True when the breaker opened"""
+        with self._lock:
+            if not CATEGORIES[classify_error(error)].retryable:
+                # A private or removed video is not the host's fault; the host answered
+                if self._trial is not None:
+                    self._close()
+                return False
+            self._failures += 1
+            if self._trial is not None or self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+                self._trial = None
+                return True
+            return False
+
+    def cancel_trial(self, item=True):
+        """Let another item try if ``item`` was the trial and ended without an answer from the host"""
+        with self._lock:
+            if self._trial is item:
+                self._trial = None
+
+    def _close(self):
+        self._failures = 0
+        self._opened_at = None
+        self._trial = None
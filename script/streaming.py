@@ -0,0 +1,190 @@
+"""Streaming delivery: downloads piped straight to the browser.
+
+Instead of saving into ``Downloads/``, yt-dlp writes the file to its
+standard output and, when the audio needs converting, FFmpeg reads that
+pipe and writes the result to its own. The HTTP server sends the output
+on as it arrives (``/stream?url=...&format=...&quality=...``), so nothing
+is written to the server's disk and memory stays at one chunk per stream
+plus the pipe buffers. The browser's reading speed paces the download,
+and the bandwidth limits of ``script.bandwidth`` apply to what is sent.
+
+Only single-file formats can be piped: video comes as a progressive MP4
+(merging separate streams needs a seekable file), audio as one stream.
+The yt-dlp process is handed the metadata the stream was planned from
+(``--load-info-json``), so the video is not extracted a second time.
+"""
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from urllib.parse import parse_qs, quote, urlencode, urlparse
+
+from yt_dlp.utils import DownloadError
+
+from script import http_server
+from script.bandwidth import INTERACTIVE_WEIGHT, get_shaper
+from script.download_engine import extract_video_info, safe_filename
+from script.errors import classify_error
+from script.formats import AUDIO_QUALITY, AUDIO_TARGETS, FORMAT_CHOICES, VIDEO_QUALITIES, plan_formats
+from script.metrics import DOWNLOADS, ERRORS
+from script.urls import canonical_url, video_id_from_url
+
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+CONTENT_TYPES = {"mp4": "video/mp4", "m4a": "audio/mp4", "mp3": "audio/mpeg"}
+
+# FFmpeg output options per target codec; MP4 needs fragments to be written to a pipe
+TRANSCODE_ARGS = {
+    "mp3": ["-vn", "-c:a", "libmp3lame", "-b:a", "192k", "-f", "mp3"],
+    "m4a": ["-vn", "-c:a", "aac", "-b:a", "192k", "-movflags", "frag_keyframe+empty_moov", "-f", "ipod"],
+}
+
+
+def plan_stream(info, format_choice, quality_choice):
+    """The format plan for streaming ``info``, or None when no single file fits"""
+    return plan_formats(info, format_choice, quality_choice, merge=False)
+
+
+class MediaStream:
+    """One download piped through yt-dlp (and FFmpeg) in chunks of ``chunk_size``.
+
+    Opening it starts the processes and waits for the first chunk, so a
+    failing download raises here, before anything is sent. Iterate to get
+    the file; ``close`` stops the processes early.
+    """
+
+    def __init__(self, url, format_choice, quality_choice, session=None, chunk_size=CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        info = extract_video_info(url)
+        plan = plan_stream(info, format_choice, quality_choice)
+        if plan is None:
+            raise DownloadError("No single-file format to stream; save the download on the server instead")
+        ext = AUDIO_TARGETS[format_choice][0] if format_choice in AUDIO_TARGETS else "mp4"
+        self.filename = f"{safe_filename(info.get('title') or 'video')}.{ext}"
+        self.content_type = CONTENT_TYPES[ext]
+        # Transcoded sizes are not known in advance
+        self.size = plan['size'] if plan['audio'] != "transcode" else None
+        self.plan = plan
+        self._processes = []
+        self._closed = False
+        self._stderr = tempfile.TemporaryFile()
+        self._flow = get_shaper().flow(session, INTERACTIVE_WEIGHT)
+        with tempfile.NamedTemporaryFile("w", suffix=".info.json", delete=False) as f:
+            json.dump(info, f)
+        self._info_path = f.name
+
+        command = [sys.executable, "-m", "yt_dlp", "--quiet", "--no-warnings", "--no-part",
+                   "-f", plan['format'], "-o", "-", "--load-info-json", self._info_path]
+        source = self._start(command, stdin=subprocess.DEVNULL)
+        if plan['audio'] == "transcode":
+            if shutil.which("ffmpeg") is None:
+                self.close()
+                raise DownloadError("FFmpeg is needed to convert the audio while streaming")
+            command = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-i", "pipe:0", *TRANSCODE_ARGS[ext], "pipe:1"]
+            self._start(command, stdin=source.stdout)
+            # FFmpeg holds the pipe now; yt-dlp notices a closed reader
+            source.stdout.close()
+        self._output = self._processes[-1].stdout
+
+        try:
+            self._first = self._read()
+            if not self._first:
+                self._check()
+                raise DownloadError("The download produced no data")
+        except Exception as e:
+            self._record(e)
+            self.close()
+            raise
+
+    def __iter__(self):
+        try:
+            chunk = self._first
+            self._first = None
+            while chunk:
+                yield chunk
+                self._flow.consume(len(chunk))
+                chunk = self._read()
+            self._check()
+        except Exception as e:
+            self._record(e)
+            raise
+        else:
+            self._record()
+        finally:
+            self.close()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        for process in self._processes:
+            if process.poll() is None:
+                process.kill()
+            process.wait()
+            if process.stdout:
+                process.stdout.close()
+        self._stderr.close()
+        os.remove(self._info_path)
+        self._flow.close()
+
+    def _start(self, command, stdin):
+        process = subprocess.Popen(command, stdin=stdin, stdout=subprocess.PIPE, stderr=self._stderr)
+        self._processes.append(process)
+        return process
+
+    def _read(self):
+        return self._output.read(self.chunk_size)
+
+    def _check(self):
+        """Raise the first failing process's error output"""
+        for process in self._processes:
+            if process.wait() != 0:
+                self._stderr.seek(0)
+                message = self._stderr.read().decode(errors="replace").strip()
+                raise DownloadError(message or f"{process.args[0]} exited with code {process.returncode}")
+
+    def _record(self, error=None):
+        if error is None:
+            DOWNLOADS.inc(result='streamed')
+        else:
+            DOWNLOADS.inc(result='error')
+            ERRORS.inc(category=classify_error(error))
+
+
+def stream_url(url, format_choice, quality_choice, session=None):
+    """Link that streams the video to the browser, or None when the HTTP server is off"""
+    base = http_server.public_url()
+    if base is None:
+        return None
+    params = {'url': url, 'format': format_choice, 'quality': quality_choice}
+    if session:
+        params['session'] = session
+    query = urlencode(params)
+    return f"{base}/stream?{query}"
+
+
+@http_server.route("/stream")
+def stream_endpoint(request):
+    params = {key: values[0] for key, values in parse_qs(urlparse(request.path).query).items()}
+    url = params.get('url', "")
+    format_choice = params.get('format', FORMAT_CHOICES[0])
+    quality_choice = params.get('quality', AUDIO_QUALITY)
+    # Like the single video page: YouTube videos only, so the server cannot be used as an open proxy
+    if not video_id_from_url(url) or format_choice not in FORMAT_CHOICES or \
+            quality_choice not in VIDEO_QUALITIES + [AUDIO_QUALITY]:
+        return 400, "text/plain; charset=utf-8", b"Expected a YouTube video url, a format and a quality\n"
+    try:
+        stream = MediaStream(canonical_url(url), format_choice, quality_choice, session=params.get('session'))
+    except Exception as e:
+        logger.warning("Could not stream %s: %s", url, e)
+        return 502, "text/plain; charset=utf-8", f"{e}\n".encode()
+    # Headers are Latin-1: an ASCII fallback name plus the real one (RFC 6266)
+    fallback = stream.filename.encode("ascii", "ignore").decode() or "download"
+    headers = {"Content-Disposition": f'attachment; filename="{fallback}"; filename*=UTF-8\'\'{quote(stream.filename)}'}
+    return 200, stream.content_type, stream, headers
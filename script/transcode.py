@@ -0,0 +1,86 @@
+"""Audio conversion on a process pool, separate from the network downloads.
+
+A download slot is released as soon as the source audio is on disk and
+the FFmpeg conversion is queued here instead, so the next download
+overlaps with the previous conversion. The pool has one worker per CPU
+core by default since each conversion keeps one core busy.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import yt_dlp
+from yt_dlp.postprocessor import FFmpegExtractAudioPP
+
+from script.metrics import STAGE_SECONDS
+
+
+def audio_options(ydl_opts):
+    """Settings of the FFmpegExtractAudio postprocessor in ``ydl_opts``, or None"""
+    for pp in ydl_opts.get('postprocessors') or []:
+        if pp.get('key') == 'FFmpegExtractAudio':
+            return {name: value for name, value in pp.items() if name not in ('key', 'when')}
+    return None
+
+
+def extract_audio(path, options):
+    """Convert ``path`` like yt-dlp's FFmpegExtractAudio and return the new file (runs in a worker process)"""
+    info = {'filepath': path, 'ext': os.path.splitext(path)[1].lstrip('.')}
+    with yt_dlp.YoutubeDL({'quiet': True, 'no_warnings': True}) as ydl:
+        files_to_delete, info = FFmpegExtractAudioPP(ydl, **options).run(info)
+    for name in files_to_delete:
+        if name != info['filepath'] and os.path.exists(name):
+            os.remove(name)
+    return info['filepath']
+
+
+def _timed_extract_audio(path, options):
+    started = time.monotonic()
+    return extract_audio(path, options), time.monotonic() - started
+
+
+class TranscodePool:
+    """Runs audio conversions on worker processes"""
+
+    def __init__(self, workers=None):
+        self.workers = max(1, int(workers or os.cpu_count() or 1))
+        # spawn: forking a process with running download threads is not safe
+        self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def submit(self, path, options):
+        """Queue a conversion and return a Future for the converted file's path"""
+        converted = Future()
+
+        def done(future):
+            try:
+                new_path, seconds = future.result()
+            except BaseException as e:
+                converted.set_exception(e)
+                return
+            # Time spent converting, without the wait for a free worker
+            STAGE_SECONDS.observe(seconds, stage='transcode')
+            converted.set_result(new_path)
+
+        self._executor.submit(_timed_extract_audio, path, options).add_done_callback(done)
+        return converted
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_transcode_pool():
+    """The conversion pool shared by every session in this process.
+
+    ``YTDL_TRANSCODE_WORKERS`` sets its size (default: number of CPU cores).
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = TranscodePool(os.environ.get("YTDL_TRANSCODE_WORKERS"))
+        return _pool
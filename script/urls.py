@@ -0,0 +1,98 @@
+"""Canonical forms of pasted URLs.
+
+``youtu.be/X``, ``m.youtube.com/watch?v=X&t=30`` and ``/shorts/X`` are the
+same video: they all become ``https://www.youtube.com/watch?v=X``, and
+playlist links become ``https://www.youtube.com/playlist?list=Y``. Other
+sites keep their URL, minus the fragment. Lines that are not URLs at all
+(see ``is_url``) are kept as they were typed.
+"""
+import re
+from urllib.parse import parse_qs, urlencode, urlsplit, urlunsplit
+
+
+YOUTUBE_HOSTS = ("youtube.com", "youtube-nocookie.com", "youtu.be")
+
+VIDEO_ID_RE = re.compile(r"^[0-9A-Za-z_-]{11}$")
+VIDEO_PATH_RE = re.compile(r"^/(?:shorts|embed|live|v|e)/([0-9A-Za-z_-]{11})(?:/|$)")
+PLAYLIST_ID_RE = re.compile(r"^[0-9A-Za-z_-]{2,}$")
+
+# Query parameters that only track where a link was shared from
+TRACKING_PARAMS = {"si", "feature", "pp", "app", "utm_source", "utm_medium", "utm_campaign"}
+
+
+def _split(url):
+    """Parts of ``url`` (``https://`` when no scheme is given), or None when it is not a URL"""
+    url = url.strip()
+    if "://" not in url:
+        url = "https://" + url
+    try:
+        parts = urlsplit(url)
+        # Checked when read: "[bad" hosts and ports that are not numbers
+        parts.port
+    except ValueError:
+        return None
+    if not parts.hostname or any(char.isspace() for char in parts.netloc):
+        return None
+    return parts
+
+
+def is_url(url):
+    """True when ``url`` has a host name without spaces, e.g. not a typo'd ``https://[bad``"""
+    return _split(url) is not None
+
+
+def is_youtube_url(url):
+    parts = _split(url)
+    host = (parts.hostname if parts else "").lower()
+    return any(host == site or host.endswith("." + site) for site in YOUTUBE_HOSTS)
+
+
+def video_id_from_url(url):
+    """YouTube video ID of a URL, or None if it does not contain one"""
+    if not is_youtube_url(url):
+        return None
+    parts = _split(url)
+    if parts.hostname.lower().endswith("youtu.be"):
+        candidate = parts.path.strip("/").split("/")[0]
+    else:
+        match = VIDEO_PATH_RE.match(parts.path)
+        candidate = match.group(1) if match else parse_qs(parts.query).get('v', [None])[0]
+    return candidate if candidate and VIDEO_ID_RE.match(candidate) else None
+
+
+def playlist_id_from_url(url):
+    """YouTube playlist ID of a URL, or None if it does not contain one"""
+    if not is_youtube_url(url):
+        return None
+    candidate = parse_qs(_split(url).query).get('list', [None])[0]
+    return candidate if candidate and PLAYLIST_ID_RE.match(candidate) else None
+
+
+def canonical_url(url):
+    """One spelling per video, playlist or channel.
+
+    A video opened from a playlist stays a single video, like
+    ``is_playlist_url`` treats it.
+    """
+    video_id = video_id_from_url(url)
+    if video_id:
+        return f"https://www.youtube.com/watch?v={video_id}"
+    parts = _split(url)
+    if parts is None:
+        return url.strip()
+    if is_youtube_url(url):
+        playlist_id = playlist_id_from_url(url)
+        if playlist_id:
+            return f"https://www.youtube.com/playlist?list={playlist_id}"
+        # Channels, their tabs and everything else on the site
+        query = [(key, value) for key, value in sorted(parse_qs(parts.query).items()) if key not in TRACKING_PARAMS]
+        path = parts.path.rstrip("/") or "/"
+        return urlunsplit(("https", "www.youtube.com", path, urlencode(query, doseq=True), ""))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or "/", parts.query, ""))
+
+
+def dedupe_urls(urls):
+    """Canonical URLs in input order without repeats, and the number of repeats merged"""
+    urls = [url for url in urls if url.strip()]
+    unique = list(dict.fromkeys(canonical_url(url) for url in urls))
+    return unique, len(urls) - len(unique)
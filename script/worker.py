@@ -0,0 +1,289 @@
+"""Download workers: lease jobs from the shared job store and run them.
+
+The Streamlit app runs one worker in its own process by default. More
+can be started next to it, or on other hosts sharing the job store, to
+spread downloads over more CPUs and network cards:
+
+    python -m script.worker --workers 8
+
+Each worker holds its jobs under a lease that a heartbeat renews every
+second, together with their progress. When a worker dies its leases run
+out (``YTDL_LEASE_SECONDS``, 60 by default) and any other worker picks
+the jobs up again. Workers on several hosts need a shared job store and
+a shared Downloads folder.
+"""
+import argparse
+import logging
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import CancelledError, Future
+
+from script import http_server
+from script.bandwidth import BATCH_WEIGHT, INTERACTIVE_WEIGHT, get_shaper
+from script.content_store import open_store
+from script.download_engine import DOWNLOAD_PATH, DownloadEngine, fetch_video
+from script.errors import classify_error
+from script.job_store import ERROR, FINISHED, default_store_url, open_job_store
+from script.metrics import REGISTRY, Gauge
+from script.progress import LogSink, describe, transfer_stats
+from script.retry import RetryPolicy
+from script.transcode import get_transcode_pool
+
+
+logger = logging.getLogger(__name__)
+
+LEASE_SECONDS = float(os.environ.get("YTDL_LEASE_SECONDS", 60))
+# Also how often progress reaches the pages
+HEARTBEAT_INTERVAL = 1.0
+POLL_INTERVAL = float(os.environ.get("YTDL_POLL_INTERVAL", 1.0))
+
+
+class Worker:
+    """Leases queued jobs from ``store`` and runs them on a DownloadEngine"""
+
+    def __init__(self, store, max_workers=4, per_host_limit=4, download_path=DOWNLOAD_PATH, retry=None,
+                 lease_seconds=LEASE_SECONDS, worker_id=None):
+        self.store = store
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.lease_seconds = lease_seconds
+        # Another folder gets its own store, with its own index (see open_store)
+        self.content_store = open_store(download_path, DOWNLOAD_PATH)
+        self.transcoder = get_transcode_pool()
+        self.shaper = get_shaper()
+        self.engine = DownloadEngine(max_workers=max_workers, per_host_limit=per_host_limit, retry=retry)
+        self._lock = threading.Lock()
+        self._fill_lock = threading.Lock()
+        self._running = set()
+        # Progress not yet sent with a heartbeat, by job id
+        self._live = {}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for target, name in ((self._poll, "poll"), (self._heartbeat, "heartbeat")):
+            thread = threading.Thread(target=target, name=f"worker-{name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info("Worker %s started", self.worker_id)
+        return self
+
+    def wake(self):
+        """Look for queued jobs now instead of at the next poll"""
+        self._wake.set()
+
+    def stop(self, release=True):
+        """Stop taking jobs; with ``release`` the unfinished ones go back to the queue at once"""
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join()
+        self.engine.shutdown(wait=False)
+        if release:
+            self.store.release(self.worker_id)
+
+    def inflight(self):
+        """Jobs leased by this worker that have not finished yet"""
+        with self._lock:
+            return len(self._running)
+
+    # Loops
+
+    def _poll(self):
+        while not self._stop.is_set():
+            try:
+                requeued = self.store.requeue_expired()
+                if requeued:
+                    logger.warning("Queued %d jobs again after their worker stopped responding", requeued)
+                self._fill()
+            except Exception:
+                logger.exception("Polling the job store failed")
+            self._wake.wait(POLL_INTERVAL)
+            self._wake.clear()
+
+    def _heartbeat(self):
+        while not self._stop.wait(HEARTBEAT_INTERVAL):
+            with self._lock:
+                live, self._live = self._live, {}
+            try:
+                lost = self.store.heartbeat(self.worker_id, live, self.lease_seconds)
+            except Exception:
+                logger.exception("Heartbeat failed")
+                with self._lock:
+                    # Send them with the next heartbeat unless newer ones arrived
+                    for job_id, fields in live.items():
+                        self._live[job_id] = {**fields, **self._live.get(job_id, {})}
+                continue
+            for job_id in lost:
+                logger.warning("Lost the lease of job %s; another worker may run it", job_id)
+
+    def _fill(self):
+        """Lease queued jobs while the engine has room"""
+        with self._fill_lock:
+            if self._stop.is_set():
+                return
+            room = self.engine.max_workers * 2 - self.inflight()
+            if room <= 0:
+                return
+            for job in self.store.lease(self.worker_id, room, self.lease_seconds):
+                job_id = job['id']
+                with self._lock:
+                    self._running.add(job_id)
+                self._report(job_id, 0.0, "⏳ Waiting for a free download slot...")
+                future = self.engine.submit(
+                    job['url'], job, func=self._download,
+                    on_retry=lambda attempt, delay, error, job_id=job_id: self._retrying(job_id, attempt, delay, error),
+                )
+                future.add_done_callback(lambda future, job_id=job_id: self._done(job_id, future))
+
+    # Jobs
+
+    def _report(self, job_id, progress=None, message=None, speed=None):
+        with self._lock:
+            live = self._live.setdefault(job_id, {})
+            if progress is not None:
+                live['progress'] = progress
+            if message is not None:
+                live['message'] = message
+            live['speed'] = speed
+
+    def _retrying(self, job_id, attempt, delay, error):
+        self._report(
+            job_id, 0.0,
+            f"🔁 {classify_error(error).replace('_', ' ').capitalize()} error, "
+            f"retrying in {delay:.0f}s (attempt {attempt} of {self.engine.retry.retries + 1})...",
+        )
+
+    def _done(self, job_id, future):
+        if future.cancelled() or isinstance(future.exception(), CancelledError):
+            # Shutting down: the job was released or its lease runs out
+            return
+        with self._lock:
+            self._running.discard(job_id)
+            self._live.pop(job_id, None)
+        error = future.exception()
+        if error is None:
+            kept = self.store.finish(job_id, self.worker_id, FINISHED, result=future.result())
+        else:
+            kept = self.store.finish(job_id, self.worker_id, ERROR, error=str(error))
+        if not kept:
+            logger.warning("Job %s finished after its lease ran out; the result is dropped", job_id)
+        self.wake()
+
+    def _download(self, url, job):
+        job_id = job['id']
+        format_choice = job['options']['format_choice']
+        quality_choice = job['options']['quality_choice']
+        interactive = job['kind'] == "video"
+
+        def show_preview(video_info, quality_info):
+            self.store.update(job_id, info={
+                'title': video_info.get('title', 'Unknown'),
+                'uploader': video_info.get('uploader', 'Unknown'),
+                'duration': video_info.get('duration') or 0,
+                'view_count': video_info.get('view_count') or 0,
+                'thumbnail': video_info.get('thumbnail'),
+                'quality_info': quality_info,
+            })
+
+        if interactive:
+            self._report(job_id, message="🔍 Analyzing video...")
+
+        # The flow ends with the transfer; a queued MP3 conversion needs no bandwidth
+        with self.shaper.flow(job['options'].get('session'), INTERACTIVE_WEIGHT if interactive else BATCH_WEIGHT) as flow:
+            result = fetch_video(
+                url, format_choice, quality_choice, self.content_store,
+                progress_sinks=[JobStateSink(self, job_id), LogSink(url), transfer_stats.sink(job_id)],
+                on_info=show_preview if interactive else None,
+                on_download=lambda: self._report(job_id, 0.0, "📥 Downloading..."),
+                on_hold=lambda: self._report(job_id, 0.0, "💾 Waiting for disk space..."),
+                transcoder=self.transcoder,
+                throttle=flow,
+            )
+        if isinstance(result, Future):
+            # Downloaded; the conversion runs on the transcode pool
+            self._report(job_id, 1.0, "🎵 Converting audio...")
+        return result
+
+
+class JobStateSink:
+    """Progress sink that updates the job's live state polled by the pages"""
+
+    def __init__(self, worker, job_id):
+        self.worker = worker
+        self.job_id = job_id
+
+    def __call__(self, event):
+        self.worker._report(self.job_id, event.fraction, describe(event), speed=event.speed)
+
+
+def retry_policy():
+    """Retry settings from ``YTDL_RETRIES`` and ``YTDL_RETRY_BACKOFF``"""
+    return RetryPolicy(
+        retries=int(os.environ.get("YTDL_RETRIES", 3)),
+        backoff=float(os.environ.get("YTDL_RETRY_BACKOFF", 5)),
+    )
+
+
+def register_metrics(worker):
+    REGISTRY.register(Gauge("ytdl_queue_depth", "Jobs waiting to start", func=worker.store.queue_depth))
+    REGISTRY.register(Gauge("ytdl_inflight_jobs", "Jobs leased by this worker", func=worker.inflight))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m script.worker",
+        description="Run downloads from the shared job queue of the web app.",
+    )
+    parser.add_argument("--store", default=default_store_url(),
+                        help="job store URL (default: YTDL_JOB_STORE or the app's SQLite queue)")
+    parser.add_argument("-j", "--workers", type=int, default=int(os.environ.get("YTDL_MAX_WORKERS", 4)),
+                        help="parallel downloads (default: 4)")
+    parser.add_argument("--per-host", type=int, default=int(os.environ.get("YTDL_PER_HOST_LIMIT", 4)),
+                        help="parallel downloads per host (default: 4)")
+    parser.add_argument("-o", "--output-dir", default=DOWNLOAD_PATH, help=f"download folder (default: {DOWNLOAD_PATH})")
+    parser.add_argument("--http-port", type=int, default=int(os.environ.get("YTDL_WORKER_HTTP_PORT", 0)),
+                        help="serve this worker's /metrics on this port (default: YTDL_WORKER_HTTP_PORT, 0 = off)")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format="%(asctime)s %(levelname)s %(message)s",
+        stream=sys.stderr,
+    )
+    # SIGTERM (e.g. from systemd) stops the worker like Ctrl+C
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    # Reuse what the app looked up (see get_metadata_cache)
+    os.environ.setdefault("YTDL_METADATA_CACHE", "sqlite")
+
+    worker = Worker(
+        open_job_store(args.store), max_workers=args.workers, per_host_limit=args.per_host,
+        download_path=args.output_dir, retry=retry_policy(),
+    )
+    register_metrics(worker)
+    # Not the app's port: the app and every worker on a host need one each
+    if args.http_port:
+        http_server.start(args.http_port)
+    worker.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        logger.info("Stopping; unfinished jobs go back to the queue")
+        worker.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
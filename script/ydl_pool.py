@@ -0,0 +1,162 @@
+"""Reusable YoutubeDL instances and the download session they share.
+
+Creating a ``YoutubeDL`` loads the extractor registry and probes the
+environment, which costs more than a cached lookup itself. Lookups
+borrow an idle instance with the same options instead, so each process
+builds only as many as run at the same time. An instance is used by one
+thread at a time, so sessions share them safely.
+
+Downloads get a new instance each (their progress hooks and
+postprocessors differ), but every instance, borrowed or new, runs on the
+``DownloadSession`` of its network options: one pool of keep-alive
+connections, one cookie jar, one extractor registry and one set of
+extractor caches (YouTube's player code and the signature functions
+deciphered from it, keyed by player version). A batch of short clips
+pays for the TLS handshakes, the registry and the player download once
+instead of once per video.
+
+yt-dlp itself is imported on the first borrow, not when a page loads.
+"""
+import json
+import threading
+from contextlib import contextmanager
+
+
+# Options that change how requests are made or which extractors exist;
+# instances that agree on them share a session
+SESSION_PARAMS = (
+    'allowed_extractors', 'proxy', 'source_address', 'socket_timeout', 'http_headers', 'cookiefile', 'cookiesfrombrowser',
+    'nocheckcertificate', 'legacyserverconnect', 'impersonate', 'enable_file_urls', 'compat_opts',
+    'client_certificate', 'client_certificate_key', 'client_certificate_password', 'debug_printtraffic',
+)
+
+# Extractor attributes that cache downloaded player code and what is
+# derived from it; their keys include the player version
+EXTRACTOR_CACHES = ('_code_cache', '_player_cache')
+
+_idle = {}
+_sessions = {}
+_lock = threading.Lock()
+
+
+class DownloadSession:
+    """Connections, cookies and extractor caches shared by YoutubeDL instances.
+
+    The connection pool is thread-safe; yt-dlp's own fragment downloads
+    use it from several threads too.
+    """
+
+    def __init__(self, params):
+        import yt_dlp
+
+        # Only builds the connection pool, the cookie jar and the extractor registry
+        base = yt_dlp.YoutubeDL({**params, 'quiet': True, 'no_warnings': True})
+        self.cookiejar = base.cookiejar
+        self.director = base._request_director
+        self._extractors = dict(base._ies)
+        self._caches = {}
+
+    def attach(self, ydl):
+        """Make ``ydl`` use the session; ``detach`` it before closing it.
+
+        ``ydl`` should be built with ``auto_init=False``: sorting the
+        registry of some 1700 extractors takes longer than a short download.
+        """
+        own = ydl.__dict__.get('_request_director')
+        if own is not None and own is not self.director:
+            own.close()
+        # Both are cached properties of YoutubeDL
+        ydl.__dict__['cookiejar'] = self.cookiejar
+        ydl.__dict__['_request_director'] = self.director
+
+        # Extractors are created on first use
+        add_info_extractor = ydl.add_info_extractor
+
+        def add_shared(ie):
+            self._share_caches(ie)
+            add_info_extractor(ie)
+        ydl.add_info_extractor = add_shared
+
+        if not ydl._ies:
+            ydl._ies = dict(self._extractors)
+            for ie in self._extractors.values():
+                if not isinstance(ie, type):
+                    # The few registered as instances are bound to their YoutubeDL
+                    ydl.add_info_extractor(type(ie)())
+        return ydl
+
+    def detach(self, ydl):
+        """Keep ``ydl.close()`` from closing the shared connections"""
+        if ydl.__dict__.get('_request_director') is self.director:
+            del ydl.__dict__['_request_director']
+
+    def _share_caches(self, ie):
+        for name in EXTRACTOR_CACHES:
+            if isinstance(getattr(ie, name, None), dict):
+                setattr(ie, name, self._caches.setdefault((ie.ie_key(), name), {}))
+
+
+def _key(params):
+    try:
+        return json.dumps(params, sort_keys=True)
+    except TypeError:
+        # Loggers, hooks...: not worth sharing
+        return None
+
+
+def get_session(params):
+    """The session for the network options in ``params``, or None if they cannot be compared"""
+    network = {name: params[name] for name in SESSION_PARAMS if name in params}
+    key = _key(network)
+    if key is None:
+        return None
+    with _lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = _sessions[key] = DownloadSession(network)
+    return session
+
+
+def _new_ydl(params, cls):
+    if cls is None:
+        import yt_dlp
+        cls = yt_dlp.YoutubeDL
+    session = get_session(params)
+    # A copy: the constructor adds its defaults to the dict it is given
+    params = dict(params)
+    if session is None:
+        return cls(params), None
+    return session.attach(cls(params, auto_init=False)), session
+
+
+@contextmanager
+def session_ydl(params, cls=None):
+    """A new ``cls`` (default ``YoutubeDL``) on the shared session, closed afterwards"""
+    ydl, session = _new_ydl(params, cls)
+    try:
+        yield ydl
+    finally:
+        if session is not None:
+            session.detach(ydl)
+        ydl.close()
+
+
+@contextmanager
+def borrow_ydl(params):
+    """A ``YoutubeDL`` configured with ``params``, returned to the pool afterwards"""
+    key = _key(params)
+    if key is None:
+        with session_ydl(params) as ydl:
+            yield ydl
+        return
+
+    with _lock:
+        idle = _idle.get(key)
+        ydl = idle.pop() if idle else None
+    if ydl is None:
+        ydl, _ = _new_ydl(params, None)
+    try:
+        yield ydl
+    finally:
+        with _lock:
+            _idle.setdefault(key, []).append(ydl)
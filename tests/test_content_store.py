@@ -0,0 +1,108 @@
+"""Content store: failed downloads keep what the retry resumes from; keys are downloaded once."""
+import os
+import threading
+import time
+
+import pytest
+
+from script.content_store import ContentStore, open_store
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ContentStore(str(tmp_path / "store"), str(tmp_path / "store.sqlite"))
+
+
+def write(path, data=b"x"):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def test_failed_download_keeps_resumable_files(store):
+    def fail(entry_dir):
+        write(os.path.join(entry_dir, "video.mp4.part"), b"half")
+        write(os.path.join(entry_dir, "video.mp4.part.json"), b"{}")
+        write(os.path.join(entry_dir, "video.f137.mp4"))
+        write(os.path.join(entry_dir, "video.mp4.part.json.tmp"))
+        raise ConnectionError("connection reset")
+
+    with pytest.raises(ConnectionError):
+        store.fetch("ab" * 32, "vid", "Video", fail)
+    entry_dir = store.entry_dir("ab" * 32)
+    assert sorted(os.listdir(entry_dir)) == ["video.mp4.part", "video.mp4.part.json"]
+
+    seen = []
+
+    def resume(entry_dir):
+        seen.extend(sorted(os.listdir(entry_dir)))
+        os.replace(os.path.join(entry_dir, "video.mp4.part"), os.path.join(entry_dir, "video.mp4"))
+        os.remove(os.path.join(entry_dir, "video.mp4.part.json"))
+
+    entry, cached = store.fetch("ab" * 32, "vid", "Video", resume)
+    assert seen == ["video.mp4.part", "video.mp4.part.json"]
+    assert not cached and entry['path'].endswith("video.mp4")
+
+
+def test_failed_download_without_partials_leaves_nothing(store):
+    def fail(entry_dir):
+        write(os.path.join(entry_dir, "video.mp4"))
+        raise RuntimeError("broken")
+
+    with pytest.raises(RuntimeError):
+        store.fetch("cd" * 32, "vid", "Video", fail)
+    assert not os.path.exists(store.entry_dir("cd" * 32))
+
+
+def test_orphan_cleanup_keeps_resumable_downloads_longer(store):
+    old = time.time() - 2 * 3600
+    for key, name in (("aa" * 32, "video.mp4.part"), ("bb" * 32, "video.mp4")):
+        entry_dir = store.entry_dir(key)
+        os.makedirs(entry_dir)
+        write(os.path.join(entry_dir, name))
+        os.utime(os.path.join(entry_dir, name), (old, old))
+        os.utime(entry_dir, (old, old))
+
+    assert store.remove_orphans(max_age=3600) == 1
+    assert os.path.exists(store.entry_dir("aa" * 32))
+    assert not os.path.exists(store.entry_dir("bb" * 32))
+
+
+def test_two_processes_download_a_key_once(tmp_path):
+    # Two stores on the same files stand for two worker processes
+    stores = [ContentStore(str(tmp_path / "store"), str(tmp_path / "store.sqlite")) for _ in range(2)]
+    started = threading.Event()
+    release = threading.Event()
+    downloads = []
+
+    def download(entry_dir):
+        downloads.append(entry_dir)
+        started.set()
+        release.wait(5)
+        write(os.path.join(entry_dir, "video.mp4"))
+
+    first = threading.Thread(target=stores[0].fetch, args=("cd" * 32, "vid", "Video", download))
+    first.start()
+    assert started.wait(5)
+    results = []
+    second = threading.Thread(target=lambda: results.append(stores[1].fetch("cd" * 32, "vid", "Video", download)))
+    second.start()
+    time.sleep(0.2)
+    assert not results
+    release.set()
+    first.join(5)
+    second.join(5)
+
+    assert len(downloads) == 1
+    assert results[0][1] is True
+
+
+def test_other_folder_keeps_its_own_index(tmp_path, monkeypatch):
+    monkeypatch.setattr("script.db.STATE_PATH", str(tmp_path / ".ytdl"))
+    monkeypatch.setattr("script.catalogue._catalogue", None)
+    other = open_store(str(tmp_path / "other"), default_path=str(tmp_path / "Downloads"))
+
+    other.fetch("ef" * 32, "vid", "Video", lambda entry_dir: write(os.path.join(entry_dir, "video.mp4")))
+
+    assert other.entry_dir("ef" * 32).startswith(str(tmp_path / "other" / "store"))
+    assert os.path.exists(tmp_path / "other" / "store.sqlite")
+    assert not os.path.exists(tmp_path / "Downloads")
@@ -0,0 +1,105 @@
+"""Disk space reservations of the download guard."""
+import threading
+
+import pytest
+
+from script.disk_space import CHECK_BYTES, DiskGuard, InsufficientSpaceError
+from script.errors import classify_error
+
+
+MB = 1024 * 1024
+
+
+def make_guard(tmp_path, free, headroom=0):
+    """A guard whose volume has ``free['bytes']`` free"""
+    guard = DiskGuard(str(tmp_path), headroom=headroom)
+    guard.free = lambda: free['bytes']
+    return guard
+
+
+def test_reservation_is_released_after_the_download(tmp_path):
+    guard = make_guard(tmp_path, {'bytes': 100 * MB})
+
+    with guard.reserve(60 * MB) as reservation:
+        assert guard.reserved() == 60 * MB
+        assert guard.available() == 40 * MB
+        reservation({'status': 'downloading', 'filename': "video.mp4", 'downloaded_bytes': 10 * MB})
+        # Written bytes count as used by the volume, not as promised
+        assert guard.reserved() == 50 * MB
+
+    assert guard.reserved() == 0
+
+
+def test_reservation_is_released_when_the_download_fails(tmp_path):
+    guard = make_guard(tmp_path, {'bytes': 100 * MB})
+
+    with pytest.raises(RuntimeError):
+        with guard.reserve(60 * MB):
+            raise RuntimeError("download failed")
+
+    assert guard.reserved() == 0
+    with guard.reserve(100 * MB):
+        pass
+
+
+def test_eviction_makes_room(tmp_path):
+    free = {'bytes': 10 * MB}
+    guard = make_guard(tmp_path, free)
+    asked = []
+
+    def reclaim(nbytes):
+        asked.append(nbytes)
+        free['bytes'] += nbytes
+        return True
+
+    with guard.reserve(30 * MB, reclaim=reclaim):
+        pass
+
+    assert asked == [20 * MB]
+
+
+def test_disk_full_when_eviction_cannot_make_room(tmp_path):
+    guard = make_guard(tmp_path, {'bytes': 10 * MB}, headroom=2 * MB)
+    asked = []
+
+    with pytest.raises(InsufficientSpaceError) as raised:
+        guard.reserve(30 * MB, reclaim=lambda nbytes: asked.append(nbytes) or False)
+
+    assert asked == [22 * MB]
+    assert classify_error(raised.value) == 'disk_full'
+    assert guard.reserved() == 0
+
+
+def test_download_waits_for_a_running_one(tmp_path):
+    guard = make_guard(tmp_path, {'bytes': 100 * MB})
+    held = threading.Event()
+    started = []
+    first = guard.reserve(60 * MB)
+
+    def second():
+        with guard.reserve(60 * MB, on_hold=held.set):
+            started.append(True)
+
+    thread = threading.Thread(target=second)
+    thread.start()
+    assert held.wait(5)
+    assert not started
+
+    first.release()
+    thread.join(5)
+    assert started and guard.reserved() == 0
+
+
+def test_running_download_stops_when_the_volume_fills_up(tmp_path):
+    free = {'bytes': 100 * MB}
+    guard = make_guard(tmp_path, free, headroom=10 * MB)
+
+    with guard.reserve(50 * MB) as reservation:
+        free['bytes'] = 4 * MB
+        with pytest.raises(InsufficientSpaceError):
+            reservation({'status': 'downloading', 'filename': "video.mp4", 'downloaded_bytes': CHECK_BYTES})
+        # Later progress of the same download keeps failing
+        with pytest.raises(InsufficientSpaceError):
+            reservation({'status': 'finished'})
+
+    assert guard.reserved() == 0
@@ -0,0 +1,176 @@
+"""Retries and per-host circuit breaking of the download engine."""
+import pytest
+
+from script.download_engine import DownloadEngine
+from script.retry import CircuitBreaker
+
+
+class Interrupted(BaseException):
+    pass
+
+
+def test_trial_with_permanent_error_closes_breaker():
+    breaker = CircuitBreaker(threshold=1, reset_after=0.0)
+    assert breaker.record_failure(ConnectionError("connection reset"))
+    assert breaker.allow("trial")
+    assert breaker.reopens_in() is None
+    assert not breaker.allow("other")
+
+    breaker.record_failure(Exception("ERROR: Private video"))
+
+    assert not breaker.is_open
+    assert breaker.allow("other")
+
+
+def test_interrupted_trial_lets_another_item_try():
+    breaker = CircuitBreaker(threshold=1, reset_after=0.0)
+    breaker.record_failure(ConnectionError("connection reset"))
+    assert breaker.allow("trial")
+
+    breaker.cancel_trial("someone else")
+    assert not breaker.allow("other")
+    breaker.cancel_trial("trial")
+    assert breaker.allow("other")
+
+
+def test_host_recovers_after_permanent_trial_failure():
+    outcomes = {
+        "http://host/1": ConnectionError("connection reset"),
+        "http://host/2": Exception("ERROR: Private video"),
+    }
+
+    def download(url, ydl_opts):
+        if url in outcomes:
+            raise outcomes[url]
+        return url
+
+    with DownloadEngine(max_workers=2, per_host_limit=2, breaker_threshold=1, breaker_reset=0.3) as engine:
+        wakes = []
+        wake = engine._wake
+        engine._wake = lambda: (wakes.append(1), wake())
+
+        assert isinstance(engine.submit("http://host/1", {}, func=download).exception(timeout=5), ConnectionError)
+        assert engine.breaker("host").is_open
+
+        trial = engine.submit("http://host/2", {}, func=download)
+        after = engine.submit("http://host/3", {}, func=download)
+        assert "Private video" in str(trial.exception(timeout=5))
+        assert after.result(timeout=5) == "http://host/3"
+        assert not engine.breaker("host").is_open
+        # One wake-up for the trial, no polling while it ran
+        assert len(wakes) <= 2
+
+
+def test_interrupted_trial_does_not_block_host():
+    calls = []
+
+    def download(url, ydl_opts):
+        calls.append(url)
+        if len(calls) == 1:
+            raise ConnectionError("connection reset")
+        if len(calls) == 2:
+            raise Interrupted()
+        return url
+
+    with DownloadEngine(max_workers=1, breaker_threshold=1, breaker_reset=0.1) as engine:
+        engine.submit("http://host/1", {}, func=download).exception(timeout=5)
+        interrupted = engine.submit("http://host/2", {}, func=download)
+        after = engine.submit("http://host/3", {}, func=download)
+        assert isinstance(interrupted.exception(timeout=5), Interrupted)
+        assert after.result(timeout=5) == "http://host/3"
+
+
+def test_failed_lookups_are_remembered_briefly(monkeypatch):
+    import script.download_engine as engine
+
+    calls = []
+
+    def extract(url):
+        calls.append(url)
+        raise Exception("ERROR: Video unavailable")
+
+    monkeypatch.setattr(engine, "extract_video_info", extract)
+    monkeypatch.setattr(engine, "_failed_lookups", {})
+    url = "https://www.youtube.com/watch?v=aaaaaaaaaaa"
+
+    assert engine.get_video_info(url) is None
+    assert engine.get_video_info(url) is None
+    assert len(calls) == 1
+
+    monkeypatch.setattr(engine, "FAILED_LOOKUP_TTL", 0)
+    monkeypatch.setattr(engine, "_failed_lookups", {})
+    engine.get_video_info(url)
+    engine.get_video_info(url)
+    assert len(calls) == 3
+
+
+def test_stored_copy_is_found_without_a_lookup(monkeypatch, tmp_path):
+    import script.download_engine as engine
+    from script.content_store import ContentStore, store_key
+
+    store = ContentStore(str(tmp_path / "store"), str(tmp_path / "store.sqlite"))
+    selector, _ = engine.get_format_selector("MP4 (Video)", "720p")
+    key = store_key("Youtube:dQw4w9WgXcQ", engine.build_ydl_opts("MP4 (Video)", selector, None))
+
+    def download(entry_dir):
+        with open(f"{entry_dir}/video.mp4", "wb") as f:
+            f.write(b"x")
+
+    store.fetch(key, "Youtube:dQw4w9WgXcQ", "Video", download)
+    monkeypatch.setattr(engine, "extract_video_info", lambda url: pytest.fail("looked up"))
+
+    result = engine.fetch_video("https://youtu.be/dQw4w9WgXcQ", "MP4 (Video)", "720p", store)
+
+    assert result['cached'] and result['key'] == key
+
+
+class FakeYDL:
+    """Stands in for the download YoutubeDL: fails ``process_ie_result`` with ``error``"""
+
+    def __init__(self, error):
+        self.error = error
+        self.downloads = []
+
+    def process_ie_result(self, info, download):
+        raise self.error
+
+    def download(self, urls):
+        self.downloads.extend(urls)
+
+
+def fake_download(monkeypatch, error, lookups):
+    import contextlib
+
+    import script.download_engine as engine
+
+    ydl = FakeYDL(error)
+    invalidated = []
+    monkeypatch.setattr(engine, "session_ydl", lambda params, cls=None: contextlib.nullcontext(ydl))
+    monkeypatch.setattr(engine, "lookup_video_info", lambda url: (lookups.append(url), ({'id': "abc"}, True))[1])
+    monkeypatch.setattr(engine.get_metadata_cache(), "invalidate", invalidated.append)
+    return ydl, invalidated
+
+
+def test_expired_cached_info_is_extracted_again(monkeypatch):
+    import script.download_engine as engine
+
+    lookups = []
+    ydl, invalidated = fake_download(monkeypatch, engine.DownloadError("HTTP Error 403: Forbidden"), lookups)
+
+    engine.download_url("https://youtu.be/abc", {})
+
+    assert ydl.downloads == ["https://youtu.be/abc"]
+    assert len(invalidated) == 1
+    # One lookup, counted once
+    assert lookups == ["https://youtu.be/abc"]
+
+
+def test_permanent_error_with_cached_info_is_raised(monkeypatch):
+    import script.download_engine as engine
+
+    ydl, invalidated = fake_download(monkeypatch, engine.DownloadError("ERROR: Private video"), [])
+
+    with pytest.raises(engine.DownloadError):
+        engine.download_url("https://youtu.be/abc", {})
+
+    assert ydl.downloads == [] and invalidated == []
@@ -0,0 +1,38 @@
+"""Error categories decide what is retried."""
+import errno
+import socket
+
+from script.disk_space import InsufficientSpaceError
+from script.errors import CATEGORIES, classify_error, is_expired_url, is_retryable
+from script.retry import CircuitBreaker, RetryPolicy
+
+
+def test_categories():
+    assert classify_error(Exception("ERROR: [youtube] abc: Private video")) == 'private'
+    assert classify_error(Exception("HTTP Error 429: Too Many Requests")) == 'rate_limited'
+    assert classify_error(ConnectionError("reset by peer")) == 'network'
+    assert classify_error(socket.gaierror(-3, "Temporary failure in name resolution")) == 'network'
+    assert classify_error(InsufficientSpaceError("1 MB left")) == 'disk_full'
+    assert classify_error(OSError(errno.ENOSPC, "No space left on device")) == 'disk_full'
+
+
+def test_unknown_errors_fail_fast():
+    error = RuntimeError("Download finished without producing a file")
+    assert classify_error(error) == 'unknown'
+    assert not is_retryable(error)
+    assert not RetryPolicy(retries=3).should_retry(error, 1)
+    assert CATEGORIES['unknown'].hint
+
+
+def test_expired_urls():
+    assert is_expired_url(Exception("ERROR: unable to download video data: HTTP Error 403: Forbidden"))
+    assert is_expired_url(Exception("HTTP Error 410: Gone"))
+    assert is_expired_url(ConnectionError("reset by peer"))
+    assert not is_expired_url(Exception("ERROR: [youtube] abc: Private video"))
+    assert not is_expired_url(OSError(errno.ENOSPC, "No space left on device"))
+
+
+def test_unknown_errors_do_not_open_the_breaker():
+    breaker = CircuitBreaker(threshold=1)
+    assert not breaker.record_failure(KeyError("format"))
+    assert not breaker.is_open
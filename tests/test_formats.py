@@ -0,0 +1,93 @@
+"""Format planning picks the fewest bytes for the requested quality."""
+import pytest
+
+import script.formats
+from script.formats import plan_formats
+
+
+MB = 1024 * 1024
+
+
+def video(format_id, height, size, audio=True):
+    return {
+        'format_id': format_id, 'url': f"https://media/{format_id}", 'ext': "mp4", 'height': height,
+        'vcodec': "avc1", 'acodec': "mp4a.40.2" if audio else "none", 'filesize': size,
+    }
+
+
+def audio(format_id, ext, acodec, abr, size):
+    return {
+        'format_id': format_id, 'url': f"https://media/{format_id}", 'ext': ext,
+        'vcodec': "none", 'acodec': acodec, 'abr': abr, 'filesize': size,
+    }
+
+
+FORMATS = [
+    video("18", 360, 10 * MB),
+    video("22", 720, 40 * MB),
+    video("136", 720, 20 * MB, audio=False),
+    video("137", 1080, 60 * MB, audio=False),
+    audio("140", "m4a", "mp4a.40.2", 128, 3 * MB),
+    audio("139", "m4a", "mp4a.40.5", 48, 1 * MB),
+    audio("251", "webm", "opus", 160, 2 * MB),
+]
+
+
+def plan(formats, format_choice="MP4 (Video)", quality_choice="Highest Quality", **kwargs):
+    return plan_formats({'duration': 60, 'formats': formats}, format_choice, quality_choice, **kwargs)
+
+
+def test_smallest_option_at_the_highest_allowed_height():
+    result = plan(FORMATS, quality_choice="720p", merge=True)
+
+    # 20 MB of video plus the best M4A audio beats the 40 MB progressive file
+    assert result['format'] == "136+140"
+    assert result['height'] == 720 and result['merge']
+    assert result['size'] == 23 * MB
+
+    assert plan(FORMATS, merge=True)['format'] == "137+140"
+
+
+def test_progressive_file_wins_a_tie():
+    formats = [video("22", 720, 23 * MB), *FORMATS[2:]]
+
+    assert plan(formats, quality_choice="720p", merge=True)['format'] == "22"
+
+
+def test_without_ffmpeg_only_progressive_files_count(monkeypatch):
+    monkeypatch.setattr(script.formats, "_can_merge", False)
+
+    result = plan(FORMATS)
+
+    # The 1080p stream needs a merge, so the best progressive height is used
+    assert result['format'] == "22"
+    assert result['height'] == 720 and not result['merge']
+
+
+def test_progressive_fallback_without_m4a_audio():
+    formats = [fmt for fmt in FORMATS if fmt['ext'] != "m4a"]
+
+    result = plan(formats, quality_choice="720p", merge=True)
+
+    assert result['format'] == "22" and not result['merge']
+
+
+def test_lowest_height_when_nothing_fits():
+    assert plan(FORMATS[1:], quality_choice="360p", merge=True)['height'] == 720
+
+
+@pytest.mark.parametrize("format_choice, expected, action", [
+    ("M4A (Audio)", "140", "copy"),
+    ("MP3 (Audio)", "251", "transcode"),
+])
+def test_audio_plans(format_choice, expected, action):
+    result = plan(FORMATS, format_choice, "Audio")
+
+    # The 48 kbps stream is smaller but below MIN_AUDIO_ABR
+    assert result['format'] == expected
+    assert result['audio'] == action and result['height'] is None
+
+
+def test_no_usable_formats():
+    assert plan([]) is None
+    assert plan([{'format_id': "18"}]) is None
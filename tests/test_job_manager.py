@@ -0,0 +1,106 @@
+"""Job manager: history, instant re-delivery and re-queueing."""
+import pytest
+
+from script.job_manager import ERROR, FINISHED, QUEUED, JobManager
+from script.job_store import open_job_store
+
+
+URL = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+
+
+@pytest.fixture(params=["sqlite", "memory"])
+def manager(request, tmp_path):
+    url = f"sqlite:///{tmp_path}/jobs.sqlite" if request.param == "sqlite" else "memory://"
+    return JobManager(open_job_store(url))
+
+
+def finish(manager, job_id, path, info=None):
+    [job] = manager.store.lease("w", 1, 60)
+    assert job['id'] == job_id
+    if info:
+        manager.store.update(job_id, info=info)
+    manager.store.finish(job_id, "w", FINISHED, result={'path': path, 'size': 1, 'cached': False, 'video_id': "v"})
+
+
+def test_repeat_request_is_finished_from_the_history(manager, tmp_path):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(b"x")
+    first = manager.submit_video("https://youtu.be/dQw4w9WgXcQ?si=abc", "MP4 (Video)", "720p", session="a")
+    finish(manager, first, str(path), info={'title': "Video"})
+
+    repeat = manager.get_job(manager.submit_video(URL, "MP4 (Video)", "720p", session="b"))
+    assert repeat['status'] == FINISHED
+    assert repeat['info'] == {'title': "Video"}
+    assert repeat['result']['instant'] and repeat['result']['cached']
+    assert manager.queue_depth() == 0
+
+    other = manager.get_job(manager.submit_video(URL, "MP4 (Video)", "360p", session="b"))
+    assert other['status'] == QUEUED
+
+    assert manager.history_count() == 2
+    assert [job['id'] for job in manager.history("a")] == [first]
+
+
+def test_removed_file_is_downloaded_again(manager, tmp_path):
+    first = manager.submit_video(URL, "MP3 (Audio)", "Best Audio Quality")
+    finish(manager, first, str(tmp_path / "gone.mp3"))
+
+    assert manager.last_delivery(URL, "MP3 (Audio)", "Best Audio Quality") is None
+    assert manager.get_job(manager.submit_video(URL, "MP3 (Audio)", "Best Audio Quality"))['status'] == QUEUED
+
+
+def test_requeue_keeps_each_jobs_options(manager, tmp_path):
+    jobs = []
+    for quality in ("720p", "360p"):
+        job_id = manager.submit_video(URL, "MP4 (Video)", quality)
+        finish(manager, job_id, str(tmp_path / "gone.mp4"))
+        jobs.append(job_id)
+
+    batch_id = manager.requeue(jobs + jobs, session="me")
+
+    items = manager.get_batch(batch_id)
+    assert [job['options']['quality_choice'] for job in items] == ["720p", "360p"]
+    assert all(job['status'] == QUEUED and job['options']['session'] == "me" for job in items)
+    assert manager.batch_summary(batch_id)['duplicates'] == 2
+
+
+def test_video_downloaded_by_another_batch_follows_it(manager, tmp_path):
+    first = manager.submit_batch([URL], "MP4 (Video)", "720p")
+    [leader] = manager.get_batch(first)
+
+    second = manager.submit_batch([URL, "https://youtu.be/aaaaaaaaaaa"], "MP4 (Video)", "720p")
+
+    follower, other = manager.get_batch(second)
+    assert follower['follows'] == leader['id'] and other['follows'] is None
+    assert manager.batch_summary(second)['duplicates'] == 0
+    assert manager.queue_depth() == 2
+    # Workers lease the download once
+    assert {job['id'] for job in manager.store.lease("w", 10, 60)} == {leader['id'], other['id']}
+
+    manager.store.finish(leader['id'], "w", FINISHED, result={'path': str(tmp_path / "v.mp4"), 'cached': False})
+    follower = manager.get_job(follower['id'])
+    assert follower['status'] == FINISHED and follower['result']['cached']
+
+
+def test_follower_of_a_failed_download_fails_too(manager):
+    first = manager.submit_batch([URL], "MP3 (Audio)", "Best Audio Quality")
+    [leader] = manager.get_batch(first)
+    manager.store.lease("w", 1, 60)
+    second = manager.submit_batch([URL], "MP3 (Audio)", "Best Audio Quality")
+
+    manager.store.finish(leader['id'], "w", ERROR, error="boom")
+
+    assert [item.error for item in manager.batch_items(second, statuses=(ERROR,))] == ["boom"]
+
+
+def test_follower_added_after_the_download_finished(manager):
+    leader = manager.submit_video(URL, "MP4 (Video)", "720p")
+    active = manager.active_urls("MP4 (Video)", "720p")
+    manager.store.lease("w", 1, 60)
+    manager.store.finish(leader, "w", ERROR, error="boom")
+
+    # The batch was planned while the download was still running
+    manager._add("b", 0, "batch_item", URL, {'format_choice': "MP4 (Video)", 'quality_choice': "720p"},
+                 follows=active[URL])
+
+    assert manager.get_batch("b")[0]['status'] == ERROR
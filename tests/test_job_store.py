@@ -0,0 +1,94 @@
+"""Both job store backends behave the same: leases, heartbeats, requeueing."""
+import uuid
+
+import pytest
+
+from script.job_store import ERROR, FINISHED, QUEUED, RUNNING, new_job, open_job_store
+
+
+OPTIONS = {'format_choice': "MP4 (Video)", 'quality_choice': "720p", 'session': None}
+
+
+@pytest.fixture(params=["sqlite", "memory"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        return open_job_store(f"sqlite:///{tmp_path}/jobs.sqlite")
+    return open_job_store("memory://")
+
+
+def add(store, batch_id=None, position=0, kind="batch_item", url=None):
+    job = new_job(uuid.uuid4().hex, batch_id, position, kind, url or f"https://example.com/{uuid.uuid4().hex}", OPTIONS)
+    store.add_jobs([job])
+    return job['id']
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        open_job_store("redis://localhost")
+
+
+def test_videos_first_then_batches_take_turns(store):
+    for batch_id in ("a", "b"):
+        store.add_batch(batch_id, False)
+        for position in range(3):
+            add(store, batch_id, position, url=f"{batch_id}{position}")
+    add(store, kind="video", url="video")
+
+    leased = [job['url'] for job in store.lease("w1", 10, 60)]
+
+    assert leased[0] == "video"
+    assert leased[1:] == ["a0", "b0", "a1", "b1", "a2", "b2"]
+    assert store.lease("w2", 10, 60) == []
+    assert store.queue_depth() == 0
+
+
+def test_heartbeat_finish_and_lost_leases(store):
+    job_id = add(store)
+    [job] = store.lease("w1", 1, 60)
+    assert job['status'] == RUNNING and job['worker'] == "w1"
+
+    assert store.heartbeat("w1", {job_id: {'progress': 0.5, 'message': "half", 'speed': 10.0}}, 60) == set()
+    assert store.get_job(job_id)['progress'] == 0.5
+    # Another worker holds nothing
+    assert store.heartbeat("w2", {job_id: {'progress': 0.9}}, 60) == {job_id}
+    assert store.get_job(job_id)['progress'] == 0.5
+
+    assert not store.finish(job_id, "w2", FINISHED, result={'path': "x"})
+    assert store.finish(job_id, "w1", FINISHED, result={'path': "x"})
+    job = store.get_job(job_id)
+    assert job['status'] == FINISHED and job['result'] == {'path': "x"} and job['progress'] == 1.0
+
+
+def test_expired_leases_are_queued_again(store):
+    job_id = add(store)
+    store.lease("w1", 1, -1)
+
+    assert store.requeue_expired() == 1
+    assert store.get_job(job_id)['status'] == QUEUED
+    [job] = store.lease("w2", 1, 60)
+    assert job['id'] == job_id
+    # The first worker lost it
+    assert not store.finish(job_id, "w1", ERROR, error="late")
+
+
+def test_release_on_shutdown(store):
+    job_ids = {add(store) for _ in range(3)}
+    store.lease("w1", 3, 60)
+    store.release("w1")
+    assert {job['id'] for job in store.lease("w2", 3, 60)} == job_ids
+
+
+def test_batch_summary_and_items(store):
+    store.add_batch("b", True, duplicates=2)
+    ids = [add(store, "b", position, url=f"u{position}") for position in range(4)]
+    store.lease("w1", 2, 60)
+    store.finish(ids[0], "w1", FINISHED, result={'path': "p", 'cached': True})
+    store.finish(ids[1], "w1", ERROR, error="boom")
+    store.end_expanding("b", duplicates=1)
+
+    summary = store.batch_summary("b")
+    assert (summary['total'], summary[FINISHED], summary[ERROR], summary[QUEUED], summary['cached']) == (4, 1, 1, 2, 1)
+    assert store.get_batch_state("b") == {'expanding': False, 'duplicates': 3}
+    assert store.batch_items("b", statuses=(ERROR,)) == [(1, "u1", ERROR, False, "boom")]
+    assert [item[1] for item in store.batch_items("b", offset=1, limit=2)] == ["u1", "u2"]
+    assert {url for _, url, _ in store.active_jobs()} == {"u2", "u3"}
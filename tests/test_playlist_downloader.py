@@ -0,0 +1,33 @@
+"""Batch runner: playlist expansion and report records."""
+from yt_dlp.utils import DownloadError
+
+import script.playlist_downloader as runner
+
+
+VIDEO = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+PLAYLIST = "https://www.youtube.com/playlist?list=PLgone"
+
+
+def test_playlist_that_cannot_be_listed_is_reported_not_downloaded(monkeypatch):
+    def iter_playlist_entries(url, start, end):
+        raise DownloadError("ERROR: [youtube:tab] PLgone: The playlist does not exist.")
+        yield
+
+    fetched = []
+
+    def fetch_video(url, *args, **kwargs):
+        fetched.append(url)
+        return {'path': "video.mp4", 'size': 1, 'cached': False, 'video_id': "v", 'key': "k"}
+
+    monkeypatch.setattr(runner, "iter_playlist_entries", iter_playlist_entries)
+    monkeypatch.setattr(runner, "fetch_video", fetch_video)
+
+    urls = runner.expand_urls([PLAYLIST, VIDEO])
+    records = list(runner.run_batch(urls, "MP4 (Video)", "720p", store=None, retries=0))
+
+    assert fetched == [VIDEO]
+    failed, ok = records
+    assert ok['status'] == "ok" and ok['url'] == VIDEO
+    assert failed['status'] == "error" and failed['url'] == failed['playlist'] == PLAYLIST
+    assert failed['error'].startswith("Could not list playlist: ") and "does not exist" in failed['error']
+    assert failed['category'] == "unavailable" and failed['retryable'] is False
@@ -0,0 +1,87 @@
+"""Playlist mirroring: --prune deletes only what the sync alone downloaded."""
+import pytest
+
+from script.job_store import FINISHED, new_job, open_job_store
+from script.playlist_sync import PlaylistSync, SyncState
+
+
+PLAYLIST = "https://www.youtube.com/playlist?list=PL1"
+# Still listed in every run, so removing two entries stays below the prune limit
+KEPT = ["ccccccccccc", "ddddddddddd", "eeeeeeeeeee"]
+
+
+class Store:
+    """Records the keys it is asked to remove"""
+
+    def __init__(self):
+        self.removed = set()
+
+    def remove(self, keys):
+        self.removed |= set(keys)
+        return list(keys)
+
+
+@pytest.fixture
+def state(tmp_path):
+    return SyncState(str(tmp_path / "sync.sqlite"))
+
+
+def entry(video_id):
+    return {'id': video_id, 'url': f"https://www.youtube.com/watch?v={video_id}"}
+
+
+def mirror(sync, entries, cached=()):
+    """One --sync run over ``entries``; ``cached`` ones were already in the store"""
+    for item in sync.new_entries(PLAYLIST, [entry(video_id) for video_id in entries]):
+        video_id = item['id']
+        sync.record({
+            'url': item['url'], 'status': "ok", 'key': f"key-{video_id}", 'cached': video_id in cached,
+        })
+
+
+def test_prune_keeps_files_the_sync_did_not_download(state):
+    store = Store()
+    sync = PlaylistSync(state, store, "MP4 (Video)", "720p", prune=True)
+    mirror(sync, ["aaaaaaaaaaa", "bbbbbbbbbbb", *KEPT], cached={"bbbbbbbbbbb"})
+
+    mirror(sync, KEPT)
+
+    assert store.removed == {"key-aaaaaaaaaaa"}
+
+
+def test_prune_keeps_files_the_web_app_downloaded(state, tmp_path):
+    jobs = open_job_store(f"sqlite:///{tmp_path}/jobs.sqlite")
+    job = new_job("j", None, 0, "video", entry("aaaaaaaaaaa")['url'], {'format_choice': "MP4 (Video)"})
+    jobs.add_jobs([job])
+    jobs.lease("w", 1, 60)
+    jobs.finish("j", "w", FINISHED, result={'path': "p", 'key': "key-aaaaaaaaaaa", 'cached': True})
+    store = Store()
+    sync = PlaylistSync(state, store, "MP4 (Video)", "720p", prune=True, in_use=jobs.finished_keys)
+    mirror(sync, ["aaaaaaaaaaa", "bbbbbbbbbbb", *KEPT])
+
+    mirror(sync, KEPT)
+
+    assert store.removed == {"key-bbbbbbbbbbb"}
+    assert set(state.known(PLAYLIST, "MP4 (Video)", "720p")) == set(KEPT)
+
+
+def test_entries_synced_before_owned_was_recorded_are_kept(state):
+    for video_id in ["aaaaaaaaaaa", *KEPT]:
+        state.add(PLAYLIST, "MP4 (Video)", "720p", video_id, entry(video_id)['url'], f"key-{video_id}")
+    store = Store()
+
+    mirror(PlaylistSync(state, store, "MP4 (Video)", "720p", prune=True), KEPT)
+
+    assert store.removed == set()
+
+
+@pytest.mark.parametrize("listing", [[], KEPT[:1]], ids=["empty", "truncated"])
+def test_suspicious_listing_prunes_nothing(state, listing):
+    store = Store()
+    sync = PlaylistSync(state, store, "MP4 (Video)", "720p", prune=True)
+    mirror(sync, ["aaaaaaaaaaa", *KEPT])
+
+    mirror(sync, listing)
+
+    assert store.removed == set()
+    assert len(state.known(PLAYLIST, "MP4 (Video)", "720p")) == 4
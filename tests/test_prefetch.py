@@ -0,0 +1,46 @@
+"""Looking up pasted URLs before a batch is queued."""
+import pytest
+
+import script.download_engine
+from script import metadata_cache
+from script.prefetch import READY, UNCHECKED, prefetch
+
+
+URLS = [f"https://www.youtube.com/watch?v=video{number:06d}" for number in range(5)]
+
+
+@pytest.fixture
+def lookups(monkeypatch):
+    looked_up = []
+
+    def extract_video_info(url):
+        looked_up.append(url)
+        return {'id': url[-11:], 'extractor_key': "Youtube", 'title': url, 'duration': 60, 'formats': []}
+
+    monkeypatch.setattr(script.download_engine, "extract_video_info", extract_video_info)
+    return looked_up
+
+
+def test_only_the_first_videos_are_looked_up(lookups):
+    items = prefetch(URLS, "MP4 (Video)", "720p", limit=2)
+
+    assert sorted(lookups) == URLS[:2]
+    assert [item['status'] for item in items] == [READY, READY, UNCHECKED, UNCHECKED, UNCHECKED]
+    assert items[0]['title'] == URLS[0]
+
+
+@pytest.mark.parametrize("environ, shared", [
+    ({}, False),
+    ({'YTDL_EMBEDDED_WORKER': "0"}, True),
+    ({'YTDL_EMBEDDED_WORKER': "0", 'YTDL_METADATA_CACHE': "memory"}, False),
+    ({'YTDL_METADATA_CACHE': "sqlite"}, True),
+])
+def test_cache_is_shared_when_workers_run_elsewhere(monkeypatch, tmp_path, environ, shared):
+    monkeypatch.setattr("script.db.STATE_PATH", str(tmp_path))
+    monkeypatch.setattr(metadata_cache, "_cache", None)
+    for name in ("YTDL_EMBEDDED_WORKER", "YTDL_METADATA_CACHE"):
+        monkeypatch.delenv(name, raising=False)
+    for name, value in environ.items():
+        monkeypatch.setenv(name, value)
+
+    assert (metadata_cache.get_metadata_cache()._db is not None) == shared
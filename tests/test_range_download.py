@@ -0,0 +1,141 @@
+"""Parallel range downloads against the local fake server."""
+import hashlib
+import json
+import os
+import threading
+import time
+import urllib.request
+
+import pytest
+
+from benchmarks.fake_server import FakeServer
+from script.range_download import RangeDownloader, urllib_opener
+
+
+CHUNK = 64 * 1024
+SIZE = 10 * CHUNK + 123
+
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def expected(url):
+    with urllib.request.urlopen(url) as response:
+        return sha256(response.read())
+
+
+class RecordingOpener:
+    """Opens requests with urllib and remembers their Range headers"""
+
+    def __init__(self, fail_after=None):
+        self.ranges = []
+        self.fail_after = fail_after
+        self._lock = threading.Lock()
+
+    def __call__(self, url, headers):
+        with self._lock:
+            self.ranges.append(headers.get("Range"))
+            count = len(self.ranges)
+        if self.fail_after is not None and count > self.fail_after:
+            raise ConnectionError("connection reset")
+        return urllib_opener(url, headers)
+
+
+@pytest.fixture
+def server():
+    with FakeServer(media_size=SIZE) as server:
+        yield server
+
+
+def test_parallel_ranges_are_reassembled(server, tmp_path):
+    url = server.media_url("abc")
+    dest = str(tmp_path / "video.mp4")
+    opener = RecordingOpener()
+    progress = []
+
+    RangeDownloader(url, dest, workers=4, chunk_size=CHUNK, opener=opener,
+                    progress=lambda done, total: progress.append((done, total))).download()
+
+    assert sha256(read(dest)) == expected(url)
+    # The probe plus one request per chunk
+    assert len(opener.ranges) == 1 + 11
+    assert progress[-1] == (SIZE, SIZE)
+    assert not os.path.exists(dest + ".part") and not os.path.exists(dest + ".part.json")
+
+
+def test_interrupted_download_resumes_from_manifest(server, tmp_path):
+    url = server.media_url("abc")
+    dest = str(tmp_path / "video.mp4")
+
+    # One worker: the probe and four chunks get through, then the connection drops
+    broken = RecordingOpener(fail_after=5)
+    with pytest.raises(ConnectionError):
+        RangeDownloader(url, dest, workers=1, chunk_size=CHUNK, retries=0, opener=broken).download()
+    with open(dest + ".part.json") as f:
+        done = json.load(f)['done']
+    assert sorted(done) == [0, 1, 2, 3]
+
+    opener = RecordingOpener()
+    RangeDownloader(url, dest, workers=4, chunk_size=CHUNK, opener=opener).download()
+
+    assert sha256(read(dest)) == expected(url)
+    # Only the missing chunks were fetched again
+    fetched = {int(header.split("=")[1].split("-")[0]) // CHUNK for header in opener.ranges[1:]}
+    assert fetched == set(range(4, 11))
+
+
+def test_server_without_range_support(tmp_path):
+    with FakeServer(media_size=SIZE, ranges=False) as server:
+        url = server.media_url("abc")
+        dest = str(tmp_path / "video.mp4")
+        opener = RecordingOpener()
+
+        RangeDownloader(url, dest, workers=4, chunk_size=CHUNK, opener=opener).download()
+
+        assert sha256(read(dest)) == expected(url)
+        # The whole body comes from the probe response
+        assert len(opener.ranges) == 1
+        assert os.path.getsize(dest) == SIZE
+
+
+def test_changed_file_is_downloaded_from_scratch(server, tmp_path):
+    url = server.media_url("abc")
+    dest = str(tmp_path / "video.mp4")
+    broken = RecordingOpener(fail_after=5)
+    with pytest.raises(ConnectionError):
+        RangeDownloader(url, dest, workers=1, chunk_size=CHUNK, retries=0, opener=broken).download()
+
+    # Same size, new version: the chunks on disk belong to the old one
+    server.last_modified = "Fri, 02 Jan 2026 00:00:00 GMT"
+    opener = RecordingOpener()
+    RangeDownloader(url, dest, workers=4, chunk_size=CHUNK, opener=opener).download()
+
+    fetched = {int(header.split("=")[1].split("-")[0]) // CHUNK for header in opener.ranges[1:]}
+    assert fetched == set(range(11))
+    assert sha256(read(dest)) == expected(url)
+
+
+def test_failed_chunk_stops_the_others(server, tmp_path):
+    url = server.media_url("abc")
+    dest = str(tmp_path / "video.mp4")
+
+    class ExpiredOpener(RecordingOpener):
+        def __call__(self, url, headers):
+            if headers["Range"].startswith(f"bytes={2 * CHUNK}-"):
+                raise PermissionError("HTTP Error 403: Forbidden")
+            time.sleep(0.05)
+            return super().__call__(url, headers)
+
+    opener = ExpiredOpener()
+    with pytest.raises(PermissionError):
+        RangeDownloader(url, dest, workers=2, chunk_size=CHUNK, retries=0, opener=opener).download()
+
+    # The probe, the two chunks before it and the ones the two workers started before the stop;
+    # not the rest of the queue
+    assert len(opener.ranges) <= 1 + 2 + 2
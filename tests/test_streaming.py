@@ -0,0 +1,49 @@
+"""Streaming a download through a pipe, from the metadata already looked up."""
+import pytest
+
+from benchmarks.fake_server import FakeServer
+from script.metadata_cache import cache_key, get_metadata_cache
+from script.metrics import DOWNLOADS
+from script.streaming import MediaStream
+
+
+SIZE = 200 * 1024
+
+
+@pytest.fixture
+def server():
+    with FakeServer(media_size=SIZE) as server:
+        yield server
+
+
+def looked_up(server, video_id):
+    """Put the video in the metadata cache, as the page does before streaming"""
+    url = server.video_url(video_id)
+    info = {**server.info(video_id), 'extractor': "generic", 'webpage_url': url}
+    get_metadata_cache().put(cache_key(url), info)
+    return url, info
+
+
+def test_stream_reuses_the_looked_up_metadata(server):
+    url, _ = looked_up(server, "abc")
+    streamed = DOWNLOADS.value(result='streamed')
+
+    stream = MediaStream(url, "MP4 (Video)", "360p", chunk_size=16 * 1024)
+    data = b"".join(stream)
+
+    assert len(data) == SIZE
+    assert stream.filename.endswith(".mp4")
+    # Only the media was fetched: yt-dlp has no extractor for the fake server and did not need one
+    assert server.requests == 1
+    assert DOWNLOADS.value(result='streamed') == streamed + 1
+
+
+def test_failing_stream_raises_before_sending(server):
+    url, info = looked_up(server, "gone")
+    info['formats'][0]['url'] = server.base_url + "/missing.mp4"
+    get_metadata_cache().put(cache_key(url), info)
+    errors = DOWNLOADS.value(result='error')
+
+    with pytest.raises(Exception):
+        MediaStream(url, "MP4 (Video)", "360p")
+    assert DOWNLOADS.value(result='error') == errors + 1
@@ -0,0 +1,36 @@
+"""Canonical URLs and lines that are not URLs."""
+import pytest
+
+from script.urls import canonical_url, dedupe_urls, is_url, playlist_id_from_url, video_id_from_url
+
+
+VIDEO = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+
+
+@pytest.mark.parametrize("url", [
+    "https://youtu.be/dQw4w9WgXcQ?si=abc",
+    "m.youtube.com/watch?v=dQw4w9WgXcQ&t=30",
+    "https://www.youtube.com/shorts/dQw4w9WgXcQ",
+    "https://www.youtube.com/watch?v=dQw4w9WgXcQ&list=PL123#top",
+])
+def test_video_spellings(url):
+    assert canonical_url(url) == VIDEO
+
+
+def test_playlists_and_other_sites():
+    assert canonical_url("youtube.com/playlist?list=PLabc&si=x") == "https://www.youtube.com/playlist?list=PLabc"
+    assert canonical_url("HTTPS://Example.COM/a?b=1#c") == "https://example.com/a?b=1"
+
+
+@pytest.mark.parametrize("line", ["https://[bad", "not a url", "https://example.com:port/", "   "])
+def test_lines_that_are_not_urls(line):
+    assert not is_url(line)
+    assert video_id_from_url(line) is None
+    assert playlist_id_from_url(line) is None
+    assert canonical_url(line) == line.strip()
+
+
+def test_dedupe_keeps_bad_lines_for_reporting():
+    urls, repeats = dedupe_urls([VIDEO, "https://youtu.be/dQw4w9WgXcQ", "https://[bad", "", "https://[bad"])
+    assert urls == [VIDEO, "https://[bad"]
+    assert repeats == 2